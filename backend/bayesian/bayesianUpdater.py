@@ -1,10 +1,130 @@
 
+import os
 import sys
 import json
 import math
+import sqlite3
 import numpy as np
 from scipy import stats
 
+import normalInverseGamma
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(BASE_DIR, 'mass_balance.db')
+
+REQUIRED_FIELDS = ['prior_mean', 'prior_std', 'data_mean', 'data_std']
+ONLINE_FIELDS = ['method_name', 'data_mean', 'data_std']
+DEFAULT_SAMPLE_TYPE = 'General'
+
+# Sufficient statistics kept alongside prior_mean/prior_std in method_priors
+SEQUENTIAL_COLUMNS = {
+    'posterior_precision': 'REAL',
+    'weighted_mean_sum': 'REAL'
+}
+
+def bayesian_batch_update(prior_means, prior_stds, data_means, data_stds, n):
+    """
+    Vectorized Normal-Normal update: every argument is an array (or a scalar
+    broadcast against the others) and every output is an array.
+    Same model and arithmetic as bayesian_update().
+    """
+    prior_means, prior_stds, data_means, data_stds, n = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (prior_means, prior_stds, data_means, data_stds, n))
+    )
+
+    # Precision = 1 / Variance (1e-6 when no spread is known)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prior_precision = np.where(prior_stds > 0, 1 / (prior_stds ** 2), 1e-6)
+        data_precision = np.where(data_stds > 0, n / (data_stds ** 2), 1e-6) # Precision of the sampling distribution of the mean
+
+    posterior_precision = prior_precision + data_precision
+    posterior_variance = 1 / posterior_precision
+    posterior_std = np.sqrt(posterior_variance)
+
+    posterior_mean = (prior_precision * prior_means + data_precision * data_means) / posterior_precision
+
+    # For Normal posterior, 95% CI is Mean +/- 1.96 * Std
+    return {
+        "posterior_mean": posterior_mean,
+        "posterior_std": posterior_std,
+        "lower_ci": posterior_mean - 1.96 * posterior_std,
+        "upper_ci": posterior_mean + 1.96 * posterior_std,
+        "prior_weight": prior_precision / posterior_precision,
+        "data_weight": data_precision / posterior_precision
+    }
+
+def batch_results(batch):
+    """Split bayesian_batch_update() arrays into per-sample result dicts"""
+    return [
+        {
+            "posterior_mean": float(batch["posterior_mean"][i]),
+            "posterior_std": float(batch["posterior_std"][i]),
+            "credible_interval_95": [float(batch["lower_ci"][i]), float(batch["upper_ci"][i])],
+            "prior_weight": float(batch["prior_weight"][i]),
+            "data_weight": float(batch["data_weight"][i])
+        }
+        for i in range(len(batch["posterior_mean"]))
+    ]
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def update_payloads(payloads):
+    """
+    Run one vectorized update over a list of CLI payloads. Returns one
+    result per payload, in order; malformed payloads get an error entry.
+    Payloads that carry raw `replicates` go through the Normal-Inverse-Gamma
+    engine (unknown variance) instead of the known-variance update.
+    """
+    results = [None] * len(payloads)
+    known_variance, unknown_variance = [], []
+    for i, payload in enumerate(payloads):
+        if not isinstance(payload, dict):
+            results[i] = {"error": "Payload must be a JSON object"}
+            continue
+        has_replicates = isinstance(payload.get('replicates'), list) and len(payload['replicates']) > 0
+        required = REQUIRED_FIELDS[:2] if has_replicates else REQUIRED_FIELDS
+        missing = [f for f in required if payload.get(f) is None]
+        if missing:
+            results[i] = {"error": f"Missing field: {missing[0]}"}
+            continue
+        values = [payload[f] for f in required] + (payload['replicates'] if has_replicates else [])
+        if not all(is_number(v) for v in values):
+            results[i] = {"error": "Non-numeric value in payload"}
+            continue
+        (unknown_variance if has_replicates else known_variance).append(i)
+
+    if known_variance:
+        rows = [payloads[i] for i in known_variance]
+        try:
+            batch_rows = batch_results(bayesian_batch_update(
+                [p['prior_mean'] for p in rows],
+                [p['prior_std'] for p in rows],
+                [p['data_mean'] for p in rows],
+                [p['data_std'] for p in rows],
+                [p.get('n', 3) for p in rows] # Default to triplicate
+            ))
+        except (TypeError, ValueError) as e:
+            batch_rows = [{"error": str(e)}] * len(rows)
+        for i, result in zip(known_variance, batch_rows):
+            results[i] = result
+
+    if unknown_variance:
+        rows = [payloads[i] for i in unknown_variance]
+        try:
+            batch_rows = normalInverseGamma.summary_results(normalInverseGamma.nig_batch_update(
+                [p['prior_mean'] for p in rows],
+                [p['prior_std'] for p in rows],
+                [p['replicates'] for p in rows],
+                [p.get('expected_sd') or normalInverseGamma.DEFAULT_EXPECTED_SD for p in rows]
+            ))
+        except (TypeError, ValueError) as e:
+            batch_rows = [{"error": str(e)}] * len(rows)
+        for i, result in zip(unknown_variance, batch_rows):
+            results[i] = result
+
+    return results
+
 def bayesian_update(prior_mean, prior_std, data_mean, data_std, n):
     """
     Update Gaussian prior with Gaussian likelihood (Normal-Normal model).
@@ -34,14 +154,183 @@ def bayesian_update(prior_mean, prior_std, data_mean, data_std, n):
         "data_weight": float(data_precision / posterior_precision)
     }
 
+# ============================================
+# Sequential (online) updating of method_priors
+# ============================================
+
+def precision_of(std, n=1):
+    """Precision of a mean of n observations with the given SD (same floor as bayesian_update)"""
+    return n / (std ** 2) if std > 0 else 1e-6
+
+def sequential_update(state, data_mean, data_std, n):
+    """
+    O(1) conjugate update of the running sufficient statistics
+    (precision, precision-weighted mean sum, n_samples). The posterior of
+    one calculation is the prior of the next.
+    """
+    precision, weighted_mean_sum, n_samples = state
+    data_precision = precision_of(data_std, n)
+    return (precision + data_precision,
+            weighted_mean_sum + data_precision * data_mean,
+            n_samples + n)
+
+def state_posterior(state):
+    """(mean, std) of the Normal posterior held in a sufficient-statistic state"""
+    precision, weighted_mean_sum, _ = state
+    return weighted_mean_sum / precision, math.sqrt(1 / precision)
+
+def replay_posterior(prior_mean, prior_std, data_means, data_stds, n):
+    """Full recomputation over a whole history in one vectorized pass (to check the online state)"""
+    data_stds = np.asarray(data_stds, dtype=np.float64)
+    n = np.broadcast_to(np.asarray(n, dtype=np.float64), data_stds.shape)
+    with np.errstate(divide='ignore'):
+        data_precision = np.where(data_stds > 0, n / (data_stds ** 2), 1e-6)
+
+    prior_precision = precision_of(prior_std)
+    precision = prior_precision + data_precision.sum()
+    mean = (prior_precision * prior_mean + (data_precision * np.asarray(data_means, dtype=np.float64)).sum()) / precision
+    return float(mean), float(math.sqrt(1 / precision))
+
+def ensure_sequential_columns(conn):
+    """Add and backfill the sufficient-statistic columns if the migration has not been applied"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(method_priors)")}
+    missing = [name for name in SEQUENTIAL_COLUMNS if name not in existing]
+    for name in missing:
+        conn.execute(f"ALTER TABLE method_priors ADD COLUMN {name} {SEQUENTIAL_COLUMNS[name]}")
+    if missing:
+        conn.execute("""
+            UPDATE method_priors
+            SET posterior_precision = CASE WHEN prior_std > 0 THEN 1.0 / (prior_std * prior_std) ELSE 1e-6 END
+            WHERE posterior_precision IS NULL
+        """)
+        conn.execute("""
+            UPDATE method_priors
+            SET weighted_mean_sum = posterior_precision * prior_mean
+            WHERE weighted_mean_sum IS NULL
+        """)
+
+def online_payload_error(payload):
+    """Why an online payload cannot be applied, or None if it is valid"""
+    if not isinstance(payload, dict):
+        return "Payload must be a JSON object"
+    missing = [f for f in ONLINE_FIELDS if payload.get(f) is None]
+    if missing:
+        return f"Missing field: {missing[0]}"
+    if not isinstance(payload['method_name'], str):
+        return "method_name must be a string"
+    if not isinstance(payload.get('sample_type') or DEFAULT_SAMPLE_TYPE, str):
+        return "sample_type must be a string"
+    n = payload.get('n', 3)
+    if not all(is_number(v) for v in (payload['data_mean'], payload['data_std'], n)):
+        return "Non-numeric value in payload"
+    if not all(math.isfinite(v) for v in (payload['data_mean'], payload['data_std'], n)):
+        return "Non-finite value in payload"
+    if n < 1:
+        return "n must be at least 1"
+    return None
+
+def apply_online_updates(payloads, db_path=DB_PATH):
+    """
+    Fold {method_name, data_mean, data_std, n, sample_type} payloads into
+    method_priors, in order, inside one write transaction. Each result
+    carries the prior that was used and the posterior that was stored.
+    Payloads are validated before the transaction starts, so an invalid one
+    gets an error entry and the rest of the batch is still committed.
+    """
+    results = [None] * len(payloads)
+    valid = []
+    for i, payload in enumerate(payloads):
+        error = online_payload_error(payload)
+        if error:
+            results[i] = {"error": error}
+        else:
+            valid.append(i)
+    if not valid:
+        return results
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # Take the write lock before reading so concurrent savers serialize
+        conn.execute("BEGIN IMMEDIATE")
+        ensure_sequential_columns(conn)
+
+        states = {}
+        for i in valid:
+            payload = payloads[i]
+            key = (payload['method_name'], payload.get('sample_type') or DEFAULT_SAMPLE_TYPE)
+            if key not in states:
+                row = conn.execute(
+                    "SELECT posterior_precision, weighted_mean_sum, n_samples FROM method_priors "
+                    "WHERE method_name = ? AND sample_type = ?", key
+                ).fetchone()
+                if row is None:
+                    results[i] = {"error": f"No prior for {key[0]} ({key[1]})"}
+                    continue
+                states[key] = (row[0], row[1], row[2] or 0)
+
+            prior = states[key]
+            states[key] = sequential_update(prior, float(payload['data_mean']),
+                                            float(payload['data_std']), int(payload.get('n', 3)))
+            prior_mean, prior_std = state_posterior(prior)
+            posterior_mean, posterior_std = state_posterior(states[key])
+            results[i] = {
+                "method_name": key[0],
+                "sample_type": key[1],
+                "prior_mean": prior_mean,
+                "prior_std": prior_std,
+                "posterior_mean": posterior_mean,
+                "posterior_std": posterior_std,
+                "credible_interval_95": [posterior_mean - 1.96 * posterior_std, posterior_mean + 1.96 * posterior_std],
+                "prior_weight": prior[0] / states[key][0],
+                "data_weight": (states[key][0] - prior[0]) / states[key][0],
+                "n_samples": states[key][2]
+            }
+
+        for (method_name, sample_type), state in states.items():
+            posterior_mean, posterior_std = state_posterior(state)
+            conn.execute("""
+                UPDATE method_priors
+                SET prior_mean = ?, prior_std = ?, posterior_precision = ?, weighted_mean_sum = ?,
+                    n_samples = ?, last_updated = CURRENT_TIMESTAMP
+                WHERE method_name = ? AND sample_type = ?
+            """, (posterior_mean, posterior_std, state[0], state[1], state[2], method_name, sample_type))
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return results
+
 if __name__ == "__main__":
+    # Usage:
+    #   echo '{...}' | python bayesianUpdater.py                   one update
+    #   echo '[{...}, ...]' | python bayesianUpdater.py            batch of updates
+    #   echo '[{...}, ...]' | python bayesianUpdater.py --online [--db PATH]
+    #                                    fold results into method_priors
+    args = sys.argv[1:]
     try:
         input_str = sys.stdin.read()
         if not input_str:
             print(json.dumps({"error": "No input provided"}))
             sys.exit(1)
-            
+
         data = json.loads(input_str)
+
+        if '--online' in args:
+            db_path = args[args.index('--db') + 1] if '--db' in args and args.index('--db') + 1 < len(args) else DB_PATH
+            results = apply_online_updates(data if isinstance(data, list) else [data], db_path)
+            print(json.dumps(results if isinstance(data, list) else results[0]))
+            sys.stdout.flush()
+            sys.exit(0)
+
+        # A list of payloads is answered with a list of results in one pass
+        if isinstance(data, list):
+            print(json.dumps(update_payloads(data)))
+            sys.stdout.flush()
+            sys.exit(0)
         
         prior_mean = data.get('prior_mean')
         prior_std = data.get('prior_std')
@@ -0,0 +1,240 @@
+"""
+Hierarchical (partial-pooling) priors per product, stress type and method
+Empirical-Bayes normal-normal model fitted from the calculations table:
+
+    y_ij     ~ Normal(theta_g, sigma_h^2)      replicate results of group g
+    theta_g  ~ Normal(mu_h, tau_h^2)           group means within hyper-group h
+
+g = (product, stress_type, method), h = (stress_type, method). sigma_h, tau_h
+and mu_h are estimated by method of moments, vectorized over all groups; each
+group's prior is its partially pooled posterior for theta_g.
+
+Per-group running statistics (n, mean, M2) are stored in group_priors, so a
+refit only reads calculations added since the last one and then re-derives
+the hyperparameters from the (small) group table. Running statistics cannot
+forget a row: triggers on calculations flag deletions and edits of rows
+already folded in, and the next refit then rebuilds everything.
+"""
+
+import os
+import sys
+import sqlite3
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(BASE_DIR, 'mass_balance.db')
+SCHEMA_PATH = os.path.join(BASE_DIR, 'migrations', 'add_hierarchical_priors.sql')
+
+# calculations has no product column; sample IDs identify the product
+PRODUCT_COLUMN = 'sample_id'
+METHOD_COLUMNS = {
+    'SMB': 'smb',
+    'AMB': 'amb',
+    'RMB': 'rmb',
+    'LK-IMB': 'lk_imb',
+    'CIMB': 'cimb'
+}
+
+CHUNK_SIZE = 10000
+WATERMARK = 'calculations_rowid'
+STALE_FLAG = 'calculations_stale'  # set by the triggers in SCHEMA_PATH
+KEY_SEPARATOR = '\x1f'
+
+# Fallbacks when a hyper-group has too little data to estimate a spread
+DEFAULT_WITHIN_STD = 2.5  # Typical HPLC replicate SD (% RSD)
+DEFAULT_BETWEEN_STD = 5.0 # Same spread as the broad method_priors defaults
+MIN_BETWEEN_STD = 0.5     # Keeps the population prior proper
+
+def ensure_schema(conn):
+    with open(SCHEMA_PATH, 'r') as f:
+        conn.executescript(f.read())
+
+def merge_statistics(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Chan et al. parallel merge of (count, mean, sum of squared deviations); works on arrays"""
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(n > 0, mean_a + delta * n_b / np.maximum(n, 1), 0.0)
+        m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / np.maximum(n, 1)
+    return n, mean, m2
+
+def group_statistics(keys, values):
+    """(unique keys, n, mean, M2) of values grouped by key, in one bincount pass"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    n = np.bincount(inverse, minlength=len(unique)).astype(np.float64)
+    mean = np.bincount(inverse, weights=values, minlength=len(unique)) / n
+    m2 = np.bincount(inverse, weights=(values - mean[inverse]) ** 2, minlength=len(unique))
+    return unique, n, mean, m2
+
+def iter_new_rows(conn, after_rowid, chunk_size=CHUNK_SIZE):
+    """Yield (last rowid, joined group keys, values) for calculations newer than the watermark"""
+    columns = ', '.join(METHOD_COLUMNS.values())
+    cursor = conn.execute(f"""
+        SELECT rowid, {PRODUCT_COLUMN}, stress_type, {columns}
+        FROM calculations
+        WHERE rowid > ? AND {PRODUCT_COLUMN} IS NOT NULL AND {PRODUCT_COLUMN} != ''
+            AND stress_type IS NOT NULL AND stress_type != ''
+        ORDER BY rowid
+    """, (after_rowid,))
+
+    methods = np.array(list(METHOD_COLUMNS), dtype=object)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        products = np.array([str(r[1]) for r in rows], dtype=object)
+        stresses = np.array([str(r[2]) for r in rows], dtype=object)
+        values = np.array([r[3:] for r in rows], dtype=np.float64)  # NULL -> nan
+
+        # Long format: one (product, stress, method) observation per non-null cell
+        row_idx, method_idx = np.nonzero(~np.isnan(values))
+        keys = products[row_idx] + KEY_SEPARATOR + stresses[row_idx] + KEY_SEPARATOR + methods[method_idx]
+        yield rows[-1][0], keys.astype(str), values[row_idx, method_idx]
+
+def fit_hyperparameters(hyper_index, n, mean, m2):
+    """
+    Method-of-moments estimates per hyper-group: pooled within-group variance,
+    between-group variance (group-mean spread minus sampling noise) and the
+    precision-weighted population mean. Returns (mu, tau2, sigma2, n_groups).
+    """
+    n_hyper = hyper_index.max() + 1 if len(hyper_index) else 0
+    count = lambda w: np.bincount(hyper_index, weights=w, minlength=n_hyper)
+
+    within_df = count(n - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma2 = np.where(within_df > 0, count(m2) / within_df, DEFAULT_WITHIN_STD ** 2)
+
+    n_groups = np.bincount(hyper_index, minlength=n_hyper).astype(np.float64)
+    grand_mean = count(mean) / n_groups
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = count((mean - grand_mean[hyper_index]) ** 2) / (n_groups - 1)
+        noise = count(sigma2[hyper_index] / n) / n_groups
+        tau2 = np.where(n_groups > 1, np.maximum(spread - noise, MIN_BETWEEN_STD ** 2), DEFAULT_BETWEEN_STD ** 2)
+
+    weights = 1 / (tau2[hyper_index] + sigma2[hyper_index] / n)
+    mu = count(weights * mean) / count(weights)
+    return mu, tau2, sigma2, n_groups
+
+def group_posteriors(hyper_index, n, mean, mu, tau2, sigma2):
+    """Partially pooled posterior of each group mean: (mean, std, shrinkage)"""
+    tau2_g, sigma2_g = tau2[hyper_index], sigma2[hyper_index]
+    precision = 1 / tau2_g + n / sigma2_g
+    posterior_mean = (mu[hyper_index] / tau2_g + n * mean / sigma2_g) / precision
+    shrinkage = (sigma2_g / n) / (sigma2_g / n + tau2_g)
+    return posterior_mean, np.sqrt(1 / precision), shrinkage
+
+def refit(db_path=DB_PATH, full=False):
+    """
+    Fold new calculations into the group statistics and rewrite every group
+    and hyper-group prior in one transaction. full=True rebuilds from scratch,
+    as does any refit after a folded-in calculation was deleted or edited.
+    Returns (new rows read, number of groups).
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        ensure_schema(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        full = full or conn.execute("SELECT 1 FROM prior_refit_state WHERE name = ?", (STALE_FLAG,)).fetchone() is not None
+        if full:
+            conn.execute("DELETE FROM group_priors")
+            conn.execute("DELETE FROM group_hyperpriors")
+            conn.execute("DELETE FROM prior_refit_state WHERE name IN (?, ?)", (WATERMARK, STALE_FLAG))
+
+        row = conn.execute("SELECT value FROM prior_refit_state WHERE name = ?", (WATERMARK,)).fetchone()
+        watermark = row[0] if row else 0
+
+        stored = conn.execute(
+            "SELECT product, stress_type, method_name, n_samples, data_mean, data_m2 FROM group_priors"
+        ).fetchall()
+        stats = {tuple(r[:3]): (float(r[3]), r[4] or 0.0, r[5] or 0.0) for r in stored}
+
+        new_rows = 0
+        for last_rowid, keys, values in iter_new_rows(conn, watermark):
+            new_rows += len(values)
+            watermark = last_rowid
+            if len(values) == 0:
+                continue
+            unique, n_b, mean_b, m2_b = group_statistics(keys, values)
+            for key, n, mean, m2 in zip(unique, n_b, mean_b, m2_b):
+                key = tuple(key.split(KEY_SEPARATOR))
+                merged = merge_statistics(*stats.get(key, (0.0, 0.0, 0.0)), n, mean, m2)
+                stats[key] = tuple(float(v) for v in merged)
+
+        if stats:
+            keys = list(stats)
+            n, mean, m2 = (np.array(v, dtype=np.float64) for v in zip(*stats.values()))
+            hyper_keys, hyper_index = np.unique(np.array([KEY_SEPARATOR.join(k[1:]) for k in keys]), return_inverse=True)
+            mu, tau2, sigma2, n_groups = fit_hyperparameters(hyper_index, n, mean, m2)
+            prior_mean, prior_std, shrinkage = group_posteriors(hyper_index, n, mean, mu, tau2, sigma2)
+
+            conn.executemany("""
+                INSERT INTO group_priors (product, stress_type, method_name, n_samples, data_mean, data_m2,
+                                          prior_mean, prior_std, shrinkage, last_updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(product, stress_type, method_name) DO UPDATE SET
+                    n_samples = excluded.n_samples, data_mean = excluded.data_mean, data_m2 = excluded.data_m2,
+                    prior_mean = excluded.prior_mean, prior_std = excluded.prior_std,
+                    shrinkage = excluded.shrinkage, last_updated = CURRENT_TIMESTAMP
+            """, [
+                (*key, int(n[i]), float(mean[i]), float(m2[i]),
+                 float(prior_mean[i]), float(prior_std[i]), float(shrinkage[i]))
+                for i, key in enumerate(keys)
+            ])
+
+            samples = np.bincount(hyper_index, weights=n, minlength=len(hyper_keys))
+            conn.executemany("""
+                INSERT INTO group_hyperpriors (stress_type, method_name, population_mean, between_std,
+                                               within_std, n_groups, n_samples, last_updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(stress_type, method_name) DO UPDATE SET
+                    population_mean = excluded.population_mean, between_std = excluded.between_std,
+                    within_std = excluded.within_std, n_groups = excluded.n_groups,
+                    n_samples = excluded.n_samples, last_updated = CURRENT_TIMESTAMP
+            """, [
+                (*key.split(KEY_SEPARATOR), float(mu[h]), float(np.sqrt(tau2[h])), float(np.sqrt(sigma2[h])),
+                 int(n_groups[h]), int(samples[h]))
+                for h, key in enumerate(hyper_keys)
+            ])
+
+        conn.execute("INSERT OR REPLACE INTO prior_refit_state (name, value) VALUES (?, ?)", (WATERMARK, watermark))
+        conn.execute("COMMIT")
+        return new_rows, len(stats)
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def lookup_prior(product, stress_type, method_name, db_path=DB_PATH):
+    """Group prior, else the population prior of its stress type/method, else None"""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT prior_mean, prior_std, n_samples FROM group_priors "
+            "WHERE product = ? AND stress_type = ? AND method_name = ?",
+            (product, stress_type, method_name)
+        ).fetchone()
+        if row:
+            return {'prior_mean': row[0], 'prior_std': row[1], 'n_samples': row[2], 'level': 'group'}
+        row = conn.execute(
+            "SELECT population_mean, between_std, n_samples FROM group_hyperpriors "
+            "WHERE stress_type = ? AND method_name = ?", (stress_type, method_name)
+        ).fetchone()
+        if row:
+            return {'prior_mean': row[0], 'prior_std': row[1], 'n_samples': 0, 'level': 'population'}
+        return None
+    except sqlite3.OperationalError:
+        # Tables not created yet
+        return None
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    # Usage:
+    #   python hierarchicalPriors.py [--full] [--db PATH]
+    args = sys.argv[1:]
+    db_path = args[args.index('--db') + 1] if '--db' in args and args.index('--db') + 1 < len(args) else DB_PATH
+    new_rows, n_groups = refit(db_path, full='--full' in args)
+    print(f"✓ Folded {new_rows} new results into {n_groups} group priors")
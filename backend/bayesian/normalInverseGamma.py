@@ -0,0 +1,144 @@
+"""
+Normal-Inverse-Gamma Bayesian engine (unknown variance)
+Conjugate update of mean and variance from the replicate values themselves.
+The posterior of the mean and the posterior predictive of a new replicate
+are Student-t, so credible intervals are exact at small n (e.g. n=3).
+
+Everything is closed form and vectorized over a batch of samples.
+
+Model:
+    sigma^2       ~ InvGamma(alpha0, beta0)
+    mu | sigma^2  ~ Normal(mu0, sigma^2 / kappa0)
+    x_i | mu, sigma^2 ~ Normal(mu, sigma^2)
+"""
+
+import sys
+import json
+
+import numpy as np
+from scipy.special import stdtrit
+
+CREDIBLE_MASS = 0.95
+
+# Prior shape used when only a Normal prior (mean, SD of the mean) is stored:
+# alpha0 = 2 keeps E[sigma^2] finite while carrying the weight of ~4 observations
+DEFAULT_ALPHA0 = 2.0
+DEFAULT_EXPECTED_SD = 2.5 # Typical HPLC replicate SD (% RSD), as in server.js
+
+def nig_prior_from_normal(prior_mean, prior_std, expected_sd=DEFAULT_EXPECTED_SD, alpha0=DEFAULT_ALPHA0):
+    """
+    Map a stored Normal prior on the mean (method_priors.prior_mean/prior_std)
+    to NIG hyperparameters: E[sigma^2] = expected_sd^2 and the prior SD of
+    mu at that variance equals prior_std.
+    """
+    prior_mean, prior_std, expected_sd, alpha0 = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (prior_mean, prior_std, expected_sd, alpha0))
+    )
+    with np.errstate(divide='ignore'):
+        kappa0 = np.where(prior_std > 0, (expected_sd / prior_std) ** 2, 1e-6)
+    beta0 = (alpha0 - 1) * expected_sd ** 2
+    return prior_mean, kappa0, alpha0, beta0
+
+def replicate_statistics(replicates):
+    """
+    Sufficient statistics (n, mean, sum of squared deviations) for a ragged
+    list of replicate lists, computed on one NaN-padded matrix.
+    """
+    width = max((len(r) for r in replicates), default=0)
+    values = np.full((len(replicates), max(width, 1)), np.nan)
+    for i, row in enumerate(replicates):
+        values[i, :len(row)] = row
+
+    n = np.sum(~np.isnan(values), axis=1).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(n > 0, np.nansum(values, axis=1) / np.maximum(n, 1), 0.0)
+    ss = np.nansum((values - mean[:, None]) ** 2, axis=1)
+    return n, mean, ss
+
+def nig_update(mu0, kappa0, alpha0, beta0, n, mean, ss):
+    """Conjugate NIG posterior hyperparameters; all arguments broadcast as arrays"""
+    mu0, kappa0, alpha0, beta0, n, mean, ss = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (mu0, kappa0, alpha0, beta0, n, mean, ss))
+    )
+    kappa_n = kappa0 + n
+    mu_n = (kappa0 * mu0 + n * mean) / kappa_n
+    alpha_n = alpha0 + n / 2
+    beta_n = beta0 + 0.5 * ss + kappa0 * n * (mean - mu0) ** 2 / (2 * kappa_n)
+    return mu_n, kappa_n, alpha_n, beta_n
+
+def nig_summary(mu_n, kappa_n, alpha_n, beta_n, mass=CREDIBLE_MASS):
+    """
+    Student-t marginal posterior of the mean and posterior predictive of a
+    new replicate, with exact central credible intervals.
+    """
+    dof = 2 * alpha_n
+    t_critical = stdtrit(dof, 0.5 + mass / 2) # Student-t quantile as a raw ufunc
+    mean_scale = np.sqrt(beta_n / (alpha_n * kappa_n))
+    predictive_scale = np.sqrt(beta_n * (kappa_n + 1) / (alpha_n * kappa_n))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Student-t variance is finite only for dof > 2
+        mean_std = np.where(dof > 2, mean_scale * np.sqrt(dof / (dof - 2)), np.inf)
+        expected_variance = np.where(alpha_n > 1, beta_n / (alpha_n - 1), np.inf)
+
+    return {
+        "posterior_mean": mu_n,
+        "posterior_std": mean_std,
+        "lower_ci": mu_n - t_critical * mean_scale,
+        "upper_ci": mu_n + t_critical * mean_scale,
+        "predictive_lower": mu_n - t_critical * predictive_scale,
+        "predictive_upper": mu_n + t_critical * predictive_scale,
+        "degrees_of_freedom": dof,
+        "predictive_scale": predictive_scale,
+        "expected_variance": expected_variance,
+        "kappa_n": kappa_n,
+        "alpha_n": alpha_n,
+        "beta_n": beta_n
+    }
+
+def nig_batch_update(prior_means, prior_stds, replicates, expected_sd=DEFAULT_EXPECTED_SD, alpha0=DEFAULT_ALPHA0):
+    """Stored Normal priors + raw replicate lists -> dict of posterior arrays"""
+    n, mean, ss = replicate_statistics(replicates)
+    mu0, kappa0, alpha0, beta0 = nig_prior_from_normal(prior_means, prior_stds, expected_sd, alpha0)
+    summary = nig_summary(*nig_update(mu0, kappa0, alpha0, beta0, n, mean, ss))
+    summary["prior_weight"] = kappa0 / summary["kappa_n"]
+    summary["data_weight"] = n / summary["kappa_n"]
+    summary["n"] = n
+    return summary
+
+def summary_results(summary):
+    """Split nig_batch_update() arrays into per-sample result dicts"""
+    return [
+        {
+            "model": "normal_inverse_gamma",
+            "posterior_mean": float(summary["posterior_mean"][i]),
+            "posterior_std": float(summary["posterior_std"][i]),
+            "credible_interval_95": [float(summary["lower_ci"][i]), float(summary["upper_ci"][i])],
+            "predictive_interval_95": [float(summary["predictive_lower"][i]), float(summary["predictive_upper"][i])],
+            "degrees_of_freedom": float(summary["degrees_of_freedom"][i]),
+            "expected_std": float(np.sqrt(summary["expected_variance"][i])),
+            "prior_weight": float(summary["prior_weight"][i]),
+            "data_weight": float(summary["data_weight"][i]),
+            "n": int(summary["n"][i])
+        }
+        for i in range(len(summary["posterior_mean"]))
+    ]
+
+if __name__ == "__main__":
+    # Usage: echo '[{"prior_mean": 100, "prior_std": 2.5, "replicates": [97.1, 98.4, 96.9]}, ...]' \
+    #            | python normalInverseGamma.py
+    try:
+        data = json.loads(sys.stdin.read())
+        payloads = data if isinstance(data, list) else [data]
+        results = summary_results(nig_batch_update(
+            [p['prior_mean'] for p in payloads],
+            [p['prior_std'] for p in payloads],
+            [p['replicates'] for p in payloads],
+            [p.get('expected_sd', DEFAULT_EXPECTED_SD) for p in payloads]
+        ))
+        print(json.dumps(results if isinstance(data, list) else results[0]))
+        sys.stdout.flush()
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.stdout.flush()
+        sys.exit(1)
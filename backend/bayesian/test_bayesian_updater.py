@@ -0,0 +1,116 @@
+"""
+Batch and sequential Bayesian updating: vectorized results vs the scalar
+update, and persisted method_priors vs a full recomputation
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import subprocess
+
+import numpy as np
+
+from bayesianUpdater import (bayesian_update, bayesian_batch_update, batch_results, update_payloads,
+                             apply_online_updates, replay_posterior)
+
+BAYESIAN_DIR = os.path.dirname(os.path.abspath(__file__))
+UPDATER = os.path.join(BAYESIAN_DIR, 'bayesianUpdater.py')
+PRIORS_SQL = os.path.join(os.path.dirname(BAYESIAN_DIR), 'migrations', 'add_bayesian_tables.sql')
+
+def make_priors_db(path):
+    conn = sqlite3.connect(path)
+    with open(PRIORS_SQL, 'r') as f:
+        conn.executescript(f.read())
+    conn.close()
+
+def stored_prior(path, method_name):
+    conn = sqlite3.connect(path)
+    row = conn.execute("SELECT prior_mean, prior_std, n_samples FROM method_priors WHERE method_name = ?",
+                       (method_name,)).fetchone()
+    conn.close()
+    return row
+
+def test_batch_matches_scalar_update():
+    rng = np.random.default_rng(0)
+    n_rows = 500
+    prior_means, data_means = rng.uniform(90, 110, n_rows), rng.uniform(80, 110, n_rows)
+    prior_stds, data_stds = rng.uniform(0, 5, n_rows), rng.uniform(0, 4, n_rows)
+    prior_stds[:10] = 0      # no prior spread
+    data_stds[10:20] = 0     # no data spread
+    n = rng.integers(1, 6, n_rows)
+
+    batch = batch_results(bayesian_batch_update(prior_means, prior_stds, data_means, data_stds, n))
+    for i, result in enumerate(batch):
+        expected = bayesian_update(prior_means[i], prior_stds[i], data_means[i], data_stds[i], int(n[i]))
+        for key in ('posterior_mean', 'posterior_std', 'prior_weight', 'data_weight'):
+            assert np.isclose(result[key], expected[key], rtol=1e-12, atol=0), key
+        np.testing.assert_allclose(result['credible_interval_95'], expected['credible_interval_95'], rtol=1e-12)
+
+def test_payload_errors_stay_per_row():
+    results = update_payloads([
+        {'prior_mean': 100, 'prior_std': 2.5, 'data_mean': 97, 'data_std': 1.2},
+        {'prior_mean': 100},
+        42
+    ])
+    assert results[0] == bayesian_update(100, 2.5, 97, 1.2, 3)
+    assert 'error' in results[1] and 'error' in results[2]
+
+def test_cli_accepts_object_and_list():
+    payload = {'prior_mean': 98, 'prior_std': 2, 'data_mean': 95, 'data_std': 1.5, 'n': 3}
+    run = lambda data: json.loads(subprocess.run([sys.executable, UPDATER], input=json.dumps(data),
+                                                 check=True, capture_output=True, text=True).stdout)
+    single = run(payload)
+    assert run([payload, payload]) == [single, single]
+
+def test_online_updates_match_full_recomputation():
+    rng = np.random.default_rng(1)
+    history = [{'method_name': 'CIMB', 'data_mean': float(m), 'data_std': float(s), 'n': 3}
+               for m, s in zip(rng.normal(98, 2, 200), rng.uniform(0.5, 3, 200))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'priors.db')
+        make_priors_db(db_path)
+        for start in range(0, len(history), 7):
+            apply_online_updates(history[start:start + 7], db_path)
+
+        mean, std, n_samples = stored_prior(db_path, 'CIMB')
+        expected_mean, expected_std = replay_posterior(100.0, 2.0, [h['data_mean'] for h in history],
+                                                       [h['data_std'] for h in history], 3)
+        assert np.isclose(mean, expected_mean, rtol=1e-12, atol=0)
+        assert np.isclose(std, expected_std, rtol=1e-12, atol=0)
+        assert n_samples == 1 + 3 * len(history)
+        # Other methods are untouched
+        assert stored_prior(db_path, 'LK-IMB') == (100.0, 2.5, 1)
+
+def test_first_online_update_matches_scalar_update():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'priors.db')
+        make_priors_db(db_path)
+        first, unknown = apply_online_updates([
+            {'method_name': 'LK-IMB', 'data_mean': 97, 'data_std': 1.2},
+            {'method_name': 'NOPE', 'data_mean': 97, 'data_std': 1.2}
+        ], db_path)
+
+        expected = bayesian_update(100.0, 2.5, 97, 1.2, 3)
+        for key in ('posterior_mean', 'posterior_std', 'prior_weight', 'data_weight'):
+            assert np.isclose(first[key], expected[key], rtol=1e-12, atol=0), key
+        assert 'error' in unknown
+        assert stored_prior(db_path, 'LK-IMB')[:2] == (first['posterior_mean'], first['posterior_std'])
+
+def test_invalid_online_payloads_do_not_roll_back_the_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'priors.db')
+        make_priors_db(db_path)
+        results = apply_online_updates([
+            {'method_name': 'LK-IMB', 'data_mean': 97, 'data_std': 1.2},
+            {'method_name': 'LK-IMB', 'data_mean': 'n/a', 'data_std': 1.2},
+            {'method_name': 'LK-IMB', 'data_std': 1.2},
+            {'method_name': 'LK-IMB', 'data_mean': 96, 'data_std': 1.2, 'n': 0},
+            {'method_name': 'CIMB', 'data_mean': 99, 'data_std': 1.0}
+        ], db_path)
+
+        assert [('error' in r) for r in results] == [False, True, True, True, False]
+        assert stored_prior(db_path, 'LK-IMB')[:2] == (results[0]['posterior_mean'], results[0]['posterior_std'])
+        assert stored_prior(db_path, 'CIMB')[:2] == (results[4]['posterior_mean'], results[4]['posterior_std'])
@@ -0,0 +1,121 @@
+"""
+Hierarchical priors: incremental refits, pooling and lookups
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+
+import hierarchicalPriors
+
+STRESS_TYPES = ['Acid', 'Base', 'Oxidative', 'Photolytic', 'Thermal']
+
+def make_calculations_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE calculations (id TEXT PRIMARY KEY, sample_id TEXT, stress_type TEXT,
+                    smb REAL, amb REAL, rmb REAL, lk_imb REAL, cimb REAL)""")
+    conn.commit()
+    conn.close()
+
+def add_calculations(path, n_rows, start, rng, n_products=60, between_std=1.5, within_std=2.0):
+    product_means = 100 + np.random.default_rng(99).normal(0, between_std, n_products)
+    products = rng.integers(0, n_products, n_rows)
+    stresses = rng.integers(0, len(STRESS_TYPES), n_rows)
+    lk_imb = product_means[products] + rng.normal(0, within_std, n_rows)
+    cimb = lk_imb + rng.normal(0.5, 1.0, n_rows)
+
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO calculations VALUES (?, ?, ?, NULL, NULL, NULL, ?, ?)", [
+        (str(start + i), f"P{p}", STRESS_TYPES[s], float(a), float(c))
+        for i, (p, s, a, c) in enumerate(zip(products, stresses, lk_imb, cimb))
+    ])
+    # Rows without a product cannot be assigned to a group
+    conn.execute("INSERT INTO calculations VALUES (?, '', 'Acid', NULL, NULL, NULL, 99.0, 99.0)", (f"blank-{start}",))
+    conn.commit()
+    conn.close()
+
+def group_rows(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("""SELECT product, stress_type, method_name, n_samples, data_mean, data_m2, prior_mean, prior_std
+                           FROM group_priors ORDER BY product, stress_type, method_name""").fetchall()
+    conn.close()
+    return rows
+
+def test_incremental_refit_matches_full_rebuild():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'calc.db')
+        make_calculations_db(db_path)
+
+        add_calculations(db_path, 6000, 0, rng)
+        assert hierarchicalPriors.refit(db_path) == (12000, 600)
+        add_calculations(db_path, 900, 6000, rng)
+        assert hierarchicalPriors.refit(db_path)[0] == 1800   # only the new rows are read
+        assert hierarchicalPriors.refit(db_path)[0] == 0
+        incremental = group_rows(db_path)
+
+        hierarchicalPriors.refit(db_path, full=True)
+        for a, b in zip(incremental, group_rows(db_path)):
+            assert a[:4] == b[:4]
+            np.testing.assert_allclose(a[4:], b[4:], rtol=1e-9, atol=1e-9)
+
+def test_deleted_calculations_leave_the_priors():
+    rng = np.random.default_rng(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'calc.db')
+        make_calculations_db(db_path)
+        add_calculations(db_path, 2000, 0, rng)
+        hierarchicalPriors.refit(db_path)
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM calculations WHERE sample_id = 'P3' OR CAST(id AS INTEGER) % 7 = 0")
+        conn.commit()
+        conn.close()
+        hierarchicalPriors.refit(db_path)   # notices the deletes and rebuilds
+        after_delete = group_rows(db_path)
+        assert not [row for row in after_delete if row[0] == 'P3']
+
+        hierarchicalPriors.refit(db_path, full=True)
+        assert after_delete == group_rows(db_path)
+
+def test_hyperparameters_recover_simulated_spread():
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'calc.db')
+        make_calculations_db(db_path)
+        add_calculations(db_path, 30000, 0, rng, n_products=200)
+        hierarchicalPriors.refit(db_path)
+
+        conn = sqlite3.connect(db_path)
+        between, within = np.array(conn.execute(
+            "SELECT between_std, within_std FROM group_hyperpriors WHERE method_name = 'LK-IMB'").fetchall()).T
+        conn.close()
+        assert np.all(np.abs(between - 1.5) < 0.3)
+        assert np.all(np.abs(within - 2.0) < 0.1)
+
+def test_small_groups_are_shrunk_toward_population():
+    hyper_index = np.array([0, 0, 0])
+    n = np.array([1.0, 50.0, 50.0])
+    mean = np.array([110.0, 100.0, 101.0])
+    m2 = np.array([0.0, 49 * 4.0, 49 * 4.0])
+    mu, tau2, sigma2, _ = hierarchicalPriors.fit_hyperparameters(hyper_index, n, mean, m2)
+    posterior_mean, posterior_std, shrinkage = hierarchicalPriors.group_posteriors(hyper_index, n, mean, mu, tau2, sigma2)
+
+    assert shrinkage[0] > shrinkage[1]
+    assert abs(posterior_mean[0] - 110) > abs(posterior_mean[1] - 100)
+    assert posterior_std[0] > posterior_std[1]
+
+def test_lookup_falls_back_to_population_prior():
+    rng = np.random.default_rng(2)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'calc.db')
+        make_calculations_db(db_path)
+        assert hierarchicalPriors.lookup_prior('P1', 'Acid', 'CIMB', db_path) is None
+
+        add_calculations(db_path, 3000, 0, rng)
+        hierarchicalPriors.refit(db_path)
+        assert hierarchicalPriors.lookup_prior('P1', 'Acid', 'CIMB', db_path)['level'] == 'group'
+        assert hierarchicalPriors.lookup_prior('new', 'Acid', 'CIMB', db_path)['level'] == 'population'
+        assert hierarchicalPriors.lookup_prior('new', 'Unknown', 'CIMB', db_path) is None
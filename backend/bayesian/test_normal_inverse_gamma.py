@@ -0,0 +1,57 @@
+"""
+Normal-Inverse-Gamma engine: closed-form Student-t intervals
+"""
+
+import numpy as np
+from scipy import stats
+
+from normalInverseGamma import (nig_update, nig_summary, nig_prior_from_normal, nig_batch_update,
+                                replicate_statistics, summary_results)
+from bayesianUpdater import update_payloads
+
+REPLICATES = [97.1, 98.4, 96.9]
+
+def test_vague_prior_gives_classical_t_interval():
+    x = np.array(REPLICATES)
+    # kappa0 -> 0, alpha0 = -1/2, beta0 = 0 is the reference prior
+    summary = nig_summary(*nig_update(0.0, 1e-12, -0.5, 0.0, len(x), x.mean(), ((x - x.mean()) ** 2).sum()))
+    margin = stats.t.ppf(0.975, len(x) - 1) * x.std(ddof=1) / np.sqrt(len(x))
+    np.testing.assert_allclose([summary['lower_ci'][0], summary['upper_ci'][0]],
+                               [x.mean() - margin, x.mean() + margin], rtol=1e-9)
+
+def test_intervals_match_monte_carlo():
+    x = np.array(REPLICATES)
+    mu_n, kappa_n, alpha_n, beta_n = nig_update(*nig_prior_from_normal(100.0, 2.5), len(x), x.mean(),
+                                                ((x - x.mean()) ** 2).sum())
+    rng = np.random.default_rng(0)
+    variance = 1 / rng.gamma(alpha_n[0], 1 / beta_n[0], 400000)
+    mu = rng.normal(mu_n[0], np.sqrt(variance / kappa_n[0]))
+    new_replicate = rng.normal(mu, np.sqrt(variance))
+
+    summary = nig_summary(mu_n, kappa_n, alpha_n, beta_n)
+    np.testing.assert_allclose(np.quantile(mu, [0.025, 0.975]),
+                               [summary['lower_ci'][0], summary['upper_ci'][0]], atol=0.03)
+    np.testing.assert_allclose(np.quantile(new_replicate, [0.025, 0.975]),
+                               [summary['predictive_lower'][0], summary['predictive_upper'][0]], atol=0.05)
+
+def test_ragged_batch_matches_rows():
+    rng = np.random.default_rng(3)
+    replicates = [list(rng.normal(98, 2, rng.integers(1, 7))) for _ in range(50)]
+    prior_means, prior_stds = rng.uniform(95, 105, 50), rng.uniform(1, 5, 50)
+
+    n, mean, ss = replicate_statistics(replicates)
+    assert list(n) == [len(r) for r in replicates]
+    np.testing.assert_allclose(ss, [np.sum((np.array(r) - np.mean(r)) ** 2) for r in replicates], atol=1e-9)
+
+    batch = summary_results(nig_batch_update(prior_means, prior_stds, replicates))
+    for i in (0, 17, 49):
+        assert batch[i] == summary_results(nig_batch_update(prior_means[i], prior_stds[i], [replicates[i]]))[0]
+
+def test_payloads_with_replicates_use_nig():
+    known, unknown = update_payloads([
+        {'prior_mean': 100, 'prior_std': 2.5, 'data_mean': 97, 'data_std': 1.2},
+        {'prior_mean': 100, 'prior_std': 2.5, 'replicates': REPLICATES}
+    ])
+    assert 'model' not in known
+    assert unknown['model'] == 'normal_inverse_gamma' and unknown['n'] == 3
+    assert unknown['credible_interval_95'][0] < unknown['posterior_mean'] < unknown['credible_interval_95'][1]
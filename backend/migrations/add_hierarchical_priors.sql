@@ -0,0 +1,55 @@
+-- Partial-pooling (empirical Bayes) priors per product, stress type and method
+-- Running per-group statistics (n, mean, M2) let refits read only new calculations
+CREATE TABLE IF NOT EXISTS group_priors (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product TEXT NOT NULL,
+    stress_type TEXT NOT NULL,
+    method_name TEXT NOT NULL,
+    n_samples INTEGER NOT NULL DEFAULT 0,
+    data_mean REAL,
+    data_m2 REAL,
+    prior_mean REAL,
+    prior_std REAL,
+    shrinkage REAL,
+    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_group_priors_group
+    ON group_priors (product, stress_type, method_name);
+
+-- Population-level hyperparameters per stress type and method (prior for unseen products)
+CREATE TABLE IF NOT EXISTS group_hyperpriors (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stress_type TEXT NOT NULL,
+    method_name TEXT NOT NULL,
+    population_mean REAL NOT NULL,
+    between_std REAL NOT NULL,
+    within_std REAL NOT NULL,
+    n_groups INTEGER DEFAULT 0,
+    n_samples INTEGER DEFAULT 0,
+    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(stress_type, method_name)
+);
+
+-- Refit state: highest calculations rowid already folded into group_priors
+-- (calculations_rowid) and the stale flag set by the triggers below
+CREATE TABLE IF NOT EXISTS prior_refit_state (
+    name TEXT PRIMARY KEY,
+    value INTEGER
+);
+
+-- Deleting or editing a calculation that is already folded in makes the running
+-- statistics stale; flag it so the next refit rebuilds from scratch
+CREATE TRIGGER IF NOT EXISTS calculations_prior_refit_delete
+AFTER DELETE ON calculations
+WHEN OLD.rowid <= (SELECT value FROM prior_refit_state WHERE name = 'calculations_rowid')
+BEGIN
+    INSERT OR REPLACE INTO prior_refit_state (name, value) VALUES ('calculations_stale', 1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS calculations_prior_refit_update
+AFTER UPDATE OF sample_id, stress_type, smb, amb, rmb, lk_imb, cimb ON calculations
+WHEN OLD.rowid <= (SELECT value FROM prior_refit_state WHERE name = 'calculations_rowid')
+BEGIN
+    INSERT OR REPLACE INTO prior_refit_state (name, value) VALUES ('calculations_stale', 1);
+END;
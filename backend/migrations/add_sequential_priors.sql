@@ -0,0 +1,12 @@
+-- Running sufficient statistics for sequential Bayesian updating of method_priors
+-- posterior_precision = 1 / prior_std^2, weighted_mean_sum = posterior_precision * prior_mean
+ALTER TABLE method_priors ADD COLUMN posterior_precision REAL;
+ALTER TABLE method_priors ADD COLUMN weighted_mean_sum REAL;
+
+UPDATE method_priors
+SET posterior_precision = CASE WHEN prior_std > 0 THEN 1.0 / (prior_std * prior_std) ELSE 1e-6 END
+WHERE posterior_precision IS NULL;
+
+UPDATE method_priors
+SET weighted_mean_sum = posterior_precision * prior_mean
+WHERE weighted_mean_sum IS NULL;
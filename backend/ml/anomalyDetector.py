@@ -1,65 +1,133 @@
 import json
 import os
+import sys
+import sqlite3
 import joblib
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest, RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
+from treeEnsemble import CompiledIsolationForest, CompiledRandomForest
+import modelRegistry
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, 'ml_data', 'anomaly_training_data.json')
 MODEL_DIR = os.path.join(BASE_DIR, 'ml_models')
+DB_PATH = os.path.join(BASE_DIR, 'mass_balance.db')
+
+FEATURES = ['mass_balance', 'degradation', 'recovery', 'purity']
+
+# Database training: rows fetched per cursor round trip, and the most rows
+# ever held in memory for fitting, however large the table grows
+CHUNK_SIZE = 10000
+MAX_TRAINING_ROWS = 100000
+
+# Maps calculations columns to the model features the same way server.js
+# builds the detectAnomaly() input (LK-IMB as mass balance and recovery
+# proxy, fixed purity proxy). The anomaly label is the rule-based OOS
+# criterion on the recommended mass balance only: the stored status is also
+# forced to OOS by the ML anomaly flag, and training on it would feed the
+# model's own predictions back in as labels.
+OOS_LIMITS = (95.0, 105.0)
+
+CALCULATION_FEATURES_SQL = f"""
+    SELECT lk_imb AS mass_balance,
+           degradation_level AS degradation,
+           lk_imb AS recovery,
+           99.5 AS purity,
+           CASE WHEN recommended_value < {OOS_LIMITS[0]} OR recommended_value > {OOS_LIMITS[1]}
+                THEN 1 ELSE 0 END AS is_anomaly
+    FROM calculations
+    WHERE lk_imb IS NOT NULL AND degradation_level IS NOT NULL
+      AND recommended_value IS NOT NULL
+"""
 
 # Ensure model directory exists
 if not os.path.exists(MODEL_DIR):
     os.makedirs(MODEL_DIR)
 
-def train_models():
-    print("Loading training data...")
-    try:
-        with open(DATA_PATH, 'r') as f:
-            data = json.load(f)
-            df = pd.DataFrame(data)
-    except FileNotFoundError:
-        print(f"Error: Training data not found at {DATA_PATH}")
-        return
+def export_compiled_models(iso_forest, rf_classifier, features, output_dir=MODEL_DIR):
+    """
+    Flatten the trained trees into packed NumPy arrays (.npz) so that
+    mlService.py can score without importing scikit-learn
+    """
+    iso_path = os.path.join(output_dir, 'isolation_forest.npz')
+    CompiledIsolationForest.from_estimator(iso_forest, features).save(iso_path)
+    print(f"✓ Compiled Isolation Forest saved to {iso_path}")
 
-    # Features
-    features = ['mass_balance', 'degradation', 'recovery', 'purity']
-    X = df[features]
-    y = df['is_anomaly']
+    if rf_classifier is not None:
+        rf_path = os.path.join(output_dir, 'random_forest.npz')
+        CompiledRandomForest.from_estimator(rf_classifier, features).save(rf_path)
+        print(f"✓ Compiled Random Forest saved to {rf_path}")
 
-    print(f"Training on {len(df)} samples...")
+def export_saved_models():
+    """Compile the joblib models already in ml_models/ without retraining"""
+    iso_forest = joblib.load(os.path.join(MODEL_DIR, 'isolation_forest.joblib'))
+    rf_path = os.path.join(MODEL_DIR, 'random_forest.joblib')
+    rf_classifier = joblib.load(rf_path) if os.path.exists(rf_path) else None
+
+    with open(os.path.join(MODEL_DIR, 'model_features.json'), 'r') as f:
+        features = json.load(f)
 
+    export_compiled_models(iso_forest, rf_classifier, features)
+
+def save_models(iso_forest, rf_classifier, features, metadata):
+    """
+    Write one training run to the model registry and make it live.
+    Scorers pick the new version up from the registry's `current` pointer.
+    """
+    output_dir = modelRegistry.stage()
+
+    joblib.dump(iso_forest, os.path.join(output_dir, 'isolation_forest.joblib'))
+    if rf_classifier is not None:
+        joblib.dump(rf_classifier, os.path.join(output_dir, 'random_forest.joblib'))
+
+    # Save feature names for inference
+    with open(os.path.join(output_dir, 'model_features.json'), 'w') as f:
+        json.dump(features, f)
+
+    # Export the sklearn-free serving format next to the joblib files
+    export_compiled_models(iso_forest, rf_classifier, features, output_dir)
+
+    metadata = dict(metadata, features=features)
+    version = modelRegistry.publish(output_dir, metadata)
+    print(f"✓ Model version {version} is now current ({modelRegistry.version_dir(version)})")
+    return version
+
+# Random forest trees grow to full depth. On large --from-db training sets that
+# means millions of nodes; the compiled model then skips its per-node attribution
+# table (treeEnsemble.PATH_TABLE_MAX_BYTES) and computes attributions on the walk
+MODEL_PARAMS = {
+    'isolation_forest': {'contamination': 0.1, 'random_state': 42},
+    'random_forest': {'n_estimators': 100, 'random_state': 42}
+}
+
+def fit_models(X, y, features, params=MODEL_PARAMS):
+    """Fit both models on one training set. Returns (iso_forest, rf_classifier, metrics)."""
     # 1. Isolation Forest (Unsupervised Anomaly Detection)
     # Contamination is expected proportion of outliers
-    iso_forest = IsolationForest(contamination=0.1, random_state=42)
+    iso_forest = IsolationForest(**params['isolation_forest'])
     iso_forest.fit(X)
-    
-    # Save Isolation Forest
-    iso_path = os.path.join(MODEL_DIR, 'isolation_forest.joblib')
-    joblib.dump(iso_forest, iso_path)
-    print(f"✓ Isolation Forest saved to {iso_path}")
+    print("✓ Isolation Forest trained")
+
+    rf_classifier = None
+    metrics = {}
 
     # 2. Random Forest Classifier (Supervised)
-    # Only if we have labeled data (which we do)
-    if 'is_anomaly' in df.columns:
+    # Only if we have labeled data with both classes
+    if y is not None and len(np.unique(y)) > 1:
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
-        rf_classifier = RandomForestClassifier(n_estimators=100, random_state=42)
+        rf_classifier = RandomForestClassifier(**params['random_forest'])
         rf_classifier.fit(X_train, y_train)
         
         # Evaluate
         y_pred = rf_classifier.predict(X_test)
         print("\nRandom Forest Performance:")
-        print(classification_report(y_test, y_pred))
-        
-        # Save Random Forest
-        rf_path = os.path.join(MODEL_DIR, 'random_forest.joblib')
-        joblib.dump(rf_classifier, rf_path)
-        print(f"✓ Random Forest saved to {rf_path}")
+        print(classification_report(y_test, y_pred, zero_division=0))
+        metrics['random_forest'] = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
 
         # Feature Importance
         importances = rf_classifier.feature_importances_
@@ -67,11 +135,208 @@ def train_models():
         print("\nFeature Importance:")
         for feature, importance in feature_importance.items():
             print(f"  {feature}: {importance:.4f}")
-            
-        # Save feature names for inference
-        features_path = os.path.join(MODEL_DIR, 'model_features.json')
-        with open(features_path, 'w') as f:
-            json.dump(features, f)
+        metrics['feature_importance'] = {f: float(v) for f, v in feature_importance.items()}
+    else:
+        print("Skipping Random Forest: labels missing or single-class")
+
+    return iso_forest, rf_classifier, metrics
+
+def train_models():
+    print("Loading training data...")
+    try:
+        with open(DATA_PATH, 'r') as f:
+            data = json.load(f)
+            df = pd.DataFrame(data)
+    except FileNotFoundError:
+        print(f"Error: Training data not found at {DATA_PATH}")
+        return
+
+    # Features
+    features = FEATURES
+    X = df[features]
+    y = df['is_anomaly'] if 'is_anomaly' in df.columns else None
+
+    print(f"Training on {len(df)} samples...")
+    iso_forest, rf_classifier, metrics = fit_models(X, y, features)
+
+    return save_models(iso_forest, rf_classifier, features, {
+        'source': os.path.relpath(DATA_PATH, BASE_DIR),
+        'training_rows': int(len(df)),
+        'params': MODEL_PARAMS,
+        'metrics': metrics
+    })
+
+def load_json_training_matrix():
+    """ml_data/ training records as (X, y) float64 / int arrays"""
+    with open(DATA_PATH, 'r') as f:
+        data = json.load(f)
+    X = np.array([[row[f] for f in FEATURES] for row in data], dtype=np.float64)
+    y = np.array([int(row.get('is_anomaly', 0)) for row in data], dtype=np.int64)
+    return X, y
+
+def iter_calculation_chunks(db_path=DB_PATH, chunk_size=CHUNK_SIZE):
+    """
+    Stream (X, y) arrays from the calculations table, chunk_size rows at a
+    time, through a single cursor. Only one chunk is alive at once.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(CALCULATION_FEATURES_SQL)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk = np.array(rows, dtype=np.float64)
+            yield chunk[:, :len(FEATURES)], chunk[:, len(FEATURES)].astype(np.int64)
+    finally:
+        conn.close()
+
+def count_calculation_rows(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM ({CALCULATION_FEATURES_SQL})").fetchone()[0]
+    finally:
+        conn.close()
+
+class ChunkSubsampler:
+    """
+    Keeps the same fraction of every chunk, sized from the table's row count
+    so the sample never exceeds max_rows. The fractional share of each chunk
+    is carried over to the next, so small chunks at a low rate still add up
+    to the expected sample instead of each rounding down to nothing.
+    """
+
+    def __init__(self, max_rows, total_rows, seed=42):
+        self.rate = min(1.0, max_rows / max(total_rows, 1))
+        self.max_rows = max_rows
+        self.rng = np.random.default_rng(seed)
+        self.X, self.y = [], []
+        self.rows_seen = 0
+        self.rows_kept = 0
+        self.carry = 0.0
+
+    def add(self, X, y):
+        self.rows_seen += len(X)
+        self.carry += len(X) * self.rate
+        quota = int(self.carry)
+        self.carry -= quota
+        keep = min(quota, self.max_rows - self.rows_kept)
+        if keep <= 0:
+            return
+        idx = np.sort(self.rng.choice(len(X), size=keep, replace=False))
+        self.X.append(X[idx])
+        self.y.append(y[idx])
+        self.rows_kept += keep
+
+    def sample(self):
+        if not self.X:
+            return np.empty((0, len(FEATURES))), np.empty(0, dtype=np.int64)
+        return np.concatenate(self.X), np.concatenate(self.y)
+
+class ReservoirSampler:
+    """
+    Uniform sample of at most max_rows rows from a stream of unknown length
+    (Algorithm R, vectorized per chunk). Memory is fixed at max_rows rows.
+    """
+
+    def __init__(self, max_rows, seed=42):
+        self.max_rows = max_rows
+        self.rng = np.random.default_rng(seed)
+        self.X = np.empty((max_rows, len(FEATURES)))
+        self.y = np.empty(max_rows, dtype=np.int64)
+        self.rows_seen = 0
+
+    def add(self, X, y):
+        n = len(X)
+        # Fill the reservoir first
+        fill = min(max(self.max_rows - self.rows_seen, 0), n)
+        if fill:
+            self.X[self.rows_seen:self.rows_seen + fill] = X[:fill]
+            self.y[self.rows_seen:self.rows_seen + fill] = y[:fill]
+
+        # Row t (0-based over the stream) replaces slot j ~ U[0, t] if j < max_rows
+        if fill < n:
+            t = self.rows_seen + np.arange(fill, n)
+            slots = (self.rng.random(n - fill) * (t + 1)).astype(np.int64)
+            hits = np.nonzero(slots < self.max_rows)[0]
+            # When a slot is hit twice in one chunk the later row wins
+            last = len(hits) - 1 - np.unique(slots[hits][::-1], return_index=True)[1]
+            rows = fill + hits[last]
+            self.X[slots[hits][last]] = X[rows]
+            self.y[slots[hits][last]] = y[rows]
+
+        self.rows_seen += n
+
+    def sample(self):
+        kept = min(self.rows_seen, self.max_rows)
+        return self.X[:kept].copy(), self.y[:kept].copy()
+
+def sample_calculations(db_path=DB_PATH, sampling='chunk', max_rows=MAX_TRAINING_ROWS,
+                        chunk_size=CHUNK_SIZE, seed=42):
+    """Stream calculations through a sampler. Returns (X, y, rows_seen)."""
+    if sampling == 'reservoir':
+        sampler = ReservoirSampler(max_rows, seed)
+    elif sampling == 'chunk':
+        sampler = ChunkSubsampler(max_rows, count_calculation_rows(db_path), seed)
+    else:
+        raise ValueError(f"Unknown sampling mode: {sampling}")
+
+    print(f"Streaming calculations from {db_path} ({sampling} sampling, {max_rows} row budget)...")
+    for X_chunk, y_chunk in iter_calculation_chunks(db_path, chunk_size):
+        sampler.add(X_chunk, y_chunk)
+
+    X, y = sampler.sample()
+    return X, y, sampler.rows_seen
+
+def train_from_database(db_path=DB_PATH, sampling='chunk', max_rows=MAX_TRAINING_ROWS,
+                        chunk_size=CHUNK_SIZE, seed=42):
+    """
+    Train from the calculations table in mass_balance.db instead of the JSON
+    file. Rows are streamed in chunks and sampled down to max_rows:
+    'chunk' keeps a fixed fraction of every chunk, 'reservoir' keeps a
+    uniform reservoir sample of the whole stream.
+    """
+    if not os.path.exists(db_path):
+        print(f"Error: Database not found at {db_path}")
+        return
+
+    X, y, rows_seen = sample_calculations(db_path, sampling, max_rows, chunk_size, seed)
+    if len(X) == 0:
+        print("Error: No usable rows in the calculations table")
+        return
+
+    print(f"Training on {len(X)} of {rows_seen} samples...")
+    iso_forest, rf_classifier, metrics = fit_models(X, y, FEATURES)
+
+    return save_models(iso_forest, rf_classifier, FEATURES, {
+        'source': 'calculations',
+        'sampling': sampling,
+        'training_rows': int(len(X)),
+        'table_rows': int(rows_seen),
+        'params': MODEL_PARAMS,
+        'metrics': metrics
+    })
+
+def option_value(args, flag, default):
+    if flag in args and args.index(flag) + 1 < len(args):
+        return args[args.index(flag) + 1]
+    return default
 
 if __name__ == "__main__":
-    train_models()
+    # Usage:
+    #   python anomalyDetector.py                      train from ml_data/ JSON
+    #   python anomalyDetector.py --from-db [--reservoir] [--max-rows N]
+    #                             [--chunk-size N] [--db PATH]
+    #   python anomalyDetector.py --export             compile flat ml_models/ files
+    args = sys.argv[1:]
+    if '--export' in args:
+        export_saved_models()
+    elif '--from-db' in args:
+        train_from_database(
+            db_path=option_value(args, '--db', DB_PATH),
+            sampling='reservoir' if '--reservoir' in args else 'chunk',
+            max_rows=int(option_value(args, '--max-rows', MAX_TRAINING_ROWS)),
+            chunk_size=int(option_value(args, '--chunk-size', CHUNK_SIZE))
+        )
+    else:
+        train_models()
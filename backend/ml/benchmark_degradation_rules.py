@@ -0,0 +1,95 @@
+"""
+Degradation Rule Microbenchmark
+Per-molecule cost of predict_products() with every rule's reaction SMARTS
+parsed and condition-checked on each call (previous behaviour) vs reactions
+compiled once and indexed by stress type
+
+Usage:
+    python ml/benchmark_degradation_rules.py [repeats]
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+
+from rdkit import RDLogger
+from rdkit.Chem import AllChem
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+
+import degradationPredictor
+from degradationPredictor import DegradationProductPredictor, CompiledRule, RULES_PATH
+
+STRESS_TYPES = ['acid', 'base', 'oxidative', 'thermal', 'photolytic']
+
+MOLECULES = {
+    "aspirin": "CC(=O)Oc1ccccc1C(=O)O",
+    "paracetamol": "CC(=O)Nc1ccc(O)cc1",
+    "aspartame": "O=C(O)C[C@H](N)C(=O)N[C@@H](Cc1ccccc1)C(=O)OC",
+    "penicillin G": "CC1(C)S[C@@H]2[C@H](NC(=O)Cc3ccccc3)C(=O)N2[C@H]1C(=O)O"
+}
+
+class PerCallRules:
+    """Rule index that walks and re-parses the whole table on every lookup, as before"""
+
+    def __init__(self, path):
+        with open(path, 'r') as f:
+            self.rules = json.load(f)['rules']
+
+    def get(self, stress_type, default=None):
+        return [
+            CompiledRule(category, name, rule['description'], AllChem.ReactionFromSmarts(rule['smarts']))
+            for category, rules in self.rules.items()
+            for name, rule in rules.items()
+            if stress_type in rule['conditions']
+        ]
+
+def per_molecule_us(predictor, smiles, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for s in smiles:
+            for stress_type in STRESS_TYPES:
+                predictor.predict_products(s, stress_type)
+        timings.append((time.perf_counter() - start) / (len(smiles) * len(STRESS_TYPES)))
+    return statistics.median(timings) * 1e6
+
+def main():
+    RDLogger.DisableLog('rdApp.*')
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    smiles = list(MOLECULES.values())
+
+    compiled = DegradationProductPredictor()
+    per_call = DegradationProductPredictor()
+    per_call.rules_by_condition = PerCallRules(RULES_PATH)
+    for stress_type in STRESS_TYPES:
+        assert compiled.predict_products(smiles[0], stress_type) == per_call.predict_products(smiles[0], stress_type)
+
+    start = time.perf_counter()
+    degradationPredictor._compiled_rules.clear()
+    degradationPredictor.load_degradation_rules()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    before = per_molecule_us(per_call, smiles, repeats)
+    after = per_molecule_us(compiled, smiles, repeats)
+
+    print("=" * 66)
+    print("Degradation rules: parsed per call vs compiled and indexed")
+    print("=" * 66)
+    print(f"One-time rule load + compile: {load_ms:.2f} ms")
+    print(f"{'call':<32} {'per call us':>12} {'compiled us':>12} {'speedup':>7}")
+    print(f"{'predict_products':<32} {before:>12.1f} {after:>12.1f} {before / after:>6.1f}x")
+
+    report = {
+        "rules_load_ms": round(load_ms, 3),
+        "stress_types": STRESS_TYPES,
+        "per_call_us": round(before, 1),
+        "compiled_us": round(after, 1)
+    }
+    print("\n" + json.dumps(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Descriptor Matrix Benchmark
+Library-scale descriptor_matrix() throughput (molecules/s) by worker count,
+against calculate_descriptors() called one SMILES at a time
+
+Usage:
+    python ml/benchmark_descriptor_matrix.py [library_size]
+"""
+
+import os
+import sys
+import json
+import time
+
+from rdkit import RDLogger
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+
+from molecularFeatures import MolecularFeatureExtractor, descriptor_matrix
+
+DATA_PATH = os.path.join(os.path.dirname(ML_DIR), 'ml_data', 'gnn_training_data.json')
+
+def virtual_library(size):
+    """Reference APIs with growing alkyl chains, so few SMILES repeat"""
+    with open(DATA_PATH, 'r') as f:
+        base = [record['smiles'] for record in json.load(f)]
+    return ("C" * (i // len(base) % 12) + base[i % len(base)] for i in range(size))
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    RDLogger.DisableLog('rdApp.*')
+    cores = os.cpu_count() or 1
+
+    print("=" * 60)
+    print(f"descriptor_matrix() over {size} SMILES ({cores} cores)")
+    print("=" * 60)
+
+    extractor = MolecularFeatureExtractor(cache_size=0)
+    start = time.perf_counter()
+    for smiles in virtual_library(size):
+        try:
+            extractor.calculate_descriptors(smiles)
+        except ValueError:
+            pass
+    baseline = size / (time.perf_counter() - start)
+    print(f"{'per-SMILES dicts':<22} {baseline:>10.0f} molecules/s")
+
+    report = {"library_size": size, "molecules_per_s": {"per_smiles_dicts": round(baseline, 1)}}
+    for n_jobs in sorted({1, 2, 4, cores}):
+        if n_jobs > cores:
+            continue
+        start = time.perf_counter()
+        X, valid = descriptor_matrix(virtual_library(size), n_jobs=n_jobs)
+        rate = size / (time.perf_counter() - start)
+        print(f"{'n_jobs=' + str(n_jobs):<22} {rate:>10.0f} molecules/s  ({rate / baseline:.1f}x, "
+              f"{int(valid.sum())} valid, {X.nbytes / 1024:.0f} KB)")
+        report["molecules_per_s"][f"n_jobs_{n_jobs}"] = round(rate, 1)
+
+    print("\n" + json.dumps(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Batched GNN Inference Benchmark
+One predict() call per molecule vs a single predict_batch() forward pass
+over a block-diagonal sparse adjacency. Graphs are featurized once up front
+(graph cache), so the timings compare the model and packing overhead.
+
+Usage:
+    python ml/benchmark_gnn_batch.py [molecules] [repeats]
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+
+import torch
+from rdkit import RDLogger
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+
+from gnnPredictor import GNNPredictor
+
+DRUGS = [
+    "CC(=O)Oc1ccccc1C(=O)O",                           # aspirin
+    "CC(=O)Nc1ccc(O)cc1",                              # paracetamol
+    "CN1C=NC2=C1C(=O)N(C(=O)N2C)C",                    # caffeine
+    "CC(C)Cc1ccc(cc1)C(C)C(=O)O",                      # ibuprofen
+    "O=C(O)C[C@H](N)C(=O)N[C@@H](Cc1ccccc1)C(=O)OC",   # aspartame
+    "CC1(C)S[C@@H]2[C@H](NC(=O)Cc3ccccc3)C(=O)N2[C@H]1C(=O)O"  # penicillin G
+]
+
+def molecules(count):
+    """Distinct inputs: the drugs above, then alkyl-extended variants of them"""
+    return [DRUGS[i % len(DRUGS)] + "C" * (i // len(DRUGS)) if i >= len(DRUGS) else DRUGS[i]
+            for i in range(count)]
+
+def median_s(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1200
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    RDLogger.DisableLog('rdApp.*')
+    torch.manual_seed(0)
+
+    smiles = molecules(count)
+    predictor = GNNPredictor(cache_size=count)
+    start = time.perf_counter()
+    batched = predictor.predict_batch(smiles)  # fills the graph cache
+    featurize_s = time.perf_counter() - start
+    assert batched == [predictor.predict(s) for s in smiles]
+
+    t_single = median_s(lambda: [predictor.predict(s) for s in smiles], repeats)
+    t_batch = median_s(lambda: predictor.predict_batch(smiles), repeats)
+
+    print("=" * 60)
+    print(f"GNN inference on {count} molecules (graphs cached)")
+    print("=" * 60)
+    print(f"First pass incl. featurization: {featurize_s * 1000:.1f} ms")
+    print(f"{'mode':<26} {'total ms':>10} {'per molecule us':>16}")
+    print(f"{'predict() per molecule':<26} {t_single * 1000:>10.1f} {t_single / count * 1e6:>16.1f}")
+    print(f"{'predict_batch()':<26} {t_batch * 1000:>10.1f} {t_batch / count * 1e6:>16.1f}")
+    print(f"Speedup: {t_single / t_batch:.1f}x")
+
+    report = {
+        "molecules": count,
+        "first_pass_ms": round(featurize_s * 1000, 1),
+        "per_molecule_ms": round(t_single * 1000, 1),
+        "batch_ms": round(t_batch * 1000, 1)
+    }
+    print("\n" + json.dumps(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+GNN Atom Featurization Benchmark
+Original per-atom feature loop vs GNNPredictor.atom_features (one per-atom
+comprehension of integer properties, then array scaling and one-hot),
+over peptide chains of growing size
+
+Usage:
+    python ml/benchmark_gnn_featurize.py [repeats]
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+
+from rdkit import Chem
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+
+from gnnPredictor import GNNPredictor
+from test_gnn_featurize import loop_atom_features
+
+RESIDUES = [1, 4, 16, 64, 256, 1024]
+
+def peptide(residues):
+    """Poly-phenylalanine: aromatic rings, amides and SP3 backbone atoms"""
+    return "NCC(=O)" + "N[C@@H](Cc1ccccc1)C(=O)" * residues + "O"
+
+def time_call(fn, mol, repeats):
+    fn(mol)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(mol)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    predictor = GNNPredictor(cache_size=0)
+
+    print("=" * 60)
+    print("GNN atom featurization: per-atom loop vs array scaling")
+    print("=" * 60)
+    print(f"{'atoms':>7} {'loop ms':>10} {'array ms':>14} {'speedup':>8} {'max |diff|':>11}")
+
+    report = []
+    for residues in RESIDUES:
+        mol = Chem.MolFromSmiles(peptide(residues))
+        t_loop = time_call(loop_atom_features, mol, repeats)
+        t_vec = time_call(predictor.atom_features, mol, repeats)
+        diff = (loop_atom_features(mol) - predictor.atom_features(mol)).abs().max().item()
+
+        print(f"{mol.GetNumAtoms():>7} {t_loop * 1000:>10.3f} {t_vec * 1000:>14.3f}"
+              f" {t_loop / t_vec:>7.1f}x {diff:>11.1e}")
+        report.append({
+            "atoms": mol.GetNumAtoms(),
+            "featurize_ms": {"loop": round(t_loop * 1000, 3), "array": round(t_vec * 1000, 3)}
+        })
+
+    print("\n" + json.dumps(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+GNN Quantization Benchmark
+fp32 MolecularGNN vs the int8 dynamically quantized model: accuracy delta on
+the reference molecules in ml_data/gnn_training_data.json and forward-pass
+throughput (molecules/s) over a virtual library built from them
+
+Usage:
+    python ml/benchmark_gnn_quantization.py [library_size] [batch_size]
+"""
+
+import os
+import sys
+import json
+import time
+
+import torch
+from rdkit import RDLogger
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+
+from gnnModel import quantize_model
+from gnnPredictor import GNNPredictor
+from gnnTrainer import DATA_PATH
+
+def accuracy_delta(fp32, int8, graphs):
+    """Score differences on the reference set, molecule by molecule"""
+    x, adj, batch, sizes = GNNPredictor.pack_graphs(graphs)
+    with torch.no_grad():
+        atoms_fp32, molecules_fp32 = fp32(x, adj, batch, len(graphs))
+        atoms_int8, molecules_int8 = int8(x, adj, batch, len(graphs))
+
+    atom_diff = (atoms_fp32 - atoms_int8).abs()
+    molecule_diff = (molecules_fp32 - molecules_int8).abs()
+    same_top_atom = sum(
+        int(a.argmax() == b.argmax())
+        for a, b in zip(atoms_fp32.split(sizes.tolist()), atoms_int8.split(sizes.tolist()))
+    )
+    return {
+        "molecules": len(graphs),
+        "atoms": int(x.shape[0]),
+        "atom_lability_abs_diff": {"mean": atom_diff.mean().item(), "max": atom_diff.max().item()},
+        # overall_susceptibility is reported in percent
+        "susceptibility_abs_diff_pct": {"mean": molecule_diff.mean().item() * 100,
+                                        "max": molecule_diff.max().item() * 100},
+        "same_most_labile_atom": same_top_atom / len(graphs)
+    }
+
+def throughput(model, packed_batches, num_molecules, repeats=3):
+    """Best-of-N molecules per second over the pre-featurized library"""
+    best = float('inf')
+    with torch.no_grad():
+        for x, adj, batch, count in packed_batches[:1]:
+            model(x, adj, batch, count)  # warm-up
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for x, adj, batch, count in packed_batches:
+                model(x, adj, batch, count)
+            best = min(best, time.perf_counter() - start)
+    return num_molecules / best
+
+def main():
+    library_size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    RDLogger.DisableLog('rdApp.*')
+
+    predictor = GNNPredictor(cache_size=0)
+    fp32 = predictor.model
+    int8 = quantize_model(fp32)
+
+    with open(DATA_PATH, 'r') as f:
+        smiles = [record['smiles'] for record in json.load(f)]
+    graphs = [g for g in (predictor.smiles_to_edges(s) for s in smiles) if g is not None]
+
+    library = [graphs[i % len(graphs)] for i in range(library_size)]
+    packed_batches = []
+    for start in range(0, library_size, batch_size):
+        chunk = library[start:start + batch_size]
+        x, adj, batch, _ = GNNPredictor.pack_graphs(chunk)
+        packed_batches.append((x, adj, batch, len(chunk)))
+
+    delta = accuracy_delta(fp32, int8, graphs)
+    rate_fp32 = throughput(fp32, packed_batches, library_size)
+    rate_int8 = throughput(int8, packed_batches, library_size)
+
+    print("=" * 64)
+    print("MolecularGNN: fp32 vs int8 dynamic quantization (CPU)")
+    print("=" * 64)
+    print(f"Reference set: {delta['molecules']} molecules, {delta['atoms']} atoms")
+    print(f"  atom lability |diff|     mean {delta['atom_lability_abs_diff']['mean']:.5f}"
+          f"  max {delta['atom_lability_abs_diff']['max']:.5f}")
+    print(f"  susceptibility |diff| %  mean {delta['susceptibility_abs_diff_pct']['mean']:.3f}"
+          f"  max {delta['susceptibility_abs_diff_pct']['max']:.3f}")
+    print(f"  same most-labile atom    {delta['same_most_labile_atom'] * 100:.1f}% of molecules")
+    print(f"\nThroughput ({library_size} molecules, batches of {batch_size}, "
+          f"{torch.get_num_threads()} threads):")
+    print(f"  fp32  {rate_fp32:>10.0f} molecules/s")
+    print(f"  int8  {rate_int8:>10.0f} molecules/s  ({rate_int8 / rate_fp32:.2f}x)")
+
+    print("\n" + json.dumps({
+        "accuracy": delta,
+        "molecules_per_s": {"fp32": round(rate_fp32, 1), "int8": round(rate_int8, 1)}
+    }))
+
+if __name__ == "__main__":
+    main()
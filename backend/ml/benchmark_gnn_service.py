@@ -0,0 +1,118 @@
+"""
+GNN Service Latency Benchmark
+p50 / p99 request latency of the persistent gnnPredictor.py --serve worker
+under concurrent load, against one gnnPredictor.py process per request as
+/api/ml/gnn-predict used to spawn
+
+Usage:
+    python ml/benchmark_gnn_service.py [requests_per_level] [spawn_runs]
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+PREDICTOR = os.path.join(ML_DIR, 'gnnPredictor.py')
+
+CONCURRENCY = [1, 4, 16, 64]
+SMILES = [
+    "CC(=O)Oc1ccccc1C(=O)O",
+    "CN1C=NC2=C1C(=O)N(C(=O)N2C)C",
+    "O=C(O)C[C@H](N)C(=O)N[C@@H](Cc1ccccc1)C(=O)OC",
+    "CC(C)Cc1ccc(cc1)C(C)C(=O)O",
+    "CC(=O)Nc1ccc(O)cc1",
+    "NCC(=O)" + "N[C@@H](Cc1ccccc1)C(=O)" * 10 + "O"
+]
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+class ServiceClient:
+    """Send id-tagged lines to one --serve worker from many threads"""
+
+    def __init__(self):
+        self.proc = subprocess.Popen([sys.executable, PREDICTOR, '--serve'], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, text=True, bufsize=1)
+        self.ready = json.loads(self.proc.stdout.readline())
+        self.lock = threading.Lock()
+        self.waiting = {}
+        self.next_id = 0
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            response = json.loads(line)
+            slot = self.waiting.pop(response.get('id'), None)
+            if slot:
+                slot[1] = response
+                slot[0].set()
+
+    def request(self, smiles):
+        slot = [threading.Event(), None]
+        with self.lock:
+            self.next_id += 1
+            self.waiting[self.next_id] = slot
+            self.proc.stdin.write(json.dumps({"id": self.next_id, "smiles": smiles}) + "\n")
+            self.proc.stdin.flush()
+        slot[0].wait()
+        return slot[1]
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def run_level(client, concurrency, total):
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(lambda i: timed(client.request, SMILES[i % len(SMILES)]), range(total)))
+
+def spawn_once(smiles):
+    subprocess.run([sys.executable, PREDICTOR, smiles], capture_output=True, check=True)
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    spawn_runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    start = time.perf_counter()
+    client = ServiceClient()
+    startup = time.perf_counter() - start
+
+    print("=" * 64)
+    print("GNN service: request latency under concurrent load")
+    print("=" * 64)
+    print(f"Worker ready in {startup:.2f}s: {json.dumps(client.ready)}")
+    print(f"{'clients':>8} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+
+    report = {"startup_s": round(startup, 3), "levels": []}
+    try:
+        for concurrency in CONCURRENCY:
+            run_level(client, concurrency, min(total, 50))  # warm-up
+            start = time.perf_counter()
+            latencies = run_level(client, concurrency, total)
+            throughput = total / (time.perf_counter() - start)
+            p50, p99 = percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+            print(f"{concurrency:>8} {total:>9} {p50:>9.2f} {p99:>9.2f} {throughput:>9.0f}")
+            report["levels"].append({"clients": concurrency, "p50_ms": round(p50, 2),
+                                     "p99_ms": round(p99, 2), "requests_per_s": round(throughput, 1)})
+    finally:
+        client.close()
+
+    spawn = [timed(spawn_once, SMILES[i % len(SMILES)]) * 1000 for i in range(spawn_runs)]
+    print(f"\nOne process per request (sequential, {spawn_runs} runs): "
+          f"p50 {percentile(spawn, 50):.0f} ms, max {max(spawn):.0f} ms")
+    report["process_per_request_p50_ms"] = round(percentile(spawn, 50), 1)
+
+    print("\n" + json.dumps(report))
+
+if __name__ == "__main__":
+    main()
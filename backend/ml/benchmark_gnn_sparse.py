@@ -0,0 +1,100 @@
+"""
+GNN Message Passing Benchmark
+Dense [N, N] matmul vs torch.sparse vs edge-list (index_add) aggregation in
+gnnModel.GraphConvolution, over molecule-like graphs of growing size
+
+Usage:
+    python ml/benchmark_gnn_sparse.py [repeats]
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+
+import torch
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+
+from gnnModel import MolecularGNN
+
+SIZES = [10, 30, 100, 300, 1000, 3000]
+
+def molecule_like_graph(num_atoms, seed=0):
+    """
+    Random connected graph shaped like a large organic molecule: a backbone
+    tree (each atom bonds to one of the 3 previous atoms) plus ring closures,
+    ~1.15 bonds per atom, bond orders 1-2, self-loops as in gnnPredictor.
+    """
+    g = torch.Generator().manual_seed(seed)
+    child = torch.arange(1, num_atoms)
+    parent = (child - 1 - torch.randint(0, 3, (num_atoms - 1,), generator=g)).clamp(min=0)
+    n_rings = num_atoms // 7
+    ring_a = torch.randint(0, num_atoms, (n_rings,), generator=g)
+    ring_b = (ring_a + 5).clamp(max=num_atoms - 1)
+    keep = ring_a != ring_b
+
+    begin = torch.cat([parent, ring_a[keep]])
+    end = torch.cat([child, ring_b[keep]])
+    order = torch.randint(1, 3, (len(begin),), generator=g).float()
+    loops = torch.arange(num_atoms)
+
+    edge_index = torch.stack([torch.cat([begin, end, loops]), torch.cat([end, begin, loops])])
+    edge_weight = torch.cat([order, order, torch.ones(num_atoms)])
+    x = torch.rand(num_atoms, 16, generator=g)
+    return x, edge_index, edge_weight
+
+def time_forward(model, x, adj, repeats):
+    timings = []
+    with torch.no_grad():
+        model(x, adj)  # warm-up
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(x, adj)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    torch.manual_seed(0)
+    model = MolecularGNN().eval()
+
+    print("=" * 72)
+    print("GraphConvolution: dense vs sparse message passing (forward pass)")
+    print("=" * 72)
+    print(f"{'atoms':>7} {'edges':>7} {'dense ms':>10} {'torch.sparse':>13} {'edge list':>10}"
+          f" {'dense adj':>11} {'edge list':>10} {'max |diff|':>11}")
+
+    report = []
+    for num_atoms in SIZES:
+        x, edge_index, edge_weight = molecule_like_graph(num_atoms)
+        sparse = torch.sparse_coo_tensor(edge_index, edge_weight, (num_atoms, num_atoms),
+                                         check_invariants=False).coalesce()
+        dense = sparse.to_dense()
+        edges = (edge_index, edge_weight)
+
+        t_dense = time_forward(model, x, dense, repeats)
+        t_sparse = time_forward(model, x, sparse, repeats)
+        t_edges = time_forward(model, x, edges, repeats)
+
+        with torch.no_grad():
+            diff = (model(x, dense)[0] - model(x, edges)[0]).abs().max().item()
+        dense_bytes = dense.element_size() * dense.nelement()
+        edge_bytes = edge_index.element_size() * edge_index.nelement() + edge_weight.element_size() * edge_weight.nelement()
+
+        print(f"{num_atoms:>7} {edge_index.shape[1]:>7} {t_dense * 1000:>10.3f} {t_sparse * 1000:>13.3f}"
+              f" {t_edges * 1000:>10.3f} {dense_bytes / 1024:>9.0f}KB {edge_bytes / 1024:>8.0f}KB {diff:>11.1e}")
+        report.append({
+            "atoms": num_atoms,
+            "edges": int(edge_index.shape[1]),
+            "forward_ms": {"dense": round(t_dense * 1000, 3), "torch_sparse": round(t_sparse * 1000, 3),
+                           "edge_list": round(t_edges * 1000, 3)},
+            "adjacency_kb": {"dense": round(dense_bytes / 1024, 1), "edge_list": round(edge_bytes / 1024, 1)}
+        })
+
+    print("\n" + json.dumps(report))
+
+if __name__ == "__main__":
+    main()
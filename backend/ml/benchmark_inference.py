@@ -0,0 +1,118 @@
+"""
+Inference Startup Benchmark
+Compares the old pandas + joblib scoring path with the NumPy path in mlService.py
+
+Usage:
+    python ml/benchmark_inference.py [runs]
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+import statistics
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(os.path.dirname(ML_DIR), 'ml_models')
+sys.path.insert(0, ML_DIR)
+
+SAMPLE = {"mass_balance": 95.0, "degradation": 5.0, "recovery": 98.0, "purity": 97.0}
+
+# Cold start of one scoring process, as server.js used to pay per calculation
+OLD_PATH = f"""
+import sys, warnings
+warnings.filterwarnings("ignore")
+sys.path.insert(0, {ML_DIR!r})
+import joblib
+import pandas as pd
+import mlService
+iso_forest = joblib.load({os.path.join(MODEL_DIR, 'isolation_forest.joblib')!r})
+rf_classifier = joblib.load({os.path.join(MODEL_DIR, 'random_forest.joblib')!r})
+X = pd.DataFrame([{SAMPLE!r}])[mlService.FEATURES]
+iso_forest.decision_function(X)
+iso_forest.predict(X)
+rf_classifier.predict_proba(X)
+"""
+
+NEW_PATH = f"""
+import sys
+sys.path.insert(0, {ML_DIR!r})
+import mlService
+mlService.predict({SAMPLE!r})
+"""
+
+def time_cold_start(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def time_import(module, runs):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True).stdout
+        timings.append(float(out))
+    return statistics.median(timings)
+
+def time_per_call(fn, iterations=2000):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("=" * 60)
+    print("mlService Inference Startup Benchmark")
+    print("=" * 60)
+
+    print(f"\n1. Cold start (median of {runs} fresh interpreters):")
+    old_cold = time_cold_start(OLD_PATH, runs)
+    new_cold = time_cold_start(NEW_PATH, runs)
+    print(f"  pandas + joblib path: {old_cold * 1000:8.1f} ms")
+    print(f"  NumPy path:           {new_cold * 1000:8.1f} ms")
+
+    print(f"\n2. Import time (median of {runs}):")
+    print(f"  pandas:      {time_import('pandas', runs) * 1000:8.1f} ms")
+    print(f"  numpy:       {time_import('numpy', runs) * 1000:8.1f} ms")
+
+    print("\n3. Feature matrix per call:")
+    import pandas as pd
+    import mlService
+    old_build = time_per_call(lambda: pd.DataFrame([SAMPLE])[mlService.FEATURES])
+    new_build = time_per_call(lambda: mlService.build_feature_matrix([SAMPLE]))
+    print(f"  pd.DataFrame:         {old_build * 1e6:8.1f} us")
+    print(f"  build_feature_matrix: {new_build * 1e6:8.1f} us")
+
+    print("\n4. Warm single-record predict per call:")
+    import joblib
+    sklearn_models = (joblib.load(os.path.join(MODEL_DIR, 'isolation_forest.joblib')),
+                      joblib.load(os.path.join(MODEL_DIR, 'random_forest.joblib')))
+    models = mlService.load_models()
+
+    def old_predict():
+        X = pd.DataFrame([SAMPLE])[mlService.FEATURES]
+        sklearn_models[0].decision_function(X)
+        sklearn_models[0].predict(X)
+        sklearn_models[1].predict_proba(X)
+
+    old_warm = time_per_call(old_predict, 200)
+    new_warm = time_per_call(lambda: mlService.predict(SAMPLE, models), 200)
+    print(f"  pandas + joblib path: {old_warm * 1000:8.2f} ms")
+    print(f"  NumPy path:           {new_warm * 1000:8.2f} ms")
+
+    print("\n" + json.dumps({
+        "cold_start_ms": {"pandas": round(old_cold * 1000, 1), "numpy": round(new_cold * 1000, 1)},
+        "feature_matrix_us": {"pandas": round(old_build * 1e6, 1), "numpy": round(new_build * 1e6, 1)},
+        "warm_predict_ms": {"pandas": round(old_warm * 1000, 2), "numpy": round(new_warm * 1000, 2)}
+    }))
+
+if __name__ == "__main__":
+    main()
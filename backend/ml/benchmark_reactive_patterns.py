@@ -0,0 +1,86 @@
+"""
+Reactive Pattern Microbenchmark
+Per-molecule cost of identify_reactive_sites() and estimate_degradation_rate()
+with the SMARTS library compiled on every call (previous behaviour) vs the
+shared precompiled library
+
+Usage:
+    python ml/benchmark_reactive_patterns.py [repeats]
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+
+from rdkit import Chem
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+
+import molecularFeatures
+from molecularFeatures import MolecularFeatureExtractor, PATTERNS_PATH
+
+MOLECULES = {
+    "aspirin": "CC(=O)Oc1ccccc1C(=O)O",
+    "atorvastatin-like": "CC(C)c1nc2cc(F)ccc2c(CC(O)CC(O)CC(=O)O)c1-c1ccc(F)cc1",
+    "aspartame": "O=C(O)C[C@H](N)C(=O)N[C@@H](Cc1ccccc1)C(=O)OC",
+    "penicillin G": "CC1(C)S[C@@H]2[C@H](NC(=O)Cc3ccccc3)C(=O)N2[C@H]1C(=O)O"
+}
+
+class PerCallPatterns(dict):
+    """Pattern table that re-parses every SMARTS on iteration, as before precompilation"""
+
+    def __init__(self, path):
+        with open(path, 'r') as f:
+            super().__init__((name, entry['smarts']) for name, entry in json.load(f)['patterns'].items())
+
+    def items(self):
+        return [(name, Chem.MolFromSmarts(smarts)) for name, smarts in super().items()]
+
+def per_molecule_us(fn, smiles, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for s in smiles:
+            fn(s)
+        timings.append((time.perf_counter() - start) / len(smiles))
+    return statistics.median(timings) * 1e6
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    smiles = list(MOLECULES.values())
+
+    # Without the molecule cache, so every call runs the pattern search
+    compiled = MolecularFeatureExtractor(cache_size=0)
+    per_call = MolecularFeatureExtractor(cache_size=0)
+    per_call.reactive_patterns = PerCallPatterns(PATTERNS_PATH)
+    assert compiled.identify_reactive_sites(smiles[0]) == per_call.identify_reactive_sites(smiles[0])
+
+    start = time.perf_counter()
+    molecularFeatures._compiled_patterns.clear()
+    molecularFeatures.load_reactive_patterns()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    print("=" * 66)
+    print("Reactive SMARTS: compiled per call vs precompiled (per molecule)")
+    print("=" * 66)
+    print(f"One-time library load + compile: {load_ms:.2f} ms")
+    print(f"{'call':<32} {'per call us':>12} {'precompiled us':>15} {'speedup':>7}")
+
+    report = {"library_load_ms": round(load_ms, 3), "calls": []}
+    calls = [
+        ("identify_reactive_sites", lambda e: e.identify_reactive_sites),
+        ("estimate_degradation_rate", lambda e: lambda s: e.estimate_degradation_rate(s, 'oxidative'))
+    ]
+    for name, bind in calls:
+        before = per_molecule_us(bind(per_call), smiles, repeats)
+        after = per_molecule_us(bind(compiled), smiles, repeats)
+        print(f"{name:<32} {before:>12.1f} {after:>15.1f} {before / after:>6.1f}x")
+        report["calls"].append({"call": name, "per_call_us": round(before, 1), "precompiled_us": round(after, 1)})
+
+    print("\n" + json.dumps(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Reactive Site Scan Benchmark
+Reactive sites plus element counts on molecules of growing size:
+- per pattern: one GetSubstructMatches call per pattern and four Python
+  loops over the atoms for element counts (previous behaviour)
+- catalog: a FilterCatalog screen of all patterns, then GetSubstructMatches
+  for the patterns present, with bincount element counts (kept for reference)
+- current: the same per-pattern search with one bincount over atomic numbers
+
+Usage:
+    python ml/benchmark_reactive_scan.py [repeats]
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+
+from rdkit import Chem
+from rdkit.Chem.FilterCatalog import FilterCatalog, FilterCatalogEntry, SmartsMatcher
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ML_DIR)
+
+from molecularFeatures import load_reactive_patterns, element_counts, HALOGENS
+
+# Peptide-like repeat units: amides everywhere, esters / thioethers / phenols mixed in
+UNITS = ["N[C@@H](Cc1ccccc1)C(=O)", "N[C@@H](CCSC)C(=O)", "N[C@@H](Cc1ccc(O)cc1)C(=O)",
+         "N[C@@H](CC(=O)OC)C(=O)"]
+SIZES = [1, 4, 16, 64, 256]
+
+def large_molecule(repeats):
+    return Chem.MolFromSmiles("NCC(=O)" + "".join(UNITS[i % len(UNITS)] for i in range(repeats)) + "O")
+
+def search_sites(patterns, mol):
+    return {name: mol.GetSubstructMatches(pattern) for name, pattern in patterns.items()}
+
+def per_pattern(patterns, mol):
+    sites = search_sites(patterns, mol)
+    counts = (
+        sum(1 for atom in mol.GetAtoms() if atom.GetAtomicNum() == 7),
+        sum(1 for atom in mol.GetAtoms() if atom.GetAtomicNum() == 8),
+        sum(1 for atom in mol.GetAtoms() if atom.GetAtomicNum() == 16),
+        sum(1 for atom in mol.GetAtoms() if atom.GetAtomicNum() in HALOGENS)
+    )
+    return sites, counts
+
+def screening_catalog(patterns):
+    catalog = FilterCatalog()
+    for name, pattern in patterns.items():
+        catalog.AddEntry(FilterCatalogEntry(name, SmartsMatcher(name, pattern, 1)))
+    return catalog
+
+def catalog_screened(catalog, patterns, mol):
+    present = {entry.GetDescription() for entry in catalog.GetMatches(mol)}
+    sites = {name: mol.GetSubstructMatches(pattern) if name in present else ()
+             for name, pattern in patterns.items()}
+    elements = element_counts(mol)
+    return sites, (elements[7], elements[8], elements[16], elements[HALOGENS].sum())
+
+def current(patterns, mol):
+    elements = element_counts(mol)
+    return search_sites(patterns, mol), (elements[7], elements[8], elements[16], elements[HALOGENS].sum())
+
+def median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    patterns = load_reactive_patterns()
+    catalog = screening_catalog(patterns)
+
+    print("=" * 66)
+    print("Reactive sites + element counts: per pattern vs catalog vs current")
+    print("=" * 66)
+    print(f"{'atoms':>7} {'per pattern ms':>15} {'catalog ms':>11} {'current ms':>11} {'speedup':>8}")
+
+    report = []
+    for size in SIZES:
+        mol = large_molecule(size)
+        expected = per_pattern(patterns, mol)
+        assert expected == current(patterns, mol) == catalog_screened(catalog, patterns, mol)
+        before = median_ms(lambda: per_pattern(patterns, mol), repeats)
+        screened = median_ms(lambda: catalog_screened(catalog, patterns, mol), repeats)
+        after = median_ms(lambda: current(patterns, mol), repeats)
+        print(f"{mol.GetNumAtoms():>7} {before:>15.3f} {screened:>11.3f} {after:>11.3f} {before / after:>7.1f}x")
+        report.append({"atoms": mol.GetNumAtoms(), "per_pattern_ms": round(before, 3),
+                       "catalog_ms": round(screened, 3), "current_ms": round(after, 3)})
+
+    print("\n" + json.dumps(report))
+
+if __name__ == "__main__":
+    main()
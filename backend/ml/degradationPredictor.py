@@ -6,67 +6,51 @@ Applies chemical transformation rules to predict degradation products
 from rdkit import Chem
 from rdkit.Chem import AllChem, Descriptors
 import json
+import os
+from collections import namedtuple
 from molecularFeatures import MolecularFeatureExtractor
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RULES_PATH = os.path.join(BASE_DIR, 'ml_data', 'degradation_rules.json')
+
+CompiledRule = namedtuple('CompiledRule', ['category', 'name', 'description', 'reaction'])
+
+# Compiled rule sets by file path, shared by every predictor
+_compiled_rules = {}
+
+def load_degradation_rules(path=RULES_PATH):
+    """
+    Versioned rule file compiled once per file and process.
+    Returns (version, raw rules, {stress type: [CompiledRule]}) with each
+    stress type's rules in file order.
+    """
+    path = os.path.abspath(path)
+    if path not in _compiled_rules:
+        with open(path, 'r') as f:
+            library = json.load(f)
+
+        by_condition = {}
+        for category, rules in library['rules'].items():
+            for rule_name, rule_data in rules.items():
+                try:
+                    rxn = AllChem.ReactionFromSmarts(rule_data['smarts'])
+                except ValueError:
+                    rxn = None
+                if rxn is None:
+                    raise ValueError(f"Invalid reaction SMARTS for rule '{rule_name}': {rule_data['smarts']}")
+                rxn.Initialize()
+                rule = CompiledRule(category, rule_name, rule_data['description'], rxn)
+                for condition in rule_data['conditions']:
+                    by_condition.setdefault(condition, []).append(rule)
+        _compiled_rules[path] = (library.get('version'), library['rules'], by_condition)
+    return _compiled_rules[path]
+
 class DegradationProductPredictor:
-    def __init__(self):
+    def __init__(self, rules_path=RULES_PATH):
         self.feature_extractor = MolecularFeatureExtractor()
         
-        self.degradation_rules = {
-            'acid_hydrolysis': {
-                'ester_hydrolysis': {
-                    'smarts': '[C,c:1](=[O:2])[O:3][C,c:4]>>[C,c:1](=[O:2])[OH].[C,c:4][O:3][H]',
-                    'description': 'Ester hydrolysis to carboxylic acid + alcohol',
-                    'conditions': ['acid', 'base']
-                },
-                'amide_hydrolysis': {
-                    'smarts': '[C,c:1](=[O:2])[N:3][C,c:4]>>[C,c:1](=[O:2])[OH].[C,c:4][N:3][H]',
-                    'description': 'Amide hydrolysis to carboxylic acid + amine',
-                    'conditions': ['acid', 'base']
-                },
-                'lactone_opening': {
-                    'smarts': '[C,c:1](=[O:2])[O:3][C,c:4]>>[C,c:1](=[O:2])[OH].[C,c:4][O:3][H]',
-                    'description': 'Lactone ring opening',
-                    'conditions': ['acid', 'base']
-                }
-            },
-            'oxidation': {
-                'alcohol_oxidation': {
-                    'smarts': '[C][CH2][OH]>>[C][CH]=O',
-                    'description': 'Primary alcohol to aldehyde',
-                    'conditions': ['oxidative']
-                },
-                'secondary_alcohol_oxidation': {
-                    'smarts': '[C][CH]([OH])[C]>>[C][C](=O)[C]',
-                    'description': 'Secondary alcohol to ketone',
-                    'conditions': ['oxidative']
-                },
-                'sulfide_oxidation': {
-                    'smarts': '[C][S][C]>>[C][S](=O)[C]',
-                    'description': 'Sulfide to sulfoxide',
-                    'conditions': ['oxidative']
-                },
-                'amine_oxidation': {
-                    'smarts': '[C][NH2]>>[C][NH]=O',
-                    'description': 'Primary amine N-oxidation',
-                    'conditions': ['oxidative']
-                }
-            },
-            'decarboxylation': {
-                'carboxylic_acid_loss': {
-                    'smarts': '[C][C](=O)[OH]>>[C]',
-                    'description': 'Decarboxylation (loss of CO2)',
-                    'conditions': ['thermal', 'photolytic']
-                }
-            },
-            'photolysis': {
-                'aromatic_hydroxylation': {
-                    'smarts': 'c1ccccc1>>c1cc(O)ccc1',
-                    'description': 'Aromatic hydroxylation',
-                    'conditions': ['photolytic', 'oxidative']
-                }
-            }
-        }
+        # Reactions compiled once per rule file and indexed by stress type
+        self.rules_version, self.degradation_rules, self.rules_by_condition = load_degradation_rules(rules_path)
     
     def predict_products(self, parent_smiles, stress_type, max_products=5):
         """
@@ -86,59 +70,49 @@ class DegradationProductPredictor:
             raise ValueError(f"Invalid SMILES: {parent_smiles}")
         
         parent_mw = Descriptors.MolWt(parent_mol)
+        # Fingerprinted once per call; only new products are fingerprinted below
+        parent_fp = AllChem.GetMorganFingerprintAsBitVect(parent_mol, 2)
         
         products = []
-        
-        # Apply relevant transformation rules
-        for category, rules in self.degradation_rules.items():
-            for rule_name, rule_data in rules.items():
-                
-                # Check if rule applies to this stress type
-                if stress_type not in rule_data['conditions']:
-                    continue
-                
-                # Try to apply reaction
-                rxn = AllChem.ReactionFromSmarts(rule_data['smarts'])
-                product_sets = rxn.RunReactants((parent_mol,))
-                
-                for product_set in product_sets:
-                    for product_mol in product_set:
-                        try:
-                            Chem.SanitizeMol(product_mol)
-                            product_smiles = Chem.MolToSmiles(product_mol)
-                            product_mw = Descriptors.MolWt(product_mol)
-                            
-                            # Calculate stoichiometric factor (omega)
-                            omega = parent_mw / product_mw
-                            
-                            products.append({
-                                'smiles': product_smiles,
-                                'molecular_weight': round(product_mw, 2),
-                                'omega': round(omega, 3),
-                                'pathway': rule_data['description'],
-                                'rule_applied': rule_name,
-                                'category': category,
-                                'confidence': self._estimate_confidence(parent_mol, product_mol, stress_type)
-                            })
-                        
-                        except Exception as e:
-                            continue  # Skip invalid products
-        
-        # Remove duplicates
-        unique_products = []
         seen_smiles = set()
         
-        for product in products:
-            if product['smiles'] not in seen_smiles:
-                seen_smiles.add(product['smiles'])
-                unique_products.append(product)
+        # Apply the transformation rules for this stress type
+        for rule in self.rules_by_condition.get(stress_type, []):
+            product_sets = rule.reaction.RunReactants((parent_mol,))
+            
+            for product_set in product_sets:
+                for product_mol in product_set:
+                    try:
+                        Chem.SanitizeMol(product_mol)
+                        product_smiles = Chem.MolToSmiles(product_mol)
+                        # Keep the first rule that yields each product
+                        if product_smiles in seen_smiles:
+                            continue
+                        product_mw = Descriptors.MolWt(product_mol)
+                        
+                        # Calculate stoichiometric factor (omega)
+                        omega = parent_mw / product_mw
+                        
+                        products.append({
+                            'smiles': product_smiles,
+                            'molecular_weight': round(product_mw, 2),
+                            'omega': round(omega, 3),
+                            'pathway': rule.description,
+                            'rule_applied': rule.name,
+                            'category': rule.category,
+                            'confidence': self._estimate_confidence(parent_fp, product_mol, stress_type)
+                        })
+                        seen_smiles.add(product_smiles)
+                    
+                    except Exception as e:
+                        continue  # Skip invalid products
         
         # Sort by confidence
-        unique_products.sort(key=lambda x: x['confidence'], reverse=True)
+        products.sort(key=lambda x: x['confidence'], reverse=True)
         
-        return unique_products[:max_products]
+        return products[:max_products]
     
-    def _estimate_confidence(self, parent_mol, product_mol, stress_type):
+    def _estimate_confidence(self, parent_fp, product_mol, stress_type):
         """
         Estimate confidence in predicted product
         
@@ -149,7 +123,7 @@ class DegradationProductPredictor:
         """
         
         # Tanimoto similarity
-        parent_fp = AllChem.GetMorganFingerprintAsBitVect(parent_mol, 2)
+        # parent_fp: Morgan (radius 2) fingerprint of the parent, computed by the caller
         product_fp = AllChem.GetMorganFingerprintAsBitVect(product_mol, 2)
         similarity = AllChem.DataStructs.TanimotoSimilarity(parent_fp, product_fp)
         
@@ -183,10 +157,7 @@ class DegradationProductPredictor:
             Predicted mass balance breakdown
         """
         
-        parent_mol = Chem.MolFromSmiles(parent_smiles)
-        parent_mw = Descriptors.MolWt(parent_mol)
-        
-        # Predict products
+        # Predict products (parses and validates the parent SMILES)
         products = self.predict_products(parent_smiles, stress_type, max_products=3)
         
         if not products:
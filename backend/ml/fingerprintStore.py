@@ -0,0 +1,207 @@
+"""
+Fingerprint Store
+Morgan fingerprints of historical APIs and degradants, kept as packed uint64
+bit arrays in a memory-mapped file and keyed by canonical SMILES, with a
+vectorized popcount Tanimoto top-k search over the whole store.
+
+Layout (one directory per store):
+    fingerprints.u64   raw [count, n_bits / 64] uint64 rows, append-only
+    keys.jsonl         one {"smiles", "label"} line per row, same order
+    meta.json          radius, n_bits
+
+Rows are appended before their key line, so after an interrupted write the
+store simply ignores the unkeyed tail.
+"""
+
+import os
+import sys
+import json
+
+import numpy as np
+from rdkit import Chem, DataStructs
+from rdkit.Chem import AllChem
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.path.join(BASE_DIR, 'ml_data', 'fingerprints')
+
+DEFAULT_RADIUS = 2
+DEFAULT_N_BITS = 2048
+
+# Rows scored per step of a search, bounding temporary memory on large stores
+SEARCH_BLOCK_ROWS = 65536
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+def popcount_rows(words):
+    """Set bits per row of a [n, w] uint64 array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    return _POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+def pack_fingerprint(mol, radius=DEFAULT_RADIUS, n_bits=DEFAULT_N_BITS):
+    """Morgan fingerprint of a molecule as n_bits / 64 packed uint64 words"""
+    fp = AllChem.GetMorganFingerprintAsBitVect(mol, radius, nBits=n_bits)
+    return np.frombuffer(DataStructs.BitVectToBinaryText(fp), dtype=np.uint8).view(np.uint64).copy()
+
+class FingerprintStore:
+    def __init__(self, directory=STORE_DIR, radius=DEFAULT_RADIUS, n_bits=DEFAULT_N_BITS):
+        if n_bits % 64:
+            raise ValueError("n_bits must be a multiple of 64")
+        self.directory = directory
+        self.fp_path = os.path.join(directory, 'fingerprints.u64')
+        self.keys_path = os.path.join(directory, 'keys.jsonl')
+        meta_path = os.path.join(directory, 'meta.json')
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            radius, n_bits = meta['radius'], meta['n_bits']
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump({"radius": radius, "n_bits": n_bits}, f)
+        self.radius = radius
+        self.n_bits = n_bits
+        self.n_words = n_bits // 64
+
+        self.keys = []
+        self.labels = []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.keys.append(entry['smiles'])
+                        self.labels.append(entry.get('label'))
+        self.index = {smiles: i for i, smiles in enumerate(self.keys)}
+        self._words = None
+        self._popcounts = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, smiles):
+        return self._canonical(smiles) in self.index
+
+    @staticmethod
+    def _canonical(smiles):
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            raise ValueError(f"Invalid SMILES: {smiles}")
+        return Chem.MolToSmiles(mol)
+
+    def _mapped(self):
+        """Read-only memory map of the keyed rows, and their popcounts"""
+        if self._words is None or len(self._words) != len(self.keys):
+            if not self.keys:
+                self._words = np.empty((0, self.n_words), dtype=np.uint64)
+            else:
+                self._words = np.memmap(self.fp_path, dtype=np.uint64, mode='r',
+                                        shape=(len(self.keys), self.n_words))
+            self._popcounts = popcount_rows(self._words) if len(self._words) else np.empty(0, dtype=np.int64)
+        return self._words, self._popcounts
+
+    def add(self, smiles, label=None):
+        """Add one molecule; returns its canonical SMILES. Existing keys are kept as they are."""
+        return self.add_many([(smiles, label)])[0]
+
+    def add_many(self, entries):
+        """
+        Add (smiles, label) pairs in one append. Returns the canonical SMILES
+        of each entry; duplicates of stored or earlier entries are skipped.
+        """
+        # Parse everything first so an invalid entry leaves the store untouched
+        parsed = []
+        for smiles, label in entries:
+            mol = Chem.MolFromSmiles(smiles) if isinstance(smiles, str) else None
+            if mol is None:
+                raise ValueError(f"Invalid SMILES: {smiles}")
+            parsed.append((mol, Chem.MolToSmiles(mol), label))
+
+        canonicals, rows, lines = [], [], []
+        for mol, canonical, label in parsed:
+            canonicals.append(canonical)
+            if canonical in self.index:
+                continue
+            self.index[canonical] = len(self.keys)
+            self.keys.append(canonical)
+            self.labels.append(label)
+            rows.append(pack_fingerprint(mol, self.radius, self.n_bits))
+            lines.append(json.dumps({"smiles": canonical, "label": label}) + "\n")
+
+        if rows:
+            # Truncate any unkeyed tail left by an interrupted write before appending
+            row_bytes = self.n_words * 8
+            keyed = (len(self.keys) - len(rows)) * row_bytes
+            with open(self.fp_path, 'ab') as f:
+                f.truncate(keyed)
+                f.write(np.stack(rows).tobytes())
+            with open(self.keys_path, 'a') as f:
+                f.writelines(lines)
+            self._words = None
+        return canonicals
+
+    def fingerprint(self, smiles):
+        """Stored packed fingerprint for a SMILES, or None"""
+        row = self.index.get(self._canonical(smiles))
+        if row is None:
+            return None
+        return np.array(self._mapped()[0][row])
+
+    def similarity(self, query):
+        """Tanimoto similarity of a query (SMILES or packed words) to every stored row"""
+        if isinstance(query, str):
+            mol = Chem.MolFromSmiles(query)
+            if mol is None:
+                raise ValueError(f"Invalid SMILES: {query}")
+            query = pack_fingerprint(mol, self.radius, self.n_bits)
+        words, popcounts = self._mapped()
+        query_count = int(popcount_rows(query[None, :])[0])
+
+        scores = np.empty(len(words), dtype=np.float64)
+        for start in range(0, len(words), SEARCH_BLOCK_ROWS):
+            block = words[start:start + SEARCH_BLOCK_ROWS]
+            common = popcount_rows(np.bitwise_and(block, query))
+            union = popcounts[start:start + len(block)] + query_count - common
+            scores[start:start + len(block)] = np.divide(common, union, out=np.zeros(len(block)),
+                                                         where=union > 0)
+        return scores
+
+    def search(self, query, k=10, min_similarity=0.0):
+        """Top-k stored molecules by Tanimoto similarity, most similar first"""
+        scores = self.similarity(query)
+        if len(scores) == 0 or k <= 0:
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [
+            {"smiles": self.keys[i], "label": self.labels[i], "similarity": round(float(scores[i]), 4)}
+            for i in top if scores[i] >= min_similarity
+        ]
+
+if __name__ == "__main__":
+    # Usage:
+    #   python fingerprintStore.py add SMILES [LABEL]
+    #   python fingerprintStore.py import FILE.json      list of {"smiles", "label"}
+    #   python fingerprintStore.py search SMILES [K]
+    args = sys.argv[1:]
+    store = FingerprintStore()
+    try:
+        if args[:1] == ['add'] and len(args) >= 2:
+            print(json.dumps({"success": True, "smiles": store.add(args[1], args[2] if len(args) > 2 else None),
+                              "size": len(store)}))
+        elif args[:1] == ['import'] and len(args) == 2:
+            with open(args[1], 'r') as f:
+                entries = [(e['smiles'], e.get('label')) for e in json.load(f)]
+            store.add_many(entries)
+            print(json.dumps({"success": True, "size": len(store)}))
+        elif args[:1] == ['search'] and len(args) >= 2:
+            k = int(args[2]) if len(args) > 2 else 10
+            print(json.dumps({"success": True, "results": store.search(args[1], k)}))
+        else:
+            print(json.dumps({"success": False, "error": "Usage: add SMILES [LABEL] | import FILE | search SMILES [K]"}))
+            sys.exit(1)
+    except ValueError as e:
+        print(json.dumps({"success": False, "error": str(e)}))
+        sys.exit(1)
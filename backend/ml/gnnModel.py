@@ -1,6 +1,19 @@
+import os
+import sys
+import tempfile
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from typing import Optional, Tuple, Union
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKPOINT_PATH = os.path.join(BASE_DIR, 'ml_models', 'molecular_gnn.pt')
+
+# Untrained fallback weights are drawn from this seed so scores are reproducible
+PLACEHOLDER_SEED = 0
+
+# Any adjacency form accepted by propagate(); annotated so MolecularGNN compiles with torch.jit.script
+Adjacency = Union[torch.Tensor, Tuple[torch.Tensor, torch.Tensor]]
 
 class GraphConvolution(nn.Module):
     """
@@ -11,19 +24,40 @@ class GraphConvolution(nn.Module):
         self.projection = nn.Linear(in_features, out_features)
         self.message_fn = nn.Linear(in_features, out_features)
 
-    def forward(self, x, adj):
+    def forward(self, x: torch.Tensor, adj: Adjacency):
         """
         x: [N, in_features] - Node features
-        adj: [N, N] - Adjacency matrix (weighted by bond types or normalized)
+        adj: Adjacency (weighted by bond types or normalized), either
+             [N, N] dense or torch.sparse tensor, or an edge list
+             (edge_index [2, E], edge_weight [E]) - see propagate()
         """
         # Node projection
         h = self.projection(x)
         
         # Message passing: A * X
-        m = torch.matmul(adj, h)
+        m = propagate(adj, h)
         
         return F.relu(m)
 
+def propagate(adj: Adjacency, h: torch.Tensor):
+    """
+    A @ h for any adjacency form. The edge-list form sums weighted messages
+    with index_add_, so memory and compute scale with E (~2N for molecules)
+    instead of N^2: out[i] = sum over edges (i, j) of w_ij * h[j].
+    """
+    if isinstance(adj, torch.Tensor):
+        if adj.is_sparse:
+            return torch.mm(adj, h)
+        return torch.matmul(adj, h)
+    edge_index, edge_weight = adj
+    messages = h.index_select(0, edge_index[1]) * edge_weight.unsqueeze(1)
+    return h.new_zeros(h.shape).index_add_(0, edge_index[0], messages)
+
+def dense_to_edges(adj):
+    """Edge-list form (edge_index, edge_weight) of a dense adjacency"""
+    edge_index = adj.nonzero().t()
+    return edge_index, adj[edge_index[0], edge_index[1]]
+
 class MolecularGNN(nn.Module):
     """
     Molecular GNN for Lability Prediction
@@ -47,10 +81,14 @@ class MolecularGNN(nn.Module):
         # Global Pooling for whole-molecule score
         self.molecule_score = nn.Linear(hidden_dim, 1)
 
-    def forward(self, x, adj):
+    def forward(self, x: torch.Tensor, adj: Adjacency, batch: Optional[torch.Tensor] = None,
+                num_graphs: Optional[int] = None):
         """
         x: [N, features]
-        adj: [N, N]
+        adj: [N, N] dense / sparse, or (edge_index, edge_weight); for a batch
+             of molecules a block-diagonal graph
+        batch: optional [N] molecule index of each atom; molecule scores are
+               then returned per molecule, shape [num_graphs, 1]
         """
         # GNN Propagation
         h = self.conv1(x, adj)
@@ -60,18 +98,113 @@ class MolecularGNN(nn.Module):
         atom_scores = self.atom_lability(h) # [N, 1]
         
         # Global molecule susceptibility (max-pooling across atoms)
-        # In a real GNN, we might use global_max_pool
-        molecule_rep = torch.max(h, dim=0)[0]
+        if batch is None:
+            molecule_rep = torch.max(h, dim=0)[0]
+        else:
+            molecule_rep = global_max_pool(h, batch, num_graphs)
         molecule_score = torch.sigmoid(self.molecule_score(molecule_rep))
         
         return atom_scores, molecule_score
 
+def global_max_pool(h: torch.Tensor, batch: torch.Tensor, num_graphs: Optional[int] = None):
+    """Per-molecule max over atom rows: scatter-reduce of h [N, F] by batch [N] -> [num_graphs, F]"""
+    if num_graphs is None:
+        size = int(batch.max()) + 1 if batch.numel() > 0 else 0
+    else:
+        size = num_graphs
+    out = h.new_zeros((size, h.shape[1]))
+    index = batch.unsqueeze(1).expand_as(h)
+    return out.scatter_reduce(0, index, h, reduce='amax', include_self=False)
+
 def get_placeholder_model():
     """Returns an initialized model with random weights for inference demo"""
     model = MolecularGNN()
     model.eval()
     return model
 
+def save_checkpoint(model, path=CHECKPOINT_PATH, metadata=None):
+    """
+    Write weights, constructor config and training metadata to one .pt file.
+    Written to a temp file and renamed so a loading worker never sees a
+    partial checkpoint.
+    """
+    checkpoint = {
+        "config": {
+            "input_dim": model.conv1.projection.in_features,
+            "hidden_dim": model.conv1.projection.out_features,
+            "output_dim": model.atom_lability[-2].out_features
+        },
+        "state_dict": model.state_dict(),
+        "metadata": metadata or {}
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.pt', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            torch.save(checkpoint, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    """
+    Eval-mode MolecularGNN and its metadata from a checkpoint. Tensors are
+    memory-mapped and adopted by the model without a copy, so worker
+    processes share the page cache instead of each holding the weights.
+    """
+    try:
+        checkpoint = torch.load(path, map_location='cpu', weights_only=True, mmap=True)
+    except TypeError:
+        checkpoint = torch.load(path, map_location='cpu')  # torch < 2.1: no mmap
+
+    model = MolecularGNN(**checkpoint["config"])
+    try:
+        model.load_state_dict(checkpoint["state_dict"], assign=True)
+    except TypeError:
+        model.load_state_dict(checkpoint["state_dict"])
+    model.eval()
+    return model, checkpoint.get("metadata", {})
+
+def load_model(path=CHECKPOINT_PATH):
+    """
+    (model, metadata) from a checkpoint if one exists, else placeholder
+    weights from PLACEHOLDER_SEED (reproducible across processes, but
+    untrained). metadata["trained"] says which one callers got.
+    """
+    if path and os.path.exists(path):
+        model, metadata = load_checkpoint(path)
+        return model, dict(metadata, trained=True)
+
+    print(f"No GNN checkpoint at {path}; using untrained placeholder weights. "
+          f"Train with: python ml/gnnTrainer.py", file=sys.stderr)
+    with torch.random.fork_rng():
+        torch.manual_seed(PLACEHOLDER_SEED)
+        return get_placeholder_model(), {"trained": False}
+
+def quantize_model(model):
+    """
+    Dynamically quantized copy for CPU inference: nn.Linear weights stored as
+    int8, activations quantized per batch at run time. Message passing
+    (propagate) and pooling stay in fp32. With the default 32-wide layers
+    throughput matches fp32 (benchmark_gnn_quantization.py); the gain
+    needs wider hidden layers or smaller weight files.
+    """
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {nn.Linear}, dtype=torch.qint8)
+
+def compile_model(model):
+    """
+    TorchScript-compiled, frozen copy of an eval-mode MolecularGNN. Scripted
+    rather than traced: a trace would bake in the molecule count of the
+    example batch. Falls back to the eager model if compilation fails.
+    """
+    try:
+        return torch.jit.freeze(torch.jit.script(model.eval()))
+    except Exception as e:
+        print(f"TorchScript compilation failed, serving the eager model: {e}", file=sys.stderr)
+        return model
+
 if __name__ == "__main__":
     # Test pass with dummy data
     print("Testing GNN Architecture...")
@@ -2,102 +2,381 @@ import torch
 import numpy as np
 from rdkit import Chem
 from rdkit.Chem import AllChem
+import os
 import json
 import sys
-from gnnModel import get_placeholder_model
+import queue
+import threading
+from gnnModel import CHECKPOINT_PATH, load_model, quantize_model, compile_model
+from graphCache import GraphCache, MolGraph, DEFAULT_CACHE_SIZE, sort_edges, to_input_order
+
+MODEL_TYPE = "GNN-v1 (Graph Convolutional Network)"
+PLACEHOLDER_MODEL_TYPE = "GNN-v1 (untrained placeholder weights)"
+
+# Server mode: requests drained from the queue per forward pass, and molecules run at startup
+MAX_SERVE_BATCH = 256
+WARMUP_SMILES = ["CC(=O)Oc1ccccc1C(=O)O", "CN1C=NC2=C1C(=O)N(C(=O)N2C)C", "CCO"]
+
+NUM_ATOM_FEATURES = 16
+FEATURE_SCALE = np.array([100.0, 5.0, 4.0, 5.0, 1.0, 1.0, 5.0])
+
+# Row = int(HybridizationType), columns = SP, SP2, SP3
+HYBRIDIZATION_ONE_HOT = np.zeros((max(Chem.HybridizationType.values) + 1, 3), dtype=np.float32)
+for column, hybridization in enumerate((Chem.HybridizationType.SP, Chem.HybridizationType.SP2,
+                                        Chem.HybridizationType.SP3)):
+    HYBRIDIZATION_ONE_HOT[int(hybridization), column] = 1.0
 
 class GNNPredictor:
-    def __init__(self):
-        self.model = get_placeholder_model()
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, cache_dir=None, checkpoint=CHECKPOINT_PATH,
+                 quantize=False):
+        # Loaded once per predictor; the checkpoint's tensors are memory-mapped
+        self.model, self.model_metadata = load_model(checkpoint)
+        # Without a checkpoint the scores come from random weights; every result says so
+        self.trained = self.model_metadata["trained"]
+        self.model_type = MODEL_TYPE if self.trained else PLACEHOLDER_MODEL_TYPE
+        # Optional int8 dynamic quantization of the Linear layers (CPU library screening)
+        self.quantized = quantize
+        if quantize:
+            self.model = quantize_model(self.model)
+        # Featurized graphs by canonical SMILES (cache_dir adds a persistent .npz store)
+        self.cache = GraphCache(cache_size, cache_dir)
         
+    @staticmethod
+    def atom_features(mol):
+        """
+        Node features [N, 16] (atomic num, degree, hybrid, aromatic, etc.)
+        RDKit has no bulk atom-property accessors, so the eight getters still
+        run per atom in one Python comprehension; only the scaling and the
+        hybridization one-hot are array ops on the whole molecule.
+        """
+        props = np.array([
+            (atom.GetAtomicNum(), atom.GetDegree(), atom.GetTotalNumHs(), atom.GetImplicitValence(),
+             atom.GetIsAromatic(), atom.IsInRing(), atom.GetFormalCharge(), int(atom.GetHybridization()))
+            for atom in mol.GetAtoms()
+        ], dtype=np.int64).reshape(-1, 8)
+
+        x = np.zeros((len(props), NUM_ATOM_FEATURES), dtype=np.float32)
+        # Normalized atomic number, degree, Hs, implicit valence, aromatic, ring, charge
+        x[:, :7] = props[:, :7] / FEATURE_SCALE
+        # Simple hybridizations (SP, SP2, SP3); columns 10-15 are padding
+        x[:, 7:10] = HYBRIDIZATION_ONE_HOT[props[:, 7]]
+        return torch.from_numpy(x)
+
+    @staticmethod
+    def mol_to_graph(mol):
+        """
+        Graph of an RDKit molecule in COO form:
+        - x: [N, 16] node features
+        - edge_index: [2, E] (both bond directions plus self-loops, row-major order)
+        - edge_weight: [E] bond order (1.0 for self-loops)
+        - symbols: atom symbols
+        """
+        x = GNNPredictor.atom_features(mol)
+        num_atoms = mol.GetNumAtoms()
+
+        bonds = [(b.GetBeginAtomIdx(), b.GetEndAtomIdx(), b.GetBondTypeAsDouble()) for b in mol.GetBonds()]
+        begin = torch.tensor([b[0] for b in bonds], dtype=torch.long)
+        end = torch.tensor([b[1] for b in bonds], dtype=torch.long)
+        order = torch.tensor([b[2] for b in bonds], dtype=torch.float)
+        loops = torch.arange(num_atoms, dtype=torch.long)
+
+        edge_index = torch.stack([
+            torch.cat([begin, end, loops]),
+            torch.cat([end, begin, loops])
+        ])
+        edge_weight = torch.cat([order, order, torch.ones(num_atoms)])
+        edge_index, edge_weight = sort_edges(edge_index, edge_weight, num_atoms)
+        return MolGraph(x, edge_index, edge_weight, [atom.GetSymbol() for atom in mol.GetAtoms()])
+
+    def smiles_to_edges(self, smiles):
+        """
+        Cached graph for a SMILES string, atoms numbered as in the input.
+        Repeated inputs skip RDKit; other spellings of a cached molecule
+        only pay for canonicalization. None for invalid SMILES.
+        """
+        graph = self.cache.lookup(smiles)
+        if graph is not None:
+            return graph
+
+        mol = Chem.MolFromSmiles(smiles)
+        if not mol or mol.GetNumAtoms() == 0:
+            return None
+
+        canonical = Chem.MolToSmiles(mol)
+        order = list(mol.GetPropsAsDict(True, True)['_smilesAtomOutputOrder'])
+        order = None if order == list(range(len(order))) else torch.tensor(order, dtype=torch.long)
+
+        graph = self.cache.lookup_canonical(smiles, canonical, order)
+        if graph is not None:
+            return graph
+
+        # Featurize in canonical atom order so every spelling shares one entry
+        canonical_mol = mol if order is None else Chem.RenumberAtoms(mol, order.tolist())
+        graph = self.mol_to_graph(canonical_mol)
+        self.cache.put(smiles, canonical, order, graph)
+        return to_input_order(graph, order)
+
     def smiles_to_graph(self, smiles):
         """
         Converts SMILES to a graph representation:
         - Node features: [N, 16] (atomic num, degree, hybrid, aromatic, etc.)
-        - Adjacency matrix: [N, N]
+        - Adjacency matrix: [N, N] weighted by bond order, with self-loops
         """
-        mol = Chem.MolFromSmiles(smiles)
-        if not mol:
+        graph = self.smiles_to_edges(smiles)
+        if graph is None:
             return None
-            
-        num_atoms = mol.GetNumAtoms()
-        
-        # 1. Feature Extraction (Node features)
-        node_features = []
-        for atom in mol.GetAtoms():
-            features = [
-                atom.GetAtomicNum() / 100.0, # Normalized atomic number
-                atom.GetDegree() / 5.0,
-                atom.GetTotalNumHs() / 4.0,
-                atom.GetImplicitValence() / 5.0,
-                1.0 if atom.GetIsAromatic() else 0.0,
-                1.0 if atom.IsInRing() else 0.0,
-                atom.GetFormalCharge() / 5.0,
-                # Simple hybridizations (SP, SP2, SP3, etc)
-                1.0 if atom.GetHybridization() == Chem.HybridizationType.SP else 0.0,
-                1.0 if atom.GetHybridization() == Chem.HybridizationType.SP2 else 0.0,
-                1.0 if atom.GetHybridization() == Chem.HybridizationType.SP3 else 0.0,
-                # Padding to 16 features
-                0, 0, 0, 0, 0, 0
-            ]
-            node_features.append(features)
-            
-        x = torch.tensor(node_features, dtype=torch.float)
-        
-        # 2. Adjacency Matrix
+
+        num_atoms = graph.x.shape[0]
         adj = torch.zeros((num_atoms, num_atoms))
-        for bond in mol.GetBonds():
-            i = bond.GetBeginAtomIdx()
-            j = bond.GetEndAtomIdx()
-            
-            # Weight adjacency by bond type
-            bond_type = bond.GetBondTypeAsDouble()
-            adj[i, j] = bond_type
-            adj[j, i] = bond_type
-            
-        # Add self-loops
-        adj += torch.eye(num_atoms)
-        
-        return x, adj, num_atoms
+        adj[graph.edge_index[0], graph.edge_index[1]] = graph.edge_weight
+        return graph.x, adj, num_atoms
+
+    @staticmethod
+    def pack_graphs(graphs):
+        """
+        Stack molecules into one disconnected graph: concatenated node
+        features, a block-diagonal sparse adjacency and the per-atom
+        molecule index used for pooling.
+        """
+        sizes = torch.tensor([g.x.shape[0] for g in graphs], dtype=torch.long)
+        offsets = torch.cumsum(sizes, 0) - sizes
+        x = torch.cat([g.x for g in graphs])
+        edge_index = torch.cat([g.edge_index + offset for g, offset in zip(graphs, offsets)], dim=1)
+        edge_weight = torch.cat([g.edge_weight for g in graphs])
+        num_nodes = int(sizes.sum())
+
+        adj = torch.sparse_coo_tensor(edge_index, edge_weight, (num_nodes, num_nodes),
+                                      check_invariants=False).coalesce()
+        batch = torch.repeat_interleave(torch.arange(len(graphs)), sizes)
+        return x, adj, batch, sizes
+
+    def format_result(self, symbols, atom_scores_list, molecule_score):
+        """JSON result for one molecule"""
+        atom_details = []
+        for i, symbol in enumerate(symbols):
+            atom_details.append({
+                "index": i,
+                "symbol": symbol,
+                "lability": round(atom_scores_list[i], 3)
+            })
+
+        return {
+            "success": True,
+            "overall_susceptibility": round(molecule_score * 100, 2),
+            "atom_lability": atom_details,
+            "num_atoms": len(symbols),
+            "model_type": self.model_type,
+            "trained": self.trained
+        }
 
     def predict(self, smiles):
         """Perform GNN inference on a SMILES string"""
+        return self.predict_batch([smiles])[0]
+
+    def predict_batch(self, smiles_list):
+        """
+        GNN inference on many SMILES in a single forward pass over a
+        block-diagonal sparse adjacency. Returns one result per input, in
+        order; invalid SMILES get an error entry.
+        """
+        results = [None] * len(smiles_list)
+        graphs, positions = [], []
+        for i, smiles in enumerate(smiles_list):
+            graph = self.smiles_to_edges(smiles) if isinstance(smiles, str) else None
+            if graph is None:
+                results[i] = {"error": "Invalid SMILES"}
+            else:
+                graphs.append(graph)
+                positions.append(i)
+
+        if not graphs:
+            return results
+
         try:
-            graph_data = self.smiles_to_graph(smiles)
-            if not graph_data:
-                return {"error": "Invalid SMILES"}
-                
-            x, adj, num_atoms = graph_data
-            
+            x, adj, batch, sizes = self.pack_graphs(graphs)
             with torch.no_grad():
-                atom_scores, molecule_score = self.model(x, adj)
-                
-            # Convert to list for JSON serialization
-            atom_scores_list = atom_scores.flatten().tolist()
-            
-            # Map scores back to atom symbols and indices
-            mol = Chem.MolFromSmiles(smiles)
-            atom_details = []
-            for i, atom in enumerate(mol.GetAtoms()):
-                atom_details.append({
-                    "index": i,
-                    "symbol": atom.GetSymbol(),
-                    "lability": round(atom_scores_list[i], 3)
-                })
-                
-            return {
-                "success": True,
-                "overall_susceptibility": round(molecule_score.item() * 100, 2),
-                "atom_lability": atom_details,
-                "num_atoms": num_atoms,
-                "model_type": "GNN-v1 (Graph Convolutional Network)"
-            }
+                atom_scores, molecule_scores = self.model(x, adj, batch, len(graphs))
+        except Exception as e:
+            for i in positions:
+                results[i] = {"error": str(e)}
+            return results
+
+        atom_scores = atom_scores.flatten().split(sizes.tolist())
+        molecule_scores = molecule_scores.flatten().tolist()
+        for k, i in enumerate(positions):
+            results[i] = self.format_result(graphs[k].symbols, atom_scores[k].tolist(), molecule_scores[k])
+        return results
+
+def configure_threads(num_threads=None):
+    """
+    Thread pools for a CPU-only host. Intra-op threads: num_threads, else
+    GNN_NUM_THREADS, else the CPUs this process may run on capped at 4
+    (molecule-sized matmuls stop scaling beyond that). One inter-op thread,
+    since the server runs one forward pass at a time. Must run before any
+    torch work; returns the intra-op thread count.
+    """
+    if not num_threads:
+        if hasattr(os, 'sched_getaffinity'):
+            cpus = len(os.sched_getaffinity(0))
+        else:
+            cpus = os.cpu_count() or 1
+        num_threads = int(os.environ.get('GNN_NUM_THREADS', 0)) or min(cpus, 4)
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # inter-op pool already started; keep its size
+    return num_threads
+
+def predict_or_error(predictor, smiles):
+    try:
+        return predictor.predict(smiles)
+    except Exception as e:
+        return {"error": str(e)}
+
+def error_response(line, error):
+    """{"error"} answer to a request line, with its id when the line has one"""
+    response = {"error": str(error)}
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return response
+    if isinstance(request, dict) and request.get('id') is not None:
+        response['id'] = request['id']
+    return response
+
+def handle_lines(predictor, lines):
+    """
+    Answer JSON request lines with a single predict_batch() call.
+    A request is {"smiles": ...} or {"smiles_list": [...]}, with an optional
+    id that is echoed back.
+    """
+    requests, smiles = [], []
+    for line in lines:
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            requests.append(({"error": f"Invalid JSON: {e}"}, None, None))
+            continue
+        if not isinstance(request, dict):
+            requests.append(({"error": "Request must be a JSON object"}, None, None))
+            continue
+
+        request_id = request.get('id')
+        if isinstance(request.get('smiles_list'), list):
+            span = (len(smiles), len(smiles) + len(request['smiles_list']))
+            smiles.extend(request['smiles_list'])
+            requests.append((None, request_id, span))
+        elif 'smiles' in request:
+            requests.append((None, request_id, len(smiles)))
+            smiles.append(request['smiles'])
+        else:
+            requests.append(({"error": "Request needs smiles or smiles_list"}, request_id, None))
+
+    try:
+        results = predictor.predict_batch(smiles) if smiles else []
+    except Exception:
+        # Retry one molecule at a time so only the failing ones get an error
+        results = [predict_or_error(predictor, s) for s in smiles]
+
+    responses = []
+    for response, request_id, where in requests:
+        if isinstance(where, tuple):
+            batch = results[where[0]:where[1]]
+            response = {"success": True, "count": len(batch), "results": batch}
+        elif where is not None:
+            response = dict(results[where])
+        if request_id is not None:
+            response['id'] = request_id
+        responses.append(response)
+    return responses
+
+def serve_stream(predictor, stream_in, stream_out, max_batch=MAX_SERVE_BATCH):
+    """
+    Answer one JSON response line per JSON request line until EOF. A reader
+    thread queues lines, so requests that arrive while a forward pass runs
+    are answered together by the next one.
+    """
+    pending = queue.Queue()
+
+    def read():
+        for line in stream_in:
+            if line.strip():
+                pending.put(line)
+        pending.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+
+    finished = False
+    while not finished:
+        lines = [pending.get()]
+        while len(lines) < max_batch and lines[-1] is not None:
+            try:
+                lines.append(pending.get_nowait())
+            except queue.Empty:
+                break
+        if lines[-1] is None:
+            finished = True
+            lines.pop()
+
+        try:
+            responses = handle_lines(predictor, lines)
         except Exception as e:
-            return {"error": str(e)}
+            # Keep the worker alive: every request of the batch gets an error line
+            responses = [error_response(line, e) for line in lines]
+        for response in responses:
+            stream_out.write(json.dumps(response) + "\n")
+        stream_out.flush()
+
+def serve(cache_dir=None, num_threads=None, quantize=False):
+    """Persistent GNN worker: compile the model once, then answer JSON lines on stdin"""
+    threads = configure_threads(num_threads)
+    predictor = GNNPredictor(cache_dir=cache_dir, quantize=quantize)
+    predictor.model = compile_model(predictor.model)
+
+    # TorchScript optimizes on the first calls; pay for that before reporting ready
+    for _ in range(3):
+        predictor.predict_batch(WARMUP_SMILES)
+
+    # Readiness line so the parent process knows the cold start is done
+    print(json.dumps({
+        "ready": True,
+        "model_type": predictor.model_type,
+        "trained": predictor.trained,
+        "compiled": isinstance(predictor.model, torch.jit.ScriptModule),
+        "quantized": predictor.quantized,
+        "threads": threads
+    }))
+    sys.stdout.flush()
+    serve_stream(predictor, sys.stdin, sys.stdout)
 
 if __name__ == "__main__":
-    # Test block
-    predictor = GNNPredictor()
-    test_smiles = sys.argv[1] if len(sys.argv) > 1 else "CC(=O)Oc1ccccc1C(=O)O"
-    result = predictor.predict(test_smiles)
-    print(json.dumps(result, indent=2))
+    # Usage:
+    #   python gnnPredictor.py [SMILES] [--cache-dir DIR]
+    #   echo '["CCO", "c1ccccc1O", ...]' | python gnnPredictor.py --batch [--cache-dir DIR]
+    #   python gnnPredictor.py --serve [--threads N] [--cache-dir DIR]    JSON lines on stdin/stdout
+    # --quantize (or GNN_QUANTIZE=1) serves the int8 dynamically quantized model
+    args = sys.argv[1:]
+    quantize = os.environ.get('GNN_QUANTIZE') == '1'
+    if '--quantize' in args:
+        args.remove('--quantize')
+        quantize = True
+    cache_dir = None
+    if '--cache-dir' in args and args.index('--cache-dir') + 1 < len(args):
+        cache_dir = args.pop(args.index('--cache-dir') + 1)
+        args.remove('--cache-dir')
+    if '--serve' in args:
+        num_threads = None
+        if '--threads' in args and args.index('--threads') + 1 < len(args):
+            num_threads = int(args[args.index('--threads') + 1])
+        serve(cache_dir, num_threads, quantize)
+        sys.exit(0)
+
+    predictor = GNNPredictor(cache_dir=cache_dir, quantize=quantize)
+    if '--batch' in args:
+        smiles_list = json.loads(sys.stdin.read() or '[]')
+        print(json.dumps(predictor.predict_batch(smiles_list)))
+    else:
+        test_smiles = args[0] if args else "CC(=O)Oc1ccccc1C(=O)O"
+        result = predictor.predict(test_smiles)
+        print(json.dumps(result, indent=2))
@@ -0,0 +1,279 @@
+"""
+GNN Training Pipeline
+Trains MolecularGNN on per-atom lability and whole-molecule susceptibility
+targets and writes the checkpoint gnnPredictor.py serves from ml_models/
+
+Training data (ml_data/gnn_training_data.json) is a list of
+    {"smiles": ..., "susceptibility": 0-1, "atom_lability": [0-1 per atom]}
+Missing targets are derived from the rule-based MolecularFeatureExtractor:
+atoms in a reactive site are labile, and the molecule's susceptibility is
+its highest stress-type score. Featurization and labelling run in
+DataLoader worker processes.
+"""
+
+import os
+import sys
+import json
+import copy
+import random
+import hashlib
+from datetime import datetime, timezone
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import Dataset, DataLoader, RandomSampler, SequentialSampler
+from rdkit import Chem, RDLogger
+
+from gnnModel import MolecularGNN, CHECKPOINT_PATH, save_checkpoint
+from gnnPredictor import GNNPredictor
+from molecularFeatures import MolecularFeatureExtractor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, 'ml_data', 'gnn_training_data.json')
+
+STRESS_TYPES = ['acid', 'base', 'oxidative', 'thermal', 'photolytic']
+
+TRAINING_PARAMS = {
+    'epochs': 60,
+    'batch_size': 16,
+    'learning_rate': 0.005,
+    'weight_decay': 1e-4,
+    'validation_fraction': 0.2,
+    'molecule_loss_weight': 1.0,
+    'hidden_dim': 32,
+    'seed': 42
+}
+
+def seed_everything(seed):
+    """Seed Python, NumPy and torch, and ask torch for deterministic kernels"""
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    torch.use_deterministic_algorithms(True, warn_only=True)
+
+def seed_worker(worker_id):
+    """DataLoader worker_init_fn: derive NumPy/random seeds from torch's per-worker seed"""
+    worker_seed = torch.initial_seed() % 2 ** 32
+    np.random.seed(worker_seed)
+    random.seed(worker_seed)
+
+def rule_targets(smiles, mol, extractor):
+    """Weak labels from the rule-based extractor: (atom lability [N], susceptibility 0-1)"""
+    sites = extractor.identify_reactive_sites(smiles)
+    atom_lability = np.zeros(mol.GetNumAtoms(), dtype=np.float32)
+    for site in sites.values():
+        for match in site['atom_indices']:
+            atom_lability[match] = 1.0
+
+    susceptibility = max(
+        extractor.predict_degradation_susceptibility(smiles, stress_type)['susceptibility_score']
+        for stress_type in STRESS_TYPES
+    )
+    return atom_lability, max(0.0, min(susceptibility, 100)) / 100.0
+
+class MoleculeDataset(Dataset):
+    """
+    Records are featurized on access, so with num_workers > 0 RDKit parsing,
+    featurization and rule labelling run in the DataLoader worker processes.
+    Atoms keep their input SMILES order so per-atom targets line up.
+    """
+
+    def __init__(self, records):
+        self.records = [r for r in records if isinstance(r.get('smiles'), str)]
+        self.extractor = MolecularFeatureExtractor()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        record = self.records[index]
+        smiles = record['smiles']
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None or mol.GetNumAtoms() == 0:
+            return None
+
+        graph = GNNPredictor.mol_to_graph(mol)
+        atom_lability = record.get('atom_lability')
+        susceptibility = record.get('susceptibility')
+        if atom_lability is None or susceptibility is None:
+            rule_atoms, rule_molecule = rule_targets(smiles, mol, self.extractor)
+            atom_lability = rule_atoms if atom_lability is None else atom_lability
+            susceptibility = rule_molecule if susceptibility is None else susceptibility
+
+        atom_targets = torch.as_tensor(np.asarray(atom_lability, dtype=np.float32))
+        if atom_targets.shape[0] != graph.x.shape[0]:
+            return None
+        return graph, atom_targets, torch.tensor(float(susceptibility))
+
+def collate_graphs(samples):
+    """
+    Mini-batch of molecules as one block-diagonal graph (see
+    GNNPredictor.pack_graphs). Unparseable records are dropped.
+    """
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        return None
+    graphs, atom_targets, molecule_targets = zip(*samples)
+    x, adj, batch, _ = GNNPredictor.pack_graphs(graphs)
+    return {
+        "x": x,
+        "adj": adj,
+        "batch": batch,
+        "num_graphs": len(graphs),
+        "atom_targets": torch.cat(atom_targets).unsqueeze(1),
+        "molecule_targets": torch.stack(molecule_targets).unsqueeze(1)
+    }
+
+def make_loader(dataset, batch_size, shuffle, num_workers, seed):
+    # The loader draws worker base seeds from its generator once per iterator,
+    # i.e. per epoch without workers but only once with persistent workers, so
+    # the shuffle order gets a generator of its own to stay independent of
+    # num_workers
+    sampler_generator = torch.Generator()
+    sampler_generator.manual_seed(seed)
+    worker_generator = torch.Generator()
+    worker_generator.manual_seed(seed)
+    sampler = RandomSampler(dataset, generator=sampler_generator) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        sampler=sampler,
+        num_workers=num_workers,
+        collate_fn=collate_graphs,
+        worker_init_fn=seed_worker,
+        generator=worker_generator,
+        persistent_workers=num_workers > 0
+    )
+
+def batch_loss(model, batch, molecule_loss_weight):
+    atom_scores, molecule_scores = model(batch["x"], batch["adj"], batch["batch"], batch["num_graphs"])
+    atom_loss = F.binary_cross_entropy(atom_scores, batch["atom_targets"])
+    molecule_loss = F.binary_cross_entropy(molecule_scores, batch["molecule_targets"])
+    return atom_loss + molecule_loss_weight * molecule_loss
+
+def evaluate(model, loader, molecule_loss_weight):
+    model.eval()
+    total, count = 0.0, 0
+    with torch.no_grad():
+        for batch in loader:
+            if batch is None:
+                continue
+            total += batch_loss(model, batch, molecule_loss_weight).item() * batch["num_graphs"]
+            count += batch["num_graphs"]
+    return total / count if count else None
+
+def split_records(records, validation_fraction, seed):
+    """Deterministic train/validation split of the records"""
+    order = np.random.default_rng(seed).permutation(len(records))
+    n_val = int(len(records) * validation_fraction)
+    if len(records) - n_val < 1:
+        n_val = 0
+    return [records[i] for i in order[n_val:]], [records[i] for i in order[:n_val]]
+
+def train(records, params=TRAINING_PARAMS, num_workers=0, verbose=True):
+    """
+    Fit a MolecularGNN. Returns (model, metrics); the model is left in eval
+    mode with the weights of its best validation epoch, if there is a
+    validation split.
+    """
+    params = dict(TRAINING_PARAMS, **params)
+    seed_everything(params['seed'])
+
+    train_records, val_records = split_records(records, params['validation_fraction'], params['seed'])
+    train_loader = make_loader(MoleculeDataset(train_records), params['batch_size'], True,
+                               num_workers, params['seed'])
+    val_loader = make_loader(MoleculeDataset(val_records), params['batch_size'], False,
+                             num_workers, params['seed']) if val_records else None
+
+    model = MolecularGNN(hidden_dim=params['hidden_dim'])
+    optimizer = torch.optim.Adam(model.parameters(), lr=params['learning_rate'],
+                                 weight_decay=params['weight_decay'])
+
+    history = []
+    best_state, best_epoch, best_val = None, None, None
+    for epoch in range(params['epochs']):
+        model.train()
+        total, count = 0.0, 0
+        for batch in train_loader:
+            if batch is None:
+                continue
+            optimizer.zero_grad()
+            loss = batch_loss(model, batch, params['molecule_loss_weight'])
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * batch["num_graphs"]
+            count += batch["num_graphs"]
+
+        train_loss = total / count if count else None
+        val_loss = evaluate(model, val_loader, params['molecule_loss_weight']) if val_loader else None
+        history.append({"epoch": epoch + 1, "train_loss": train_loss, "val_loss": val_loss})
+        # Keep the weights of the best validation epoch (the datasets are small and overfit)
+        if val_loss is not None and (best_val is None or val_loss < best_val):
+            best_state, best_epoch, best_val = copy.deepcopy(model.state_dict()), epoch + 1, val_loss
+        if verbose and (epoch == 0 or (epoch + 1) % 10 == 0 or epoch + 1 == params['epochs']):
+            val_text = f", val loss {val_loss:.4f}" if val_loss is not None else ""
+            print(f"  epoch {epoch + 1:>3}: train loss {train_loss:.4f}{val_text}")
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    model.eval()
+    metrics = {
+        "train_molecules": len(train_records),
+        "validation_molecules": len(val_records),
+        "final_train_loss": history[-1]["train_loss"] if history else None,
+        "final_val_loss": history[-1]["val_loss"] if history else None,
+        "best_epoch": best_epoch,
+        "best_val_loss": best_val
+    }
+    return model, metrics
+
+def load_records(data_path=DATA_PATH):
+    with open(data_path, 'r') as f:
+        return json.load(f)
+
+def train_and_save(data_path=DATA_PATH, output_path=CHECKPOINT_PATH, params=TRAINING_PARAMS, num_workers=0):
+    """Train on a JSON dataset and write the checkpoint gnnPredictor.py loads"""
+    if not os.path.exists(data_path):
+        print(f"Error: Training data not found at {data_path}")
+        return None
+
+    records = load_records(data_path)
+    print(f"Training MolecularGNN on {len(records)} molecules ({num_workers} loader workers)...")
+    model, metrics = train(records, params, num_workers)
+
+    with open(data_path, 'rb') as f:
+        data_hash = hashlib.sha256(f.read()).hexdigest()[:12]
+    save_checkpoint(model, output_path, {
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "data_path": os.path.basename(data_path),
+        "data_hash": data_hash,
+        "params": dict(TRAINING_PARAMS, **params),
+        "metrics": metrics
+    })
+    print(f"✓ GNN checkpoint saved to {output_path}")
+    return metrics
+
+def option_value(args, flag, default):
+    if flag in args and args.index(flag) + 1 < len(args):
+        return args[args.index(flag) + 1]
+    return default
+
+if __name__ == "__main__":
+    # Usage:
+    #   python gnnTrainer.py [--data PATH] [--output PATH] [--epochs N]
+    #                        [--batch-size N] [--workers N] [--seed N]
+    RDLogger.DisableLog('rdApp.*')
+    args = sys.argv[1:]
+    params = {
+        'epochs': int(option_value(args, '--epochs', TRAINING_PARAMS['epochs'])),
+        'batch_size': int(option_value(args, '--batch-size', TRAINING_PARAMS['batch_size'])),
+        'seed': int(option_value(args, '--seed', TRAINING_PARAMS['seed']))
+    }
+    default_workers = min(4, max(0, (os.cpu_count() or 1) - 1))
+    train_and_save(
+        data_path=option_value(args, '--data', DATA_PATH),
+        output_path=option_value(args, '--output', CHECKPOINT_PATH),
+        params=params,
+        num_workers=int(option_value(args, '--workers', default_workers))
+    )
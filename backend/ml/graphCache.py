@@ -0,0 +1,175 @@
+"""
+Featurized Molecular Graph Cache
+LRU of (x, edge_index, edge_weight, symbols) keyed by canonical SMILES, with
+an optional on-disk .npz store that survives worker restarts.
+
+Graphs are stored in canonical atom order. Each input spelling is an alias
+holding the canonical key and the atom order of that input, so a repeated
+input is served (in its own atom numbering) without touching RDKit, and a
+new spelling of a cached molecule only costs one canonicalization.
+"""
+
+import os
+import hashlib
+import tempfile
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import torch
+
+DEFAULT_CACHE_SIZE = 2048
+
+MolGraph = namedtuple('MolGraph', ['x', 'edge_index', 'edge_weight', 'symbols'])
+
+def sort_edges(edge_index, edge_weight, num_atoms):
+    """Edges in row-major (source, target) order, so the edge list depends only on the atom numbering"""
+    perm = torch.argsort(edge_index[0] * num_atoms + edge_index[1])
+    return edge_index[:, perm], edge_weight[perm]
+
+def to_input_order(graph, order):
+    """
+    Renumber a canonical-order graph into an input's atom order.
+    order[k] is the input atom index of canonical atom k (RDKit's
+    _smilesAtomOutputOrder); None means the orders coincide.
+    """
+    if order is None:
+        return graph
+    position = torch.empty_like(order)
+    position[order] = torch.arange(len(order))
+    edge_index, edge_weight = sort_edges(order[graph.edge_index], graph.edge_weight, len(order))
+    return MolGraph(
+        graph.x[position],
+        edge_index,
+        edge_weight,
+        [graph.symbols[k] for k in position.tolist()]
+    )
+
+def _file_key(smiles):
+    return hashlib.sha1(smiles.encode('utf-8')).hexdigest()
+
+class GraphCache:
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, cache_dir=None):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.graphs = OrderedDict()   # canonical SMILES -> MolGraph (canonical atom order)
+        self.aliases = OrderedDict()  # input SMILES -> (canonical SMILES, atom order)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _remember(self, table, key, value):
+        if self.max_size <= 0:
+            return
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_size:
+            table.popitem(last=False)
+
+    def _path(self, smiles, kind):
+        return os.path.join(self.cache_dir, f"{_file_key(smiles)}.{kind}.npz")
+
+    def _canonical_graph(self, canonical):
+        graph = self.graphs.get(canonical)
+        if graph is not None:
+            self.graphs.move_to_end(canonical)
+            return graph, False
+        graph = self._load_graph(canonical)
+        if graph is not None:
+            self._remember(self.graphs, canonical, graph)
+        return graph, graph is not None
+
+    def _record_hit(self, from_disk):
+        if from_disk:
+            self.disk_hits += 1
+        else:
+            self.hits += 1
+
+    def lookup(self, smiles):
+        """Graph (in the input's atom order) for an input seen before, else None. No RDKit."""
+        alias = self.aliases.get(smiles)
+        if alias is not None:
+            self.aliases.move_to_end(smiles)
+        else:
+            alias = self._load_alias(smiles)
+            if alias is None:
+                return None
+            self._remember(self.aliases, smiles, alias)
+
+        graph, from_disk = self._canonical_graph(alias[0])
+        if graph is None:
+            return None
+        self._record_hit(from_disk)
+        return to_input_order(graph, alias[1])
+
+    def lookup_canonical(self, smiles, canonical, order):
+        """Second chance after canonicalizing: another spelling of a cached molecule"""
+        graph, from_disk = self._canonical_graph(canonical)
+        if graph is None:
+            return None
+        self._record_hit(from_disk)
+        self._add_alias(smiles, canonical, order)
+        return to_input_order(graph, order)
+
+    def put(self, smiles, canonical, order, graph):
+        """Store a freshly featurized canonical-order graph and the input's alias"""
+        self.misses += 1
+        self._remember(self.graphs, canonical, graph)
+        if self.cache_dir:
+            self._save(self._path(canonical, 'graph'), canonical=np.array(canonical), x=graph.x.numpy(),
+                       edge_index=graph.edge_index.numpy(), edge_weight=graph.edge_weight.numpy(),
+                       symbols=np.array(graph.symbols, dtype=str))
+        self._add_alias(smiles, canonical, order)
+
+    def _add_alias(self, smiles, canonical, order):
+        self._remember(self.aliases, smiles, (canonical, order))
+        if self.cache_dir:
+            order_array = np.arange(0) if order is None else order.numpy()
+            self._save(self._path(smiles, 'alias'), canonical=np.array(canonical), order=order_array)
+
+    def _load_graph(self, canonical):
+        if not self.cache_dir:
+            return None
+        try:
+            with np.load(self._path(canonical, 'graph'), allow_pickle=False) as data:
+                if str(data['canonical']) != canonical:
+                    return None
+                return MolGraph(
+                    torch.from_numpy(data['x']),
+                    torch.from_numpy(data['edge_index']),
+                    torch.from_numpy(data['edge_weight']),
+                    data['symbols'].tolist()
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _load_alias(self, smiles):
+        if not self.cache_dir:
+            return None
+        try:
+            with np.load(self._path(smiles, 'alias'), allow_pickle=False) as data:
+                order = data['order']
+                return str(data['canonical']), (torch.from_numpy(order) if len(order) else None)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save(self, path, **arrays):
+        # Write to a temp file and rename so concurrent workers never read a partial file
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.npz', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self):
+        return {
+            "size": len(self.graphs),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses
+        }
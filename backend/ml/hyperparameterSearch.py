@@ -0,0 +1,221 @@
+"""
+Hyperparameter Search for the anomaly models
+Evaluates a grid (or a random sample of it) of IsolationForest /
+RandomForestClassifier settings across all cores, writes a ranked
+leaderboard and saves the winner through the model registry.
+
+Workers run in a process pool with one BLAS/OpenMP thread budget each and
+read the training matrix from a single shared-memory copy.
+"""
+
+import os
+import sys
+import json
+import itertools
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import anomalyDetector
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEADERBOARD_PATH = os.path.join(BASE_DIR, 'ml_data', 'anomaly_search_leaderboard.json')
+
+PARAM_GRID = {
+    'contamination': [0.05, 0.1, 0.15, 0.2],
+    'n_estimators': [100, 200, 400],
+    'max_samples': ['auto', 0.5, 1.0],
+    'max_depth': [None, 4, 8]
+}
+
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+# Worker-side views of the shared training data (set by _init_worker)
+_SHARED = {}
+
+def candidate_params(grid=PARAM_GRID, n_random=None, seed=RANDOM_STATE):
+    """Every grid combination, or n_random of them drawn without replacement"""
+    keys = list(grid)
+    candidates = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    if n_random is not None and n_random < len(candidates):
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(len(candidates), size=n_random, replace=False)
+        candidates = [candidates[i] for i in sorted(picks)]
+    return candidates
+
+def model_params(candidate):
+    """Split one search candidate into fit_models() parameters"""
+    return {
+        'isolation_forest': {
+            'contamination': candidate['contamination'],
+            'n_estimators': candidate['n_estimators'],
+            'max_samples': candidate['max_samples'],
+            'random_state': RANDOM_STATE
+        },
+        'random_forest': {
+            'n_estimators': candidate['n_estimators'],
+            'max_depth': candidate['max_depth'],
+            'random_state': RANDOM_STATE
+        }
+    }
+
+class SharedArrays:
+    """Copies arrays into named shared memory blocks once; workers attach by name"""
+
+    def __init__(self, **arrays):
+        self.blocks = {}
+        self.specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks[name] = block
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _init_worker(specs, threads_per_worker):
+    # Cap native thread pools so N workers do not oversubscribe the cores
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads_per_worker)
+    from threadpoolctl import threadpool_limits
+    _SHARED['limits'] = threadpool_limits(limits=threads_per_worker)
+
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _SHARED[name] = array
+        _SHARED['block_' + name] = block
+
+def evaluate_candidate(candidate):
+    """Fit one candidate on the training split and score it on the held-out split"""
+    from sklearn.ensemble import IsolationForest, RandomForestClassifier
+    from sklearn.metrics import f1_score, roc_auc_score
+
+    X, y, is_test = _SHARED['X'], _SHARED['y'], _SHARED['is_test']
+    X_train, y_train = X[~is_test], y[~is_test]
+    X_test, y_test = X[is_test], y[is_test]
+    params = model_params(candidate)
+    both_classes = len(np.unique(y_test)) > 1
+
+    iso_forest = IsolationForest(n_jobs=1, **params['isolation_forest']).fit(X_train)
+    iso_flags = iso_forest.predict(X_test) == -1
+    result = {
+        'params': candidate,
+        'isolation_forest_f1': float(f1_score(y_test, iso_flags, zero_division=0)),
+        'isolation_forest_auc': float(roc_auc_score(y_test, -iso_forest.decision_function(X_test))) if both_classes else None
+    }
+    scores = [result['isolation_forest_f1']]
+
+    if len(np.unique(y_train)) > 1:
+        rf_classifier = RandomForestClassifier(n_jobs=1, **params['random_forest']).fit(X_train, y_train)
+        proba = rf_classifier.predict_proba(X_test)[:, 1]
+        result['random_forest_f1'] = float(f1_score(y_test, proba >= 0.5, zero_division=0))
+        result['random_forest_auc'] = float(roc_auc_score(y_test, proba)) if both_classes else None
+        scores.append(result['random_forest_f1'])
+
+    # Rank on anomaly-class F1 of both detectors, AUC breaks ties
+    result['score'] = float(np.mean(scores))
+    aucs = [v for k, v in result.items() if k.endswith('_auc') and v is not None]
+    result['tiebreak'] = float(np.mean(aucs)) if aucs else 0.0
+    return result
+
+def run_search(X, y, candidates, n_workers=None):
+    """Evaluate candidates in a process pool. Returns results ranked best first."""
+    n_workers = n_workers or os.cpu_count() or 1
+    threads_per_worker = max(1, (os.cpu_count() or 1) // n_workers)
+
+    # One fixed split shared by every candidate
+    rng = np.random.default_rng(RANDOM_STATE)
+    is_test = np.zeros(len(X), dtype=bool)
+    is_test[rng.choice(len(X), size=max(1, int(round(len(X) * TEST_SIZE))), replace=False)] = True
+
+    with SharedArrays(X=np.asarray(X, dtype=np.float64), y=np.asarray(y, dtype=np.int64), is_test=is_test) as shared:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(shared.specs, threads_per_worker)) as pool:
+            results = list(pool.map(evaluate_candidate, candidates))
+
+    results.sort(key=lambda r: (r['score'], r['tiebreak']), reverse=True)
+    for rank, result in enumerate(results, 1):
+        result['rank'] = rank
+    return results
+
+def write_leaderboard(results, meta, path=LEADERBOARD_PATH):
+    leaderboard = dict(meta, created_at=datetime.now(timezone.utc).isoformat(), results=results)
+    with open(path, 'w') as f:
+        json.dump(leaderboard, f, indent=2)
+    return path
+
+def search(from_db=False, n_random=None, n_workers=None, **db_options):
+    """Search, write the leaderboard, then refit and register the winner"""
+    if from_db:
+        X, y, _ = anomalyDetector.sample_calculations(**db_options)
+        source = 'calculations'
+    else:
+        X, y = anomalyDetector.load_json_training_matrix()
+        source = os.path.relpath(anomalyDetector.DATA_PATH, BASE_DIR)
+
+    if len(X) == 0:
+        print("Error: No training data")
+        return
+
+    candidates = candidate_params(n_random=n_random)
+    print(f"Evaluating {len(candidates)} candidates on {len(X)} samples "
+          f"with {n_workers or os.cpu_count()} workers...")
+    results = run_search(X, y, candidates, n_workers)
+
+    path = write_leaderboard(results, {'source': source, 'training_rows': int(len(X))})
+    print(f"✓ Leaderboard saved to {path}")
+    print("\nTop candidates:")
+    for result in results[:5]:
+        print(f"  #{result['rank']} score={result['score']:.3f} {result['params']}")
+
+    # Refit the winner the normal way and publish it to the registry
+    best = results[0]
+    params = model_params(best['params'])
+    iso_forest, rf_classifier, metrics = anomalyDetector.fit_models(X, y, anomalyDetector.FEATURES, params)
+    return anomalyDetector.save_models(iso_forest, rf_classifier, anomalyDetector.FEATURES, {
+        'source': source,
+        'training_rows': int(len(X)),
+        'params': params,
+        'metrics': dict(metrics, search=best),
+        'search_leaderboard': os.path.relpath(path, BASE_DIR)
+    })
+
+if __name__ == "__main__":
+    # Usage:
+    #   python hyperparameterSearch.py [--random N] [--workers N]
+    #                                  [--from-db [--reservoir] [--max-rows N] [--db PATH]]
+    args = sys.argv[1:]
+    option_value = anomalyDetector.option_value
+    n_random = option_value(args, '--random', None)
+    n_workers = option_value(args, '--workers', None)
+    db_options = {}
+    if '--from-db' in args:
+        db_options = {
+            'db_path': option_value(args, '--db', anomalyDetector.DB_PATH),
+            'sampling': 'reservoir' if '--reservoir' in args else 'chunk',
+            'max_rows': int(option_value(args, '--max-rows', anomalyDetector.MAX_TRAINING_ROWS))
+        }
+    search(
+        from_db='--from-db' in args,
+        n_random=int(n_random) if n_random else None,
+        n_workers=int(n_workers) if n_workers else None,
+        **db_options
+    )
@@ -2,9 +2,11 @@
 import sys
 import json
 import os
-import joblib
-import pandas as pd
+import threading
+from collections import namedtuple
 import numpy as np
+import modelRegistry
+from treeEnsemble import CompiledIsolationForest, CompiledRandomForest, load_compiled
 
 # Suppress sklearn warnings
 import warnings
@@ -12,87 +14,344 @@ warnings.filterwarnings("ignore")
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODEL_DIR = os.path.join(BASE_DIR, 'ml_models')
+DEFAULT_FEATURES = ['mass_balance', 'degradation', 'recovery', 'purity']
 
-def load_models():
+LoadedModels = namedtuple('LoadedModels', ['iso_forest', 'rf_classifier', 'features', 'version'])
+
+def load_feature_names(model_dir=MODEL_DIR):
+    """Feature order the models were trained with (written by anomalyDetector.py)"""
     try:
-        iso_forest = joblib.load(os.path.join(MODEL_DIR, 'isolation_forest.joblib'))
-        rf_classifier = joblib.load(os.path.join(MODEL_DIR, 'random_forest.joblib'))
-        return iso_forest, rf_classifier
+        with open(os.path.join(model_dir, 'model_features.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return list(DEFAULT_FEATURES)
+
+FEATURES = load_feature_names()
+
+def load_models(model_dir=None):
+    """
+    Load the live models: the registry's current version when there is one,
+    otherwise the flat files in ml_models/. iso_forest is None on failure.
+    """
+    version = None
+    if model_dir is None:
+        version = modelRegistry.current_version()
+        model_dir = modelRegistry.version_dir(version) if version else MODEL_DIR
+    elif os.path.dirname(os.path.abspath(model_dir)) == os.path.abspath(modelRegistry.VERSIONS_DIR):
+        # Registered versions are named by their content hash
+        version = os.path.basename(os.path.abspath(model_dir))
+    if version is None:
+        # Legacy flat layout: hash the artifacts, the id adopt_legacy() would give them
+        version = modelRegistry.content_hash(model_dir)
+    features = load_feature_names(model_dir)
+
+    try:
+        iso_forest = load_model(model_dir, 'isolation_forest', CompiledIsolationForest, features)
+        rf_classifier = load_model(model_dir, 'random_forest', CompiledRandomForest, features)
     except Exception as e:
-        return None, None
+        iso_forest, rf_classifier = None, None
+    if not iso_forest:
+        return LoadedModels(None, None, features, None)
+    return LoadedModels(iso_forest, rf_classifier, features, version)
+
+def load_model(model_dir, name, compiled_cls, features):
+    # Compiled flat-array models only need NumPy; the joblib pickles (and
+    # with them scikit-learn) are the fallback for models not yet exported,
+    # compiled on load so scoring and attributions share one code path
+    npz_path = os.path.join(model_dir, name + '.npz')
+    if os.path.exists(npz_path):
+        return load_compiled(npz_path)
+
+    joblib_path = os.path.join(model_dir, name + '.joblib')
+    if os.path.exists(joblib_path):
+        import joblib
+        estimator = joblib.load(joblib_path)
+        return compiled_cls.from_estimator(estimator, getattr(estimator, 'feature_names_in_', features))
+    return None
+
+class ModelWatcher:
+    """
+    Models for a long-running scorer. Every lookup stats the registry's
+    `current` pointer and swaps in the new version when it has moved,
+    so retraining never needs a worker restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = modelRegistry.current_stamp()
+        self.models = load_models()
+
+    def current(self):
+        stamp = modelRegistry.current_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._reload(stamp)
+        return self.models
+
+    def _reload(self, stamp):
+        models = load_models()
+        self._stamp = stamp
+        if not models.iso_forest:
+            # Keep serving the previous version rather than failing requests
+            sys.stderr.write("Model reload failed, keeping version %s\n" % self.models.version)
+            return
+        if models.version != self.models.version:
+            sys.stderr.write("Swapped models %s -> %s\n" % (self.models.version, models.version))
+        self.models = models
+
+def validate_models(models):
+    """Return an error message if an estimator disagrees with the feature list"""
+    features = models.features
+    for model in (models.iso_forest, models.rf_classifier):
+        if model is None:
+            continue
+        n_features = getattr(model, 'n_features_in_', len(features))
+        if n_features != len(features):
+            return f"Model expects {n_features} features, model_features.json lists {len(features)}"
+        names = getattr(model, 'feature_names_in_', None)
+        if names is not None and list(names) != features:
+            return "Model feature order does not match model_features.json"
+    return None
+
+def risk_level(failure_prob):
+    return "HIGH" if failure_prob > 70 else "MODERATE" if failure_prob > 30 else "LOW"
 
-def predict(input_data):
-    iso_forest, rf_classifier = load_models()
+def build_feature_matrix(records, features=None):
+    """
+    Collect the model features of every record into one float64 matrix.
+
+    Returns (X, row_index, errors): X holds one row per valid record,
+    row_index maps those rows back to positions in `records`, and
+    errors maps the position of each rejected record to its message.
+    """
+    features = features or FEATURES
+    rows = []
+    row_index = []
+    errors = {}
+
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors[i] = "Record must be a JSON object"
+            continue
+
+        missing = [f for f in features if f not in record]
+        if missing:
+            errors[i] = f"Missing feature: {missing[0]}"
+            continue
+
+        try:
+            rows.append([float(record[f]) for f in features])
+        except (TypeError, ValueError):
+            errors[i] = "Features must be numeric"
+            continue
+        row_index.append(i)
+
+    # C-contiguous float64 rows go straight to the estimators, no DataFrame
+    X = np.array(rows, dtype=np.float64, order='C').reshape(len(rows), len(features))
+    return X, row_index, errors
+
+def predict_batch(records, models=None):
+    """
+    Score many records with one call per estimator.
+
+    Returns one result dict per input record, in input order. Records
+    that cannot be scored get an {"error": ...} entry in their slot.
+    """
+    # Long-lived workers pass in the models held by their ModelWatcher;
+    # single-shot callers load them from disk here.
+    models = models or load_models()
+    iso_forest, rf_classifier, features = models.iso_forest, models.rf_classifier, models.features
     
     if not iso_forest:
-        return {"error": "ML models not found. Please train models first."}
+        return [{"error": "ML models not found. Please train models first."} for _ in records]
+
+    model_error = validate_models(models)
+    if model_error:
+        return [{"error": model_error} for _ in records]
+
+    X, row_index, errors = build_feature_matrix(records, features)
+    results = [{"error": errors[i]} if i in errors else None for i in range(len(records))]
+    if not row_index:
+        return results
 
-    # Prepare features
-    features = ['mass_balance', 'degradation', 'recovery', 'purity']
-    
-    # Check if input has all features
-    for f in features:
-        if f not in input_data:
-            return {"error": f"Missing feature: {f}"}
-            
-    X = pd.DataFrame([input_data])[features]
-    
     # 1. Anomaly Score (Isolation Forest)
     # decision_function returns negative values for outliers, positive for inliers
     # We want anomaly score: lower is more anomalous
-    anomaly_score = iso_forest.decision_function(X)[0]
-    
-    # Convert to probability-like score (0-100)
-    # Roughly scale: -0.5 (bad) to 0.5 (good)
-    # We want 100 = highly anomalous, 0 = normal
-    # decision_function: positive (normal), negative (anomaly)
-    # So invert: lower score -> higher probability of anomaly
+    anomaly_scores = iso_forest.decision_function(X)
     
-    # Normalize roughly based on typical IF output range
-    is_anomaly = iso_forest.predict(X)[0] # -1 for anomaly, 1 for normal
+    # IsolationForest.predict is defined as decision_function < 0 -> -1,
+    # so derive the label from the scores instead of a second tree pass
+    is_anomaly = anomaly_scores < 0
     
     # 2. Failure Prediction (Random Forest)
     if rf_classifier:
-        rf_prob = rf_classifier.predict_proba(X)[0]
         # Assuming class 1 is "anomaly/failure"
-        failure_prob = rf_prob[1] * 100
+        proba, bias, contributions = rf_classifier.predict_proba_with_contributions(X)
+        failure_probs = proba[:, 1] * 100
+        baseline_prob = float(bias[1] * 100)
         
-        # Feature importance Contribution (local interpretability using simple mult)
-        importances = rf_classifier.feature_importances_
-        feature_impact = {}
-        for idx, feat in enumerate(features):
-            feature_impact[feat] = float(importances[idx] * X.iloc[0, idx])
-            
-        top_factors = sorted(feature_impact.items(), key=lambda x: x[1], reverse=True)[:2]
+        # Per-sample attribution from each tree's decision path:
+        # failure_prob == baseline_prob + sum of the feature contributions
+        failure_contrib = contributions[:, :, 1] * 100
+        # Stable sort keeps feature order on ties, like sorted(..., reverse=True)
+        top_idx = np.argsort(-failure_contrib, axis=1, kind='stable')[:, :2]
+        top_factors = [[features[j] for j in row] for row in top_idx]
+        feature_contributions = [
+            {f: float(c) for f, c in zip(features, row)} for row in failure_contrib
+        ]
     else:
-        failure_prob = 0
-        top_factors = []
-
-    # Combine metrics
-    result = {
-        "is_anomaly": bool(is_anomaly == -1),
-        "anomaly_score": float(anomaly_score),
-        "failure_probability": float(failure_prob),
-        "risk_level": "HIGH" if failure_prob > 70 else "MODERATE" if failure_prob > 30 else "LOW",
-        "top_factors": [f[0] for f in top_factors],
-        "model_version": "v1.0"
-    }
+        failure_probs = np.zeros(len(row_index))
+        baseline_prob = 0.0
+        top_factors = [[] for _ in row_index]
+        feature_contributions = [{} for _ in row_index]
+
+    for row, i in enumerate(row_index):
+        failure_prob = float(failure_probs[row])
+        results[i] = {
+            "is_anomaly": bool(is_anomaly[row]),
+            "anomaly_score": float(anomaly_scores[row]),
+            "failure_probability": failure_prob,
+            "risk_level": risk_level(failure_prob),
+            "top_factors": top_factors[row],
+            "feature_contributions": feature_contributions[row],
+            "baseline_failure_probability": baseline_prob,
+            "model_version": models.version
+        }
     
+    return results
+
+def predict(input_data, models=None):
+    """Score a single record (see predict_batch)"""
+    return predict_batch([input_data], models)[0]
+
+def handle_line(line, watcher):
+    """Score one newline-delimited JSON request and return the response dict"""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return {"error": f"Invalid JSON: {e}"}
+
+    if isinstance(request, list):
+        try:
+            return predict_batch(request, watcher.current())
+        except Exception as e:
+            return {"error": str(e)}
+
+    if not isinstance(request, dict):
+        return {"error": "Request must be a JSON object or array"}
+
+    # Echo an optional request id so callers can match responses
+    request_id = request.pop('id', None)
+    try:
+        result = predict(request, watcher.current())
+    except Exception as e:
+        result = {"error": str(e)}
+
+    if request_id is not None:
+        result['id'] = request_id
     return result
 
-if __name__ == "__main__":
+def serve_stream(stream_in, stream_out, watcher):
+    """Answer one JSON response line per JSON request line until EOF"""
+    for line in stream_in:
+        if not line.strip():
+            continue
+        stream_out.write(json.dumps(handle_line(line, watcher)) + "\n")
+        stream_out.flush()
+
+def serve_socket(socket_path, watcher):
+    """Serve the line protocol on a local Unix domain socket"""
+    import socketserver
+
+    class LineHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode('utf-8')
+                if not line.strip():
+                    continue
+                response = json.dumps(handle_line(line, watcher)) + "\n"
+                self.wfile.write(response.encode('utf-8'))
+                self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, LineHandler)
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def serve(socket_path=None):
+    """Persistent scoring worker: load the models once, then answer requests"""
+    watcher = ModelWatcher()
+    if not watcher.models.iso_forest:
+        print(json.dumps({"error": "ML models not found. Please train models first."}))
+        sys.stdout.flush()
+        sys.exit(1)
+
+    # Readiness line so the parent process knows the cold start is done
+    print(json.dumps({"ready": True, "model_version": watcher.models.version}))
+    sys.stdout.flush()
+
+    if socket_path:
+        serve_socket(socket_path, watcher)
+    else:
+        serve_stream(sys.stdin, sys.stdout, watcher)
+
+def parse_input(input_str):
+    """
+    Parse single-shot stdin: one JSON object, a JSON array of objects,
+    or JSON lines. Returns (payload, is_json_lines).
+    """
+    try:
+        return json.loads(input_str), False
+    except ValueError:
+        lines = [line for line in input_str.splitlines() if line.strip()]
+        return [json.loads(line) for line in lines], True
+
+def run_once():
+    """Single-shot mode: read stdin once, write the result(s) to stdout"""
     try:
         # Read input from stdin
         input_str = sys.stdin.read()
-        if not input_str:
+        if not input_str.strip():
             print(json.dumps({"error": "No input provided"}))
             sys.exit(1)
             
-        input_data = json.loads(input_str)
-        result = predict(input_data)
-        print(json.dumps(result))
+        input_data, is_json_lines = parse_input(input_str)
+        if isinstance(input_data, list):
+            results = predict_batch(input_data)
+            if is_json_lines:
+                print("\n".join(json.dumps(r) for r in results))
+            else:
+                print(json.dumps(results))
+        else:
+            print(json.dumps(predict(input_data)))
         sys.stdout.flush()
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.stdout.flush()
         sys.exit(1)
+
+if __name__ == "__main__":
+    # Usage:
+    #   python mlService.py                          JSON object, array or lines on stdin
+    #   python mlService.py --serve                  JSON lines on stdin/stdout
+    #   python mlService.py --serve --socket PATH    JSON lines on a Unix socket
+    args = sys.argv[1:]
+    if '--serve' in args:
+        socket_path = None
+        if '--socket' in args:
+            idx = args.index('--socket')
+            if idx + 1 >= len(args):
+                print(json.dumps({"error": "--socket requires a path"}))
+                sys.exit(1)
+            socket_path = args[idx + 1]
+        serve(socket_path)
+    else:
+        run_once()
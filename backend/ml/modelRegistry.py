@@ -0,0 +1,167 @@
+"""
+Model Registry
+Versioned, content-hashed model artifacts under ml_models/
+
+Layout:
+    ml_models/versions/<hash>/   one directory per training run
+        isolation_forest.npz, random_forest.npz, *.joblib,
+        model_features.json, metadata.json
+    ml_models/current            text file holding the live <hash>
+
+A run is written to a staging directory, hashed, renamed into versions/
+and only then made live by atomically replacing the `current` file, so a
+reader never sees a half-written version.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(BASE_DIR, 'ml_models')
+VERSIONS_DIR = os.path.join(MODEL_DIR, 'versions')
+CURRENT_PATH = os.path.join(MODEL_DIR, 'current')
+
+METADATA_FILE = 'metadata.json'
+HASH_LENGTH = 12
+
+# Files that define a model version (metadata is not part of the hash)
+ARTIFACT_FILES = [
+    'isolation_forest.npz',
+    'random_forest.npz',
+    'isolation_forest.joblib',
+    'random_forest.joblib',
+    'model_features.json'
+]
+
+def content_hash(directory):
+    """SHA-256 over the artifact files present in a directory"""
+    digest = hashlib.sha256()
+    for name in ARTIFACT_FILES:
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            continue
+        digest.update(name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+def stage():
+    """New empty staging directory on the same filesystem as versions/"""
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    return tempfile.mkdtemp(prefix='.staging-', dir=VERSIONS_DIR)
+
+def _atomic_write(path, text):
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def publish(staging_dir, metadata, make_current=True):
+    """
+    Seal a staging directory as a version and (optionally) make it live.
+    Returns the version hash. Re-publishing identical artifacts reuses the
+    existing version directory.
+    """
+    version = content_hash(staging_dir)
+    metadata = dict(metadata)
+    metadata['version'] = version
+    metadata.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+
+    with open(os.path.join(staging_dir, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    target = os.path.join(VERSIONS_DIR, version)
+    try:
+        os.rename(staging_dir, target)
+    except OSError:
+        # Same artifacts were already registered (possibly by a concurrent run)
+        if not os.path.isdir(target):
+            raise
+        shutil.rmtree(staging_dir)
+
+    if make_current:
+        set_current(version)
+    return version
+
+def set_current(version):
+    """Atomically point `current` at an existing version"""
+    if not os.path.isdir(os.path.join(VERSIONS_DIR, version)):
+        raise ValueError(f"Unknown model version: {version}")
+    _atomic_write(CURRENT_PATH, version + '\n')
+
+def current_version():
+    """Live version hash, or None when the registry has not been used yet"""
+    try:
+        with open(CURRENT_PATH, 'r') as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return version or None
+
+def current_stamp():
+    """Cheap change marker for the `current` pointer (None if absent)"""
+    try:
+        st = os.stat(CURRENT_PATH)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def version_dir(version):
+    return os.path.join(VERSIONS_DIR, version)
+
+def read_metadata(version):
+    with open(os.path.join(version_dir(version), METADATA_FILE), 'r') as f:
+        return json.load(f)
+
+def list_versions():
+    """Metadata of every registered version, newest first"""
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    versions = []
+    for name in os.listdir(VERSIONS_DIR):
+        if name.startswith('.'):
+            continue
+        try:
+            versions.append(read_metadata(name))
+        except (OSError, ValueError):
+            continue
+    return sorted(versions, key=lambda m: m.get('created_at', ''), reverse=True)
+
+def adopt_legacy():
+    """Register the flat ml_models/ artifacts as a version and make it live"""
+    staging_dir = stage()
+    for name in ARTIFACT_FILES:
+        path = os.path.join(MODEL_DIR, name)
+        if os.path.exists(path):
+            shutil.copy2(path, os.path.join(staging_dir, name))
+    return publish(staging_dir, {'source': 'legacy ml_models/'})
+
+if __name__ == "__main__":
+    # Usage:
+    #   python modelRegistry.py                 list versions
+    #   python modelRegistry.py --use <hash>    roll the live version
+    #   python modelRegistry.py --adopt         register flat ml_models/ files
+    args = sys.argv[1:]
+    if '--adopt' in args:
+        print(f"✓ Registered legacy models as {adopt_legacy()}")
+    elif '--use' in args and args.index('--use') + 1 < len(args):
+        set_current(args[args.index('--use') + 1])
+        print(f"✓ Current model version: {current_version()}")
+    else:
+        live = current_version()
+        for meta in list_versions():
+            marker = '*' if meta['version'] == live else ' '
+            print(f"{marker} {meta['version']}  {meta.get('created_at', '')}  rows={meta.get('training_rows', '-')}")
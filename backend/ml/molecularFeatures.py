@@ -6,12 +6,151 @@ Uses RDKit for molecular descriptors and fingerprints
 from rdkit import Chem
 from rdkit.Chem import Descriptors, rdMolDescriptors, AllChem
 from rdkit.Chem import Lipinski, Crippen
+from rdkit import DataStructs
 import numpy as np
 import json
+import os
+import itertools
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from fingerprintStore import pack_fingerprint
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATTERNS_PATH = os.path.join(BASE_DIR, 'ml_data', 'reactive_patterns.json')
+
+# Sites read by the stress-type scoring rules; every pattern library must define them
+SCORED_PATTERNS = [
+    'ester', 'amide', 'lactone', 'lactam', 'secondary_alcohol', 'primary_amine',
+    'secondary_amine', 'thioether', 'phenol', 'aromatic_amine', 'enone'
+]
+
+# Compiled pattern libraries by file path, shared by every extractor
+_compiled_patterns = {}
+
+def load_reactive_patterns(path=PATTERNS_PATH):
+    """
+    Reactive-group SMARTS from a JSON data file, compiled to RDKit query
+    molecules once per file and process. Returns {name: pattern} in file order.
+    """
+    path = os.path.abspath(path)
+    if path not in _compiled_patterns:
+        with open(path, 'r') as f:
+            library = json.load(f)
+
+        patterns = {}
+        for name, entry in library['patterns'].items():
+            pattern = Chem.MolFromSmarts(entry['smarts'])
+            if pattern is None:
+                raise ValueError(f"Invalid SMARTS for reactive pattern '{name}': {entry['smarts']}")
+            patterns[name] = pattern
+
+        missing = [name for name in SCORED_PATTERNS if name not in patterns]
+        if missing:
+            raise ValueError(f"Pattern library {path} is missing scored patterns: {', '.join(missing)}")
+        _compiled_patterns[path] = patterns
+    return _compiled_patterns[path]
+
+HALOGENS = [9, 17, 35, 53]
+
+def element_counts(mol):
+    """Atoms per atomic number ([119] array) from one pass over the molecule"""
+    atomic_nums = np.fromiter((atom.GetAtomicNum() for atom in mol.GetAtoms()), dtype=np.int64,
+                              count=mol.GetNumAtoms())
+    return np.bincount(atomic_nums, minlength=119)
+
+DEFAULT_CACHE_SIZE = 1024
+
+# Column order of descriptor_matrix(); same keys as calculate_descriptors()
+DESCRIPTOR_NAMES = [
+    'molecular_weight', 'logp', 'tpsa',
+    'num_rotatable_bonds', 'num_aromatic_rings', 'num_aliphatic_rings', 'num_saturated_rings',
+    'num_h_donors', 'num_h_acceptors',
+    'num_heavy_atoms', 'num_heteroatoms', 'num_sp3_carbons',
+    'num_nitrogens', 'num_oxygens', 'num_sulfurs', 'num_halogens',
+    'fraction_sp3', 'aromatic_proportion',
+    'num_rings', 'num_bridgehead_atoms', 'num_spiro_atoms'
+]
+
+# descriptor_matrix(): SMILES per worker task
+DESCRIPTOR_CHUNK_SIZE = 512
+
+class MoleculeRecord:
+    """Parsed molecule (canonical atom order) with its descriptors and reactive-site matches, filled lazily"""
+    __slots__ = ('canonical', 'mol', 'descriptors', 'site_matches')
+
+    def __init__(self, canonical, mol):
+        self.canonical = canonical
+        self.mol = mol
+        self.descriptors = None
+        self.site_matches = None
+
+class MoleculeCache:
+    """
+    LRU of MoleculeRecords keyed by canonical SMILES. Each input spelling is
+    an alias holding the canonical key and that input's atom order, so a
+    repeated input skips RDKit parsing and another spelling of a cached
+    molecule only pays for canonicalization.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.records = OrderedDict()  # canonical SMILES -> MoleculeRecord
+        self.aliases = OrderedDict()  # input SMILES -> (canonical SMILES, atom order)
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, table, key, value):
+        if self.max_size <= 0:
+            return
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_size:
+            table.popitem(last=False)
+
+    def get(self, smiles):
+        """
+        (record, order) for a SMILES string. order[k] is the input atom index
+        of canonical atom k, or None when the two orders coincide.
+        """
+        alias = self.aliases.get(smiles)
+        if alias is not None and alias[0] in self.records:
+            self.hits += 1
+            self.aliases.move_to_end(smiles)
+            self.records.move_to_end(alias[0])
+            return self.records[alias[0]], alias[1]
+
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            raise ValueError(f"Invalid SMILES: {smiles}")
+        canonical = Chem.MolToSmiles(mol)
+        order = list(mol.GetPropsAsDict(True, True)['_smilesAtomOutputOrder'])
+        order = None if order == list(range(len(order))) else order
+
+        record = self.records.get(canonical)
+        if record is not None:
+            self.hits += 1
+            self.records.move_to_end(canonical)
+        else:
+            self.misses += 1
+            record = MoleculeRecord(canonical, mol if order is None else Chem.RenumberAtoms(mol, order))
+            self._remember(self.records, canonical, record)
+        self._remember(self.aliases, smiles, (canonical, order))
+        return record, order
+
+    def stats(self):
+        return {
+            "size": len(self.records),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
 
 class MolecularFeatureExtractor:
-    def __init__(self):
+    def __init__(self, patterns_path=PATTERNS_PATH, cache_size=DEFAULT_CACHE_SIZE):
         self.feature_names = []
+        self.reactive_patterns = load_reactive_patterns(patterns_path)
+        # Parsed molecules, descriptors and reactive sites by canonical SMILES
+        self.cache = MoleculeCache(cache_size)
     
     def smiles_to_mol(self, smiles):
         """Convert SMILES string to RDKit molecule"""
@@ -31,7 +170,15 @@ class MolecularFeatureExtractor:
         - Reactive sites: Nitrogens, oxygens, halogens
         """
         
-        mol = self.smiles_to_mol(smiles)
+        record, _ = self.cache.get(smiles)
+        if record.descriptors is None:
+            record.descriptors = self._compute_descriptors(record.mol)
+        return dict(record.descriptors)
+    
+    def _compute_descriptors(self, mol):
+        num_rings = rdMolDescriptors.CalcNumRings(mol)
+        num_aromatic_rings = rdMolDescriptors.CalcNumAromaticRings(mol)
+        elements = element_counts(mol)
         
         descriptors = {
             # Basic properties
@@ -41,7 +188,7 @@ class MolecularFeatureExtractor:
             
             # Structural features
             'num_rotatable_bonds': Lipinski.NumRotatableBonds(mol),
-            'num_aromatic_rings': rdMolDescriptors.CalcNumAromaticRings(mol),
+            'num_aromatic_rings': num_aromatic_rings,
             'num_aliphatic_rings': rdMolDescriptors.CalcNumAliphaticRings(mol),
             'num_saturated_rings': rdMolDescriptors.CalcNumSaturatedRings(mol),
             
@@ -55,17 +202,17 @@ class MolecularFeatureExtractor:
             'num_sp3_carbons': rdMolDescriptors.CalcNumAliphaticCarbocycles(mol),
             
             # Reactive functional groups
-            'num_nitrogens': sum(1 for atom in mol.GetAtoms() if atom.GetAtomicNum() == 7),
-            'num_oxygens': sum(1 for atom in mol.GetAtoms() if atom.GetAtomicNum() == 8),
-            'num_sulfurs': sum(1 for atom in mol.GetAtoms() if atom.GetAtomicNum() == 16),
-            'num_halogens': sum(1 for atom in mol.GetAtoms() if atom.GetAtomicNum() in [9, 17, 35, 53]),
+            'num_nitrogens': int(elements[7]),
+            'num_oxygens': int(elements[8]),
+            'num_sulfurs': int(elements[16]),
+            'num_halogens': int(elements[HALOGENS].sum()),
             
             # Stability indicators
             'fraction_sp3': rdMolDescriptors.CalcFractionCSP3(mol),
-            'aromatic_proportion': rdMolDescriptors.CalcNumAromaticRings(mol) / max(1, rdMolDescriptors.CalcNumRings(mol)) if rdMolDescriptors.CalcNumRings(mol) > 0 else 0,
+            'aromatic_proportion': num_aromatic_rings / max(1, num_rings) if num_rings > 0 else 0,
             
             # Complexity
-            'num_rings': rdMolDescriptors.CalcNumRings(mol),
+            'num_rings': num_rings,
             'num_bridgehead_atoms': rdMolDescriptors.CalcNumBridgeheadAtoms(mol),
             'num_spiro_atoms': rdMolDescriptors.CalcNumSpiroAtoms(mol),
         }
@@ -77,9 +224,17 @@ class MolecularFeatureExtractor:
         Calculate Morgan (circular) fingerprint
         Used for similarity searches and ML input
         """
-        mol = self.smiles_to_mol(smiles)
-        fp = AllChem.GetMorganFingerprintAsBitVect(mol, radius, nBits=n_bits)
-        return np.array(fp)
+        record, _ = self.cache.get(smiles)
+        fp = AllChem.GetMorganFingerprintAsBitVect(record.mol, radius, nBits=n_bits)
+        # 0/1 per bit as uint8 (1 byte per bit rather than int64)
+        bits = np.zeros(n_bits, dtype=np.uint8)
+        DataStructs.ConvertToNumpyArray(fp, bits)
+        return bits
+    
+    def packed_fingerprint(self, smiles, radius=2, n_bits=2048):
+        """Morgan fingerprint packed into n_bits / 64 uint64 words, the FingerprintStore row format"""
+        record, _ = self.cache.get(smiles)
+        return pack_fingerprint(record.mol, radius, n_bits)
     
     def identify_reactive_sites(self, smiles):
         """
@@ -91,32 +246,22 @@ class MolecularFeatureExtractor:
         - Photolysis (aromatic rings, conjugated systems)
         """
         
-        mol = self.smiles_to_mol(smiles)
-        
-        # SMARTS patterns for reactive groups
-        reactive_patterns = {
-            'ester': Chem.MolFromSmarts('C(=O)O'),
-            'amide': Chem.MolFromSmarts('C(=O)N'),
-            'lactone': Chem.MolFromSmarts('C1OC(=O)C1'),
-            'lactam': Chem.MolFromSmarts('C1NC(=O)C1'),
-            'secondary_alcohol': Chem.MolFromSmarts('[CH](O)'),
-            'primary_amine': Chem.MolFromSmarts('[CH2]N'),
-            'secondary_amine': Chem.MolFromSmarts('[CH]N'),
-            'thioether': Chem.MolFromSmarts('CSC'),
-            'phenol': Chem.MolFromSmarts('c[OH]'),
-            'aromatic_amine': Chem.MolFromSmarts('cN'),
-            'enone': Chem.MolFromSmarts('C=CC=O'),
-            'aldehyde': Chem.MolFromSmarts('[CH]=O'),
-            'ketone': Chem.MolFromSmarts('CC(=O)C'),
-        }
+        record, order = self.cache.get(smiles)
+        if record.site_matches is None:
+            # One search per precompiled pattern: RDKit has no matcher that
+            # enumerates every match of many patterns in a single traversal
+            record.site_matches = {
+                site_name: record.mol.GetSubstructMatches(pattern)
+                for site_name, pattern in self.reactive_patterns.items()
+            }
         
+        # Matches are in canonical atom order; report them in the input's numbering
         reactive_sites = {}
-        
-        for site_name, pattern in reactive_patterns.items():
-            matches = mol.GetSubstructMatches(pattern)
+        for site_name, matches in record.site_matches.items():
             reactive_sites[site_name] = {
                 'count': len(matches),
-                'atom_indices': [list(match) for match in matches] if matches else []
+                'atom_indices': [list(match) if order is None else [order[i] for i in match]
+                                 for match in matches]
             }
         
         return reactive_sites
@@ -301,6 +446,71 @@ class MolecularFeatureExtractor:
             }
         }
 
+# Per-process extractor for descriptor_matrix() workers (library screening
+# rarely repeats a molecule, so no cache: worker memory stays flat)
+_worker_extractor = None
+
+def _descriptor_chunk(smiles_chunk):
+    """Descriptor rows and validity flags for one chunk of SMILES"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = MolecularFeatureExtractor(cache_size=0)
+
+    X = np.full((len(smiles_chunk), len(DESCRIPTOR_NAMES)), np.nan, dtype=np.float32)
+    valid = np.zeros(len(smiles_chunk), dtype=bool)
+    for i, smiles in enumerate(smiles_chunk):
+        if not isinstance(smiles, str):
+            continue
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            continue
+        descriptors = _worker_extractor._compute_descriptors(mol)
+        X[i] = [descriptors[name] for name in DESCRIPTOR_NAMES]
+        valid[i] = True
+    return X, valid
+
+def iter_descriptor_chunks(smiles_iterable, n_jobs=None, chunk_size=DESCRIPTOR_CHUNK_SIZE):
+    """
+    Yield (X, valid) blocks for consecutive chunks of the input, in input
+    order. The input is consumed lazily and at most 2 * n_jobs chunks are in
+    flight, so memory stays flat however long the iterable is.
+    """
+    n_jobs = n_jobs if n_jobs and n_jobs > 0 else (os.cpu_count() or 1)
+    source = iter(smiles_iterable)
+    chunks = iter(lambda: list(itertools.islice(source, chunk_size)), [])
+
+    if n_jobs == 1:
+        for chunk in chunks:
+            yield _descriptor_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(_descriptor_chunk, chunk))
+                if len(pending) >= 2 * n_jobs:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Consumer stopped early: drop chunks that have not started
+            for future in pending:
+                future.cancel()
+
+def descriptor_matrix(smiles_iterable, n_jobs=None, chunk_size=DESCRIPTOR_CHUNK_SIZE):
+    """
+    Descriptors for many SMILES as a dense float32 matrix.
+
+    Returns (X, valid): X is [n, len(DESCRIPTOR_NAMES)] in DESCRIPTOR_NAMES
+    column order, valid is a boolean mask; rows of unparseable SMILES are NaN.
+    n_jobs=None uses every core, n_jobs=1 runs in-process.
+    """
+    blocks = list(iter_descriptor_chunks(smiles_iterable, n_jobs, chunk_size))
+    if not blocks:
+        return np.empty((0, len(DESCRIPTOR_NAMES)), dtype=np.float32), np.empty(0, dtype=bool)
+    return np.concatenate([X for X, _ in blocks]), np.concatenate([valid for _, valid in blocks])
+
 def main():
     """Demo usage"""
     print("=" * 60)
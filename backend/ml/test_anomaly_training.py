@@ -0,0 +1,97 @@
+"""
+Database training: chunked streaming from calculations and bounded sampling
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+
+import anomalyDetector
+
+def make_calculations_db(path, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lk_imb = rng.normal(100, 3, n_rows)
+    degradation = rng.uniform(0, 30, n_rows)
+    recommended = lk_imb + rng.normal(0, 1, n_rows)
+    status = np.where(np.abs(recommended - 100) > 5, 'OOS', 'PASS')
+    # Results the ML anomaly flag pushed to OOS although the rules passed them
+    status[rng.random(n_rows) < 0.2] = 'OOS'
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE calculations (id TEXT, lk_imb REAL, degradation_level REAL, "
+                 "recommended_value REAL, status TEXT)")
+    conn.executemany(
+        "INSERT INTO calculations VALUES (?, ?, ?, ?, ?)",
+        ((str(i), float(a), float(d), float(r), s)
+         for i, (a, d, r, s) in enumerate(zip(lk_imb, degradation, recommended, status)))
+    )
+    # Incomplete rows are skipped by the feature mapping
+    conn.execute("INSERT INTO calculations VALUES ('null', NULL, 5.0, 100.0, 'PASS')")
+    conn.execute("INSERT INTO calculations VALUES ('no-result', 100.0, 5.0, NULL, 'PASS')")
+    conn.commit()
+    conn.close()
+
+def test_chunks_map_columns_to_features():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'calc.db')
+        make_calculations_db(db_path, 2500)
+
+        chunks = list(anomalyDetector.iter_calculation_chunks(db_path, chunk_size=1000))
+        assert [len(X) for X, _ in chunks] == [1000, 1000, 500]
+        assert anomalyDetector.count_calculation_rows(db_path) == 2500
+
+        X, y = chunks[0]
+        assert X.shape[1] == len(anomalyDetector.FEATURES)
+        np.testing.assert_array_equal(X[:, 0], X[:, 2])   # LK-IMB feeds mass balance and recovery
+        np.testing.assert_array_equal(X[:, 3], 99.5)      # purity proxy
+
+def test_label_ignores_ml_flagged_status():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'calc.db')
+        make_calculations_db(db_path, 2000)
+        y = np.concatenate([y for _, y in anomalyDetector.iter_calculation_chunks(db_path)])
+
+        conn = sqlite3.connect(db_path)
+        recommended, status = zip(*conn.execute(
+            "SELECT recommended_value, status FROM calculations "
+            "WHERE lk_imb IS NOT NULL AND recommended_value IS NOT NULL").fetchall())
+        conn.close()
+        np.testing.assert_array_equal(y, np.abs(np.array(recommended) - 100) > 5)
+        assert y.sum() < np.sum(np.array(status) == 'OOS')
+
+def stream_ids(sampler, n_rows, chunk_size):
+    ids = np.arange(n_rows, dtype=np.float64)
+    for start in range(0, n_rows, chunk_size):
+        chunk = ids[start:start + chunk_size]
+        sampler.add(np.repeat(chunk[:, None], len(anomalyDetector.FEATURES), axis=1),
+                    np.zeros(len(chunk), dtype=np.int64))
+    return sampler.sample()
+
+def test_reservoir_is_bounded_and_uniform():
+    sampler = anomalyDetector.ReservoirSampler(2000, seed=1)
+    X, y = stream_ids(sampler, 200000, 7000)
+
+    assert X.shape == (2000, len(anomalyDetector.FEATURES)) and len(y) == 2000
+    assert len(np.unique(X[:, 0])) == 2000
+    counts = np.histogram(X[:, 0], bins=4, range=(0, 200000))[0]
+    assert counts.min() > 400 and counts.max() < 600
+
+def test_reservoir_keeps_everything_below_budget():
+    sampler = anomalyDetector.ReservoirSampler(5000, seed=1)
+    X, _ = stream_ids(sampler, 1200, 500)
+    np.testing.assert_array_equal(X[:, 0], np.arange(1200))
+
+def test_chunk_subsample_respects_budget():
+    sampler = anomalyDetector.ChunkSubsampler(1000, total_rows=50000, seed=1)
+    X, _ = stream_ids(sampler, 50000, 3000)
+    assert 950 <= len(X) <= 1000
+    assert len(np.unique(X[:, 0])) == len(X)
+
+def test_chunk_subsample_keeps_rate_across_small_chunks():
+    # 0.2 of a 2-row chunk rounds to nothing on its own
+    sampler = anomalyDetector.ChunkSubsampler(1000, total_rows=5000, seed=1)
+    X, _ = stream_ids(sampler, 5000, 2)
+    assert 999 <= len(X) <= 1000
+    assert len(np.unique(X[:, 0])) == len(X)
@@ -0,0 +1,85 @@
+"""
+Degradation rules: reactions compiled once from the versioned rule file and
+indexed by stress type give the same products as compiling every rule's
+SMARTS per call, and invalid rule files are rejected up front
+"""
+
+import os
+import json
+import tempfile
+
+from rdkit import Chem, RDLogger
+from rdkit.Chem import AllChem
+
+from degradationPredictor import DegradationProductPredictor, load_degradation_rules, RULES_PATH
+
+RDLogger.DisableLog('rdApp.*')
+
+STRESS_TYPES = ['acid', 'base', 'oxidative', 'thermal', 'photolytic']
+
+MOLECULES = [
+    "CC(=O)Oc1ccccc1C(=O)O",        # aspirin
+    "CC(=O)Nc1ccc(O)cc1",           # paracetamol
+    "CN1C(=O)CN=C(c2ccccc2)c2cc(Cl)ccc21",
+    "OC(=O)CC(O)(CC(=O)O)C(=O)O",
+    "CSCCC(N)C(=O)O"
+]
+
+def per_call_products(rules, parent_smiles, stress_type):
+    """Reference: the rule table walked with per-call SMARTS parsing"""
+    parent_mol = Chem.MolFromSmiles(parent_smiles)
+    found = []
+    for category, category_rules in rules.items():
+        for rule_name, rule_data in category_rules.items():
+            if stress_type not in rule_data['conditions']:
+                continue
+            rxn = AllChem.ReactionFromSmarts(rule_data['smarts'])
+            for product_set in rxn.RunReactants((parent_mol,)):
+                for product_mol in product_set:
+                    try:
+                        Chem.SanitizeMol(product_mol)
+                    except Exception:
+                        continue
+                    smiles = Chem.MolToSmiles(product_mol)
+                    if smiles not in [s for s, _ in found]:
+                        found.append((smiles, rule_name))
+    return found
+
+def test_compiled_rules_match_per_call_parsing():
+    predictor = DegradationProductPredictor()
+    with open(RULES_PATH, 'r') as f:
+        rules = json.load(f)['rules']
+    for smiles in MOLECULES:
+        for stress_type in STRESS_TYPES:
+            expected = per_call_products(rules, smiles, stress_type)
+            products = predictor.predict_products(smiles, stress_type, max_products=len(expected) + 1)
+            assert sorted((p['smiles'], p['rule_applied']) for p in products) == sorted(expected)
+
+def test_index_holds_only_applicable_rules():
+    predictor = DegradationProductPredictor()
+    for stress_type, compiled in predictor.rules_by_condition.items():
+        for rule in compiled:
+            rule_data = predictor.degradation_rules[rule.category][rule.name]
+            assert stress_type in rule_data['conditions']
+    assert predictor.rules_by_condition.get('unknown', []) == []
+    assert predictor.predict_products("CC(=O)Oc1ccccc1C(=O)O", 'unknown') == []
+
+def test_rules_compiled_once_per_file():
+    first = DegradationProductPredictor()
+    second = DegradationProductPredictor()
+    assert first.rules_by_condition is second.rules_by_condition
+    assert first.rules_version == 1
+
+def test_invalid_rule_file_rejected():
+    library = {"version": 2, "rules": {"broken": {"bad_rule": {
+        "smarts": "not a reaction", "description": "", "conditions": ["acid"]}}}}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'rules.json')
+        with open(path, 'w') as f:
+            json.dump(library, f)
+        try:
+            load_degradation_rules(path)
+        except ValueError as e:
+            assert 'bad_rule' in str(e)
+        else:
+            raise AssertionError("invalid SMARTS accepted")
@@ -0,0 +1,79 @@
+"""
+Fingerprint store: packed popcount Tanimoto matches RDKit, keys are
+canonical SMILES, and the memory-mapped store survives a reopen
+"""
+
+import tempfile
+
+import numpy as np
+from rdkit import Chem, DataStructs, RDLogger
+from rdkit.Chem import AllChem
+
+from fingerprintStore import FingerprintStore, pack_fingerprint, popcount_rows
+from molecularFeatures import MolecularFeatureExtractor
+
+RDLogger.DisableLog('rdApp.*')
+
+LIBRARY = [
+    ("CC(=O)Oc1ccccc1C(=O)O", "aspirin"),
+    ("OC(=O)c1ccccc1O", "salicylic acid"),
+    ("CC(=O)Nc1ccc(O)cc1", "paracetamol"),
+    ("CC(C)Cc1ccc(cc1)C(C)C(=O)O", "ibuprofen"),
+    ("CN1C=NC2=C1C(=O)N(C(=O)N2C)C", "caffeine"),
+    ("CSCC[C@H](N)C(=O)O", "methionine"),
+    ("CS(=O)CC[C@H](N)C(=O)O", "methionine sulfoxide"),
+]
+
+def rdkit_fp(smiles):
+    return AllChem.GetMorganFingerprintAsBitVect(Chem.MolFromSmiles(smiles), 2, nBits=2048)
+
+def test_popcount_and_packing():
+    words = pack_fingerprint(Chem.MolFromSmiles(LIBRARY[0][0]))
+    assert words.dtype == np.uint64 and words.shape == (32,)
+    assert popcount_rows(words[None, :])[0] == rdkit_fp(LIBRARY[0][0]).GetNumOnBits()
+
+    extractor = MolecularFeatureExtractor()
+    np.testing.assert_array_equal(extractor.packed_fingerprint(LIBRARY[0][0]), words)
+    bits = extractor.calculate_fingerprint(LIBRARY[0][0])
+    assert bits.dtype == np.uint8 and bits.sum() == popcount_rows(words[None, :])[0]
+
+def test_similarity_matches_rdkit():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FingerprintStore(tmp)
+        store.add_many(LIBRARY)
+        fps = [rdkit_fp(s) for s, _ in LIBRARY]
+        for query, _ in LIBRARY:
+            expected = DataStructs.BulkTanimotoSimilarity(rdkit_fp(query), fps)
+            np.testing.assert_allclose(store.similarity(query), expected, rtol=0, atol=1e-12)
+
+def test_search_top_k():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FingerprintStore(tmp)
+        store.add_many(LIBRARY)
+        results = store.search("OC(=O)c1ccccc1OC(C)=O", k=3)  # aspirin, other spelling
+        assert results[0]["label"] == "aspirin" and results[0]["similarity"] == 1.0
+        assert len(results) == 3
+        assert [r["similarity"] for r in results] == sorted((r["similarity"] for r in results), reverse=True)
+        assert store.search("CCO", k=3, min_similarity=0.99) == []
+
+def test_canonical_keys_and_persistence():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FingerprintStore(tmp)
+        store.add_many(LIBRARY)
+        assert store.add("OC(=O)c1ccccc1OC(C)=O", "duplicate") == Chem.MolToSmiles(Chem.MolFromSmiles(LIBRARY[0][0]))
+        assert len(store) == len(LIBRARY)
+
+        try:
+            store.add_many([("CCO", "ethanol"), ("not a smiles", None)])
+        except ValueError:
+            pass
+        assert len(store) == len(LIBRARY) and "CCO" not in store
+
+        reopened = FingerprintStore(tmp)
+        assert len(reopened) == len(LIBRARY)
+        np.testing.assert_array_equal(reopened.similarity(LIBRARY[2][0]), store.similarity(LIBRARY[2][0]))
+        assert reopened.search(LIBRARY[5][0], k=2)[1]["label"] == "methionine sulfoxide"
+
+def test_empty_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        assert FingerprintStore(tmp).search("CCO") == []
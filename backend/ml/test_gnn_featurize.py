@@ -0,0 +1,55 @@
+"""
+Vectorized GNN atom featurization: parity with the original per-atom
+feature loop on drug-like, charged and large molecules
+"""
+
+import torch
+from rdkit import Chem, RDLogger
+
+from gnnPredictor import GNNPredictor
+
+RDLogger.DisableLog('rdApp.*')
+
+SMILES = [
+    "CC(=O)Oc1ccccc1C(=O)O",                          # aspirin
+    "C",                                              # single atom
+    "C#N",                                            # SP
+    "[NH4+].[O-]C(=O)C",                              # formal charges
+    "CN1C=NC2=C1C(=O)N(C(=O)N2C)C",                   # caffeine
+    "[2H]C([2H])([2H])Cl",                            # explicit isotopes
+    "OS(=O)(=O)c1ccc(cc1)[Se]C",                      # hypervalent / heavy atoms
+    "O=C(O)C[C@H](N)C(=O)N[C@@H](Cc1ccccc1)C(=O)OC",  # aspartame
+    "NCC(=O)" + "N[C@@H](Cc1ccccc1)C(=O)" * 40 + "O"  # ~500 atom peptide
+]
+
+def loop_atom_features(mol):
+    """The original per-atom featurization, kept as the parity reference"""
+    node_features = []
+    for atom in mol.GetAtoms():
+        node_features.append([
+            atom.GetAtomicNum() / 100.0,
+            atom.GetDegree() / 5.0,
+            atom.GetTotalNumHs() / 4.0,
+            atom.GetImplicitValence() / 5.0,
+            1.0 if atom.GetIsAromatic() else 0.0,
+            1.0 if atom.IsInRing() else 0.0,
+            atom.GetFormalCharge() / 5.0,
+            1.0 if atom.GetHybridization() == Chem.HybridizationType.SP else 0.0,
+            1.0 if atom.GetHybridization() == Chem.HybridizationType.SP2 else 0.0,
+            1.0 if atom.GetHybridization() == Chem.HybridizationType.SP3 else 0.0,
+            0, 0, 0, 0, 0, 0
+        ])
+    return torch.tensor(node_features, dtype=torch.float)
+
+def test_features_match_loop():
+    predictor = GNNPredictor()
+    for smiles in SMILES:
+        mol = Chem.MolFromSmiles(smiles)
+        x = predictor.atom_features(mol)
+        assert x.dtype == torch.float32 and x.shape == (mol.GetNumAtoms(), 16)
+        torch.testing.assert_close(x, loop_atom_features(mol), rtol=0, atol=0)
+
+def test_explicit_hydrogens_match_loop():
+    predictor = GNNPredictor()
+    mol = Chem.AddHs(Chem.MolFromSmiles("CC(=O)Oc1ccccc1C(=O)O"))
+    torch.testing.assert_close(predictor.atom_features(mol), loop_atom_features(mol), rtol=0, atol=0)
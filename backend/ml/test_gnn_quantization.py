@@ -0,0 +1,50 @@
+"""
+Int8 dynamic quantization of MolecularGNN: Linear layers are swapped, the
+fp32 model is left intact and scores stay close to fp32
+"""
+
+import torch
+from rdkit import RDLogger
+
+from gnnModel import quantize_model, compile_model
+from gnnPredictor import GNNPredictor
+
+RDLogger.DisableLog('rdApp.*')
+
+SMILES = [
+    "CC(=O)Oc1ccccc1C(=O)O",
+    "CN1C=NC2=C1C(=O)N(C(=O)N2C)C",
+    "O=C(O)C[C@H](N)C(=O)N[C@@H](Cc1ccccc1)C(=O)OC",
+    "CSCC[C@H](N)C(=O)O",
+    "not a smiles"
+]
+
+def test_quantize_swaps_linear_layers():
+    fp32 = GNNPredictor().model
+    int8 = quantize_model(fp32)
+    assert isinstance(fp32.conv1.projection, torch.nn.Linear)
+    assert isinstance(int8.conv1.projection, torch.ao.nn.quantized.dynamic.Linear)
+    assert isinstance(int8.atom_lability[0], torch.ao.nn.quantized.dynamic.Linear)
+
+def test_quantized_scores_close_to_fp32():
+    fp32 = GNNPredictor()
+    int8 = GNNPredictor(quantize=True)
+    assert int8.quantized
+    for a, b in zip(fp32.predict_batch(SMILES), int8.predict_batch(SMILES)):
+        if "error" in a:
+            assert a == b
+            continue
+        assert [atom["symbol"] for atom in a["atom_lability"]] == [atom["symbol"] for atom in b["atom_lability"]]
+        assert abs(a["overall_susceptibility"] - b["overall_susceptibility"]) < 2.0
+        for atom_a, atom_b in zip(a["atom_lability"], b["atom_lability"]):
+            assert abs(atom_a["lability"] - atom_b["lability"]) < 0.02
+
+def test_quantized_model_compiles():
+    predictor = GNNPredictor(quantize=True)
+    expected = predictor.predict_batch(SMILES)
+    predictor.model = compile_model(predictor.model)
+    for _ in range(3):
+        for a, b in zip(predictor.predict_batch(SMILES), expected):
+            assert a.keys() == b.keys()
+            if "error" not in a:
+                assert abs(a["overall_susceptibility"] - b["overall_susceptibility"]) <= 0.01
@@ -0,0 +1,100 @@
+"""
+Persistent GNN service: the TorchScript model matches the eager one, and the
+JSON-lines protocol answers single, list and malformed requests by id
+"""
+
+import io
+import json
+
+import torch
+from rdkit import RDLogger
+
+import gnnPredictor
+from gnnModel import compile_model
+from gnnPredictor import GNNPredictor, serve_stream
+
+RDLogger.DisableLog('rdApp.*')
+
+SMILES = ["CC(=O)Oc1ccccc1C(=O)O", "C", "not a smiles", "CN1C=NC2=C1C(=O)N(C(=O)N2C)C"]
+
+def compiled_predictor():
+    torch.manual_seed(0)
+    predictor = GNNPredictor()
+    predictor.model = compile_model(predictor.model)
+    return predictor
+
+def test_compiled_model_matches_eager():
+    torch.manual_seed(0)
+    eager = GNNPredictor()
+    compiled = compile_model(eager.model)
+    assert isinstance(compiled, torch.jit.ScriptModule)
+
+    x, adj, batch, _ = eager.pack_graphs([eager.smiles_to_edges(s) for s in SMILES if s != "not a smiles"])
+    x_single, dense, _ = eager.smiles_to_graph("CCO")
+    with torch.no_grad():
+        # Repeat so the profiling executor's optimized graph is exercised too
+        for _ in range(3):
+            for args in ((x, adj, batch, 3), (x_single, dense)):
+                for got, expected in zip(compiled(*args), eager.model(*args)):
+                    torch.testing.assert_close(got, expected, rtol=0, atol=1e-6)
+
+def test_serve_stream_answers_by_id():
+    predictor = compiled_predictor()
+    lines = [
+        json.dumps({"id": 1, "smiles": SMILES[0]}),
+        "",
+        json.dumps({"id": 2, "smiles_list": SMILES}),
+        json.dumps({"id": 3, "smiles": "not a smiles"}),
+        json.dumps({"id": 4}),
+        "{broken",
+    ]
+    out = io.StringIO()
+    serve_stream(predictor, io.StringIO("\n".join(lines) + "\n"), out)
+    responses = [json.loads(line) for line in out.getvalue().splitlines()]
+
+    expected = predictor.predict_batch(SMILES)
+    assert [r.get("id") for r in responses] == [1, 2, 3, 4, None]
+    assert {k: v for k, v in responses[0].items() if k != "id"} == expected[0]
+    assert responses[1]["results"] == expected and responses[1]["count"] == len(SMILES)
+    assert responses[2]["error"] == "Invalid SMILES"
+    assert "error" in responses[3] and "error" in responses[4]
+
+def test_serve_stream_single_request_batches():
+    predictor = compiled_predictor()
+    requests = "".join(json.dumps({"id": i, "smiles": s}) + "\n" for i, s in enumerate(SMILES))
+    out = io.StringIO()
+    serve_stream(predictor, io.StringIO(requests), out, max_batch=1)
+    responses = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["id"] for r in responses] == list(range(len(SMILES)))
+
+def test_serve_stream_survives_failing_requests():
+    predictor = compiled_predictor()
+    predict_batch = predictor.predict_batch
+
+    def failing_predict_batch(smiles_list):
+        if "boom" in smiles_list:
+            raise RuntimeError("tensor error")
+        return predict_batch(smiles_list)
+    predictor.predict_batch = failing_predict_batch
+
+    lines = [json.dumps({"id": 1, "smiles": "boom"}), json.dumps({"id": 2, "smiles": "CCO"})]
+    for max_batch in (1, 2):
+        out = io.StringIO()
+        serve_stream(predictor, io.StringIO("\n".join(lines) + "\n"), out, max_batch=max_batch)
+        responses = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r["id"] for r in responses] == [1, 2]
+        assert responses[0]["error"] == "tensor error"
+        assert responses[1]["success"] is True
+
+    # A failure outside prediction still answers every request of the batch
+    def broken_handle_lines(predictor, lines):
+        raise RuntimeError("handler error")
+    saved = gnnPredictor.handle_lines
+    gnnPredictor.handle_lines = broken_handle_lines
+    try:
+        out = io.StringIO()
+        serve_stream(predictor, io.StringIO("\n".join(lines) + "\n"), out, max_batch=2)
+    finally:
+        gnnPredictor.handle_lines = saved
+    responses = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert responses == [{"error": "handler error", "id": 1}, {"error": "handler error", "id": 2}]
@@ -0,0 +1,94 @@
+"""
+GNN training pipeline: seeded runs are reproducible (with or without loader
+workers), checkpoints round-trip, and inference without a checkpoint uses
+the same placeholder weights in every process
+"""
+
+import os
+import tempfile
+
+import torch
+from rdkit import RDLogger
+
+from gnnModel import load_checkpoint, load_model, save_checkpoint
+from gnnPredictor import GNNPredictor, MODEL_TYPE
+from gnnTrainer import MoleculeDataset, collate_graphs, train
+
+RDLogger.DisableLog('rdApp.*')
+
+RECORDS = [
+    {"smiles": "CC(=O)Oc1ccccc1C(=O)O"},
+    {"smiles": "CC(=O)Nc1ccc(O)cc1"},
+    {"smiles": "CSCC[C@H](N)C(=O)O"},
+    {"smiles": "c1ccc2ccccc2c1"},
+    {"smiles": "CCO", "susceptibility": 0.1, "atom_lability": [0.0, 0.2, 1.0]},
+    {"smiles": "not a smiles"},
+    {"smiles": "CN1C=NC2=C1C(=O)N(C(=O)N2C)C"},
+]
+PARAMS = {"epochs": 3, "batch_size": 3, "validation_fraction": 0.3}
+
+def assert_same_weights(a, b):
+    for (name, p), (_, q) in zip(a.state_dict().items(), b.state_dict().items()):
+        torch.testing.assert_close(p, q, rtol=0, atol=0, msg=name)
+
+def test_dataset_targets():
+    dataset = MoleculeDataset(RECORDS)
+    graph, atom_targets, susceptibility = dataset[0]
+    assert atom_targets.shape[0] == graph.x.shape[0]
+    assert atom_targets.max() == 1.0  # ester atoms are labile
+    assert 0.0 <= susceptibility <= 1.0
+
+    _, given_atoms, given_molecule = dataset[4]
+    torch.testing.assert_close(given_atoms, torch.tensor([0.0, 0.2, 1.0]))
+    torch.testing.assert_close(given_molecule, torch.tensor(0.1))
+    assert dataset[5] is None
+
+    batch = collate_graphs([dataset[i] for i in range(len(dataset))])
+    assert batch["num_graphs"] == len(RECORDS) - 1
+    assert batch["atom_targets"].shape == (batch["x"].shape[0], 1)
+
+def test_training_is_deterministic():
+    first, metrics = train(RECORDS, PARAMS, verbose=False)
+    second, _ = train(RECORDS, PARAMS, verbose=False)
+    assert_same_weights(first, second)
+    assert metrics["final_train_loss"] is not None and metrics["validation_molecules"] == 2
+
+def test_loader_workers_do_not_change_training():
+    serial, _ = train(RECORDS, PARAMS, num_workers=0, verbose=False)
+    parallel, _ = train(RECORDS, PARAMS, num_workers=2, verbose=False)
+    assert_same_weights(serial, parallel)
+
+def test_checkpoint_round_trip():
+    model, _ = train(RECORDS, PARAMS, verbose=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "molecular_gnn.pt")
+        save_checkpoint(model, path, {"note": "test"})
+        loaded, metadata = load_checkpoint(path)
+        assert metadata == {"note": "test"}
+        assert_same_weights(model, loaded)
+
+        predictor = GNNPredictor(checkpoint=path)
+        reference = GNNPredictor(checkpoint=path)
+        smiles = [r["smiles"] for r in RECORDS]
+        assert predictor.predict_batch(smiles) == reference.predict_batch(smiles)
+
+def test_placeholder_weights_are_reproducible():
+    torch.manual_seed(123)
+    a, metadata = load_model(None)
+    torch.manual_seed(456)
+    b, _ = load_model(None)
+    assert_same_weights(a, b)
+    assert metadata == {"trained": False}
+
+def test_results_report_untrained_weights():
+    placeholder = GNNPredictor(checkpoint=None)
+    result = placeholder.predict("CCO")
+    assert result["trained"] is False and "untrained" in result["model_type"]
+    assert placeholder.predict_batch(["CCO", "CC"])[1]["trained"] is False
+
+    model, _ = train(RECORDS, PARAMS, verbose=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "molecular_gnn.pt")
+        save_checkpoint(model, path)
+        result = GNNPredictor(checkpoint=path).predict("CCO")
+        assert result["trained"] is True and result["model_type"] == MODEL_TYPE
@@ -0,0 +1,58 @@
+"""
+Featurized graph cache: repeated and re-spelled SMILES return the same graph
+as a fresh featurization, and the .npz store survives a new predictor
+"""
+
+import tempfile
+
+import torch
+from rdkit import RDLogger
+
+from gnnPredictor import GNNPredictor
+
+RDLogger.DisableLog('rdApp.*')
+
+def assert_same_graph(a, b):
+    torch.testing.assert_close(a.x, b.x)
+    torch.testing.assert_close(a.edge_index, b.edge_index)
+    torch.testing.assert_close(a.edge_weight, b.edge_weight)
+    assert a.symbols == b.symbols
+
+def test_repeated_smiles_hits_cache():
+    predictor = GNNPredictor()
+    first = predictor.smiles_to_edges("CC(=O)Oc1ccccc1C(=O)O")
+    second = predictor.smiles_to_edges("CC(=O)Oc1ccccc1C(=O)O")
+    assert_same_graph(first, second)
+    assert predictor.cache.stats()["hits"] == 1
+    assert predictor.cache.stats()["misses"] == 1
+
+def test_other_spelling_keeps_input_atom_order():
+    cached = GNNPredictor()
+    cached.smiles_to_edges("CCO")
+    alternate = cached.smiles_to_edges("OCC")
+    assert cached.cache.stats()["misses"] == 1
+    assert alternate.symbols == ["O", "C", "C"]
+    assert_same_graph(alternate, GNNPredictor(cache_size=0).smiles_to_edges("OCC"))
+
+def test_cached_predictions_match_uncached():
+    torch.manual_seed(0)
+    predictor = GNNPredictor()
+    uncached = GNNPredictor(cache_size=0)
+    uncached.model = predictor.model
+    smiles = ["OC(=O)c1ccccc1OC(C)=O", "CC(=O)Oc1ccccc1C(=O)O", "not a smiles"]
+    predictor.predict_batch(smiles)
+    assert predictor.predict_batch(smiles) == uncached.predict_batch(smiles)
+
+def test_disk_store_survives_restart():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        fresh = GNNPredictor(cache_dir=cache_dir).smiles_to_edges("OCC")
+        restarted = GNNPredictor(cache_dir=cache_dir)
+        assert_same_graph(restarted.smiles_to_edges("OCC"), fresh)
+        assert restarted.cache.stats()["disk_hits"] == 1
+        assert restarted.cache.stats()["misses"] == 0
+
+def test_lru_eviction():
+    predictor = GNNPredictor(cache_size=2)
+    for smiles in ("C", "CC", "CCC"):
+        predictor.smiles_to_edges(smiles)
+    assert list(predictor.cache.graphs) == ["CC", "CCC"]
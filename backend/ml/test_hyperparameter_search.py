@@ -0,0 +1,33 @@
+"""
+Hyperparameter search: candidate generation and the shared-memory process pool
+"""
+
+import numpy as np
+
+import hyperparameterSearch
+
+def test_candidate_params():
+    grid = hyperparameterSearch.PARAM_GRID
+    full = hyperparameterSearch.candidate_params()
+    assert len(full) == np.prod([len(v) for v in grid.values()])
+
+    sample = hyperparameterSearch.candidate_params(n_random=5)
+    assert len(sample) == 5
+    assert all(c in full for c in sample)
+    assert sample == hyperparameterSearch.candidate_params(n_random=5)
+
+def test_run_search_ranks_candidates():
+    rng = np.random.default_rng(0)
+    X = rng.normal(100, 3, size=(400, 4))
+    y = (np.abs(X[:, 0] - 100) > 4).astype(np.int64)
+    candidates = [
+        {'contamination': 0.05, 'n_estimators': 10, 'max_samples': 'auto', 'max_depth': 1},
+        {'contamination': 0.1, 'n_estimators': 20, 'max_samples': 1.0, 'max_depth': None},
+    ]
+
+    results = hyperparameterSearch.run_search(X, y, candidates, n_workers=2)
+
+    assert [r['rank'] for r in results] == [1, 2]
+    assert sorted(map(str, (r['params'] for r in results))) == sorted(map(str, candidates))
+    assert results[0]['score'] >= results[1]['score']
+    assert all(0.0 <= r['random_forest_f1'] <= 1.0 for r in results)
@@ -0,0 +1,38 @@
+"""
+Persistent scoring worker: the JSON-lines protocol answers single, list and
+malformed requests, and request errors never escape the worker
+"""
+
+import io
+import json
+import warnings
+
+import mlService
+
+warnings.filterwarnings("ignore")
+
+SAMPLE = {"mass_balance": 60.0, "degradation": 30.0, "recovery": 60.0, "purity": 90.0}
+
+def test_stream_answers_every_line_in_order():
+    watcher = mlService.ModelWatcher()
+    requests = [dict(SAMPLE, id=1), "not json", [SAMPLE, SAMPLE], 42]
+    stream_in = io.StringIO("".join(
+        (r if isinstance(r, str) else json.dumps(r)) + "\n\n" for r in requests))
+    stream_out = io.StringIO()
+    mlService.serve_stream(stream_in, stream_out, watcher)
+
+    single, invalid, batch, scalar = [json.loads(line) for line in stream_out.getvalue().splitlines()]
+    expected = mlService.predict(dict(SAMPLE), watcher.current())
+    assert single == dict(expected, id=1)
+    assert "Invalid JSON" in invalid["error"]
+    assert batch == mlService.predict_batch([SAMPLE, SAMPLE], watcher.current())
+    assert "error" in scalar
+
+def test_request_errors_do_not_escape_the_worker():
+    class FailingWatcher:
+        def current(self):
+            raise RuntimeError("registry unavailable")
+
+    for line in ('[{"mass_balance": 90.0}]', '{"id": 7, "mass_balance": 90.0}'):
+        response = mlService.handle_line(line, FailingWatcher())
+        assert "registry unavailable" in response["error"]
@@ -0,0 +1,93 @@
+"""
+Model registry: versioned publish, atomic `current` flips and hot reload
+"""
+
+import os
+import shutil
+import tempfile
+import warnings
+from contextlib import contextmanager
+
+import modelRegistry
+import mlService
+
+warnings.filterwarnings("ignore")
+
+SAMPLE = {"mass_balance": 60.0, "degradation": 30.0, "recovery": 60.0, "purity": 90.0}
+
+@contextmanager
+def temporary_registry():
+    """Point the registry at an empty directory seeded from ml_models/"""
+    saved = (modelRegistry.MODEL_DIR, modelRegistry.VERSIONS_DIR, modelRegistry.CURRENT_PATH)
+    tmp = tempfile.mkdtemp()
+    try:
+        for name in modelRegistry.ARTIFACT_FILES:
+            shutil.copy2(os.path.join(saved[0], name), os.path.join(tmp, name))
+        modelRegistry.MODEL_DIR = tmp
+        modelRegistry.VERSIONS_DIR = os.path.join(tmp, 'versions')
+        modelRegistry.CURRENT_PATH = os.path.join(tmp, 'current')
+        yield tmp
+    finally:
+        modelRegistry.MODEL_DIR, modelRegistry.VERSIONS_DIR, modelRegistry.CURRENT_PATH = saved
+        shutil.rmtree(tmp)
+
+def publish_copy(source_dir, drop=None, metadata=None):
+    """Register the artifacts of source_dir, optionally without one file"""
+    staging_dir = modelRegistry.stage()
+    for name in modelRegistry.ARTIFACT_FILES:
+        if name != drop and os.path.exists(os.path.join(source_dir, name)):
+            shutil.copy2(os.path.join(source_dir, name), os.path.join(staging_dir, name))
+    return modelRegistry.publish(staging_dir, metadata or {})
+
+def test_publish_is_content_addressed():
+    with temporary_registry() as root:
+        first = publish_copy(root, metadata={'training_rows': 22})
+        again = publish_copy(root)
+        assert first == again
+        assert modelRegistry.current_version() == first
+        assert modelRegistry.read_metadata(first)['training_rows'] == 22
+        assert [m['version'] for m in modelRegistry.list_versions()] == [first]
+        # No staging directories left behind
+        assert os.listdir(modelRegistry.VERSIONS_DIR) == [first]
+
+def test_watcher_swaps_on_pointer_flip():
+    with temporary_registry() as root:
+        full = publish_copy(root)
+        # A second version: same trees served through the joblib fallback
+        no_npz = publish_copy(root, drop='random_forest.npz')
+        assert full != no_npz
+
+        modelRegistry.set_current(full)
+        watcher = mlService.ModelWatcher()
+        assert mlService.predict(SAMPLE, watcher.current())['model_version'] == full
+
+        modelRegistry.set_current(no_npz)
+        result = mlService.predict(SAMPLE, watcher.current())
+        assert result['model_version'] == no_npz
+        assert result['failure_probability'] == mlService.predict(SAMPLE, mlService.load_models(
+            modelRegistry.version_dir(full)))['failure_probability']
+
+def test_version_read_from_pointer_not_rehashed():
+    with temporary_registry() as root:
+        legacy_hash = modelRegistry.content_hash(root)
+        # No `current` yet: the flat files are hashed like adopt_legacy() would
+        assert mlService.load_models().version == legacy_hash
+
+        version = publish_copy(root)
+        content_hash = modelRegistry.content_hash
+        modelRegistry.content_hash = None
+        try:
+            assert mlService.load_models().version == version
+            assert mlService.load_models(modelRegistry.version_dir(version)).version == version
+        finally:
+            modelRegistry.content_hash = content_hash
+
+def test_set_current_rejects_unknown_version():
+    with temporary_registry():
+        try:
+            modelRegistry.set_current('does-not-exist')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+        assert modelRegistry.current_version() is None
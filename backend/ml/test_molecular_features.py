@@ -0,0 +1,150 @@
+"""
+MolecularFeatureExtractor: the reactive pattern library is compiled once,
+shared across extractors, extensible from a data file, and matches the
+inline SMARTS it replaced; the canonical-SMILES cache returns the same
+descriptors and sites as a fresh computation
+"""
+
+import os
+import json
+import tempfile
+
+import numpy as np
+from rdkit import Chem, RDLogger
+
+from molecularFeatures import (MolecularFeatureExtractor, load_reactive_patterns, PATTERNS_PATH,
+                               DESCRIPTOR_NAMES, descriptor_matrix, iter_descriptor_chunks,
+                               element_counts)
+
+RDLogger.DisableLog('rdApp.*')
+
+SMILES = [
+    "CC(=O)Oc1ccccc1C(=O)O",
+    "CC(=O)Nc1ccc(O)cc1",
+    "CSCC[C@H](N)C(=O)O",
+    "CC1(C)S[C@@H]2[C@H](NC(=O)Cc3ccccc3)C(=O)N2[C@H]1C(=O)O",
+    "CC(=O)C=Cc1ccccc1"
+]
+
+def write_library(directory, patterns):
+    path = os.path.join(directory, "patterns.json")
+    with open(path, "w") as f:
+        json.dump({"version": 1, "patterns": patterns}, f)
+    return path
+
+def test_patterns_compiled_once_and_shared():
+    a, b = MolecularFeatureExtractor(), MolecularFeatureExtractor()
+    assert a.reactive_patterns is b.reactive_patterns
+    assert load_reactive_patterns() is a.reactive_patterns
+
+def test_sites_match_inline_smarts():
+    with open(PATTERNS_PATH) as f:
+        library = json.load(f)["patterns"]
+    extractor = MolecularFeatureExtractor()
+    for smiles in SMILES:
+        mol = Chem.MolFromSmiles(smiles)
+        sites = extractor.identify_reactive_sites(smiles)
+        assert list(sites) == list(library)
+        for name, entry in library.items():
+            matches = mol.GetSubstructMatches(Chem.MolFromSmarts(entry["smarts"]))
+            assert sites[name]["count"] == len(matches)
+            # Cached matches are found in canonical atom order and renumbered
+            assert sorted(sites[name]["atom_indices"]) == sorted(list(m) for m in matches)
+
+def test_element_counts():
+    mol = Chem.MolFromSmiles("ClC(Br)C(=O)NCS(=O)(=O)OCF.[I-]")
+    counts = element_counts(mol)
+    for atomic_num in (6, 7, 8, 9, 16, 17, 35, 53):
+        assert counts[atomic_num] == sum(1 for a in mol.GetAtoms() if a.GetAtomicNum() == atomic_num)
+    descriptors = MolecularFeatureExtractor().calculate_descriptors("ClC(Br)C(=O)NCS(=O)(=O)OCF.[I-]")
+    assert descriptors["num_halogens"] == 4 and descriptors["num_sulfurs"] == 1
+    assert isinstance(descriptors["num_nitrogens"], int)
+
+def test_cache_hits_and_spellings():
+    extractor = MolecularFeatureExtractor()
+    uncached = MolecularFeatureExtractor(cache_size=0)
+    extractor.estimate_degradation_rate("CC(=O)Oc1ccccc1C(=O)O", "base")
+    assert extractor.cache.stats()["misses"] == 1 and extractor.cache.stats()["hits"] >= 2
+
+    # Another spelling of aspirin reuses the entry but keeps its own atom numbering
+    spelling = "OC(=O)c1ccccc1OC(C)=O"
+    sites = extractor.identify_reactive_sites(spelling)
+    assert extractor.cache.stats()["misses"] == 1
+    expected = uncached.identify_reactive_sites(spelling)
+    for name in expected:
+        assert sorted(sites[name]["atom_indices"]) == sorted(expected[name]["atom_indices"])
+    assert extractor.calculate_descriptors(spelling) == uncached.calculate_descriptors(spelling)
+
+def test_cached_descriptors_are_copies():
+    extractor = MolecularFeatureExtractor()
+    extractor.calculate_descriptors("CCO")["logp"] = 99
+    assert extractor.calculate_descriptors("CCO")["logp"] != 99
+
+def test_cache_eviction():
+    extractor = MolecularFeatureExtractor(cache_size=2)
+    for smiles in ("C", "CC", "CCC"):
+        extractor.calculate_descriptors(smiles)
+    assert list(extractor.cache.records) == ["CC", "CCC"]
+    try:
+        extractor.calculate_descriptors("not a smiles")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("invalid SMILES accepted")
+
+def test_library_can_be_extended():
+    with open(PATTERNS_PATH) as f:
+        patterns = json.load(f)["patterns"]
+    patterns["nitro"] = {"smarts": "[N+](=O)[O-]", "description": "Photoreduction"}
+    with tempfile.TemporaryDirectory() as tmp:
+        extractor = MolecularFeatureExtractor(write_library(tmp, patterns))
+        sites = extractor.identify_reactive_sites("O=[N+]([O-])c1ccccc1")
+        assert sites["nitro"]["count"] == 1
+        assert extractor.predict_degradation_susceptibility("CC(=O)Oc1ccccc1", "base")["susceptibility_score"] > 0
+
+def test_invalid_or_incomplete_library_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        for patterns in ({"ester": {"smarts": "C(=O"}}, {"ester": {"smarts": "C(=O)O"}}):
+            path = write_library(tmp, patterns)
+            try:
+                load_reactive_patterns(path)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"library accepted: {patterns}")
+
+def test_descriptor_matrix_matches_dicts():
+    library = SMILES + ["not a smiles", None, "C"]
+    X, valid = descriptor_matrix(iter(library), n_jobs=1, chunk_size=3)
+    assert X.dtype == np.float32 and X.shape == (len(library), len(DESCRIPTOR_NAMES))
+    assert valid.tolist() == [True] * len(SMILES) + [False, False, True]
+    assert np.isnan(X[~valid]).all()
+
+    extractor = MolecularFeatureExtractor()
+    assert list(extractor.calculate_descriptors("CCO")) == DESCRIPTOR_NAMES
+    for row, smiles in zip(X[valid], [s for s, ok in zip(library, valid) if ok]):
+        expected = extractor.calculate_descriptors(smiles)
+        np.testing.assert_array_equal(row, np.array([expected[n] for n in DESCRIPTOR_NAMES], dtype=np.float32))
+
+def test_descriptor_matrix_process_pool_keeps_order():
+    library = [SMILES[i % len(SMILES)] if i % 7 else "bad" for i in range(200)]
+    serial = descriptor_matrix(library, n_jobs=1, chunk_size=16)
+    parallel = descriptor_matrix(library, n_jobs=2, chunk_size=16)
+    np.testing.assert_array_equal(serial[0], parallel[0])
+    np.testing.assert_array_equal(serial[1], parallel[1])
+
+def test_descriptor_chunks_stream_lazily():
+    consumed = []
+    def source():
+        for i in range(10000):
+            consumed.append(i)
+            yield "CCO"
+    chunks = iter_descriptor_chunks(source(), n_jobs=1, chunk_size=100)
+    X, valid = next(chunks)
+    chunks.close()
+    assert X.shape[0] == 100 and valid.all()
+    assert len(consumed) <= 200
+
+def test_empty_descriptor_matrix():
+    X, valid = descriptor_matrix([], n_jobs=2)
+    assert X.shape == (0, len(DESCRIPTOR_NAMES)) and valid.shape == (0,)
@@ -0,0 +1,134 @@
+"""
+Parity checks: compiled flat-array models vs the joblib scikit-learn models
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import warnings
+
+import joblib
+import numpy as np
+
+import treeEnsemble
+from treeEnsemble import CompiledIsolationForest, CompiledRandomForest, load_compiled
+
+warnings.filterwarnings("ignore")
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(ML_DIR)
+MODEL_DIR = os.path.join(BASE_DIR, 'ml_models')
+DATA_PATH = os.path.join(BASE_DIR, 'ml_data', 'anomaly_training_data.json')
+
+def load_reference():
+    iso_forest = joblib.load(os.path.join(MODEL_DIR, 'isolation_forest.joblib'))
+    rf_classifier = joblib.load(os.path.join(MODEL_DIR, 'random_forest.joblib'))
+    with open(os.path.join(MODEL_DIR, 'model_features.json'), 'r') as f:
+        features = json.load(f)
+    return iso_forest, rf_classifier, features
+
+def sample_matrix(features, n=5000, seed=7):
+    """Training rows plus random points around and beyond their range"""
+    with open(DATA_PATH, 'r') as f:
+        data = json.load(f)
+    train = np.array([[row[f] for f in features] for row in data], dtype=np.float64)
+
+    rng = np.random.default_rng(seed)
+    low, high = train.min(axis=0), train.max(axis=0)
+    span = high - low
+    random = rng.uniform(low - span, high + span, size=(n, len(features)))
+    return np.vstack([train, random])
+
+def test_isolation_forest_parity():
+    iso_forest, _, features = load_reference()
+    compiled = CompiledIsolationForest.from_estimator(iso_forest, features)
+    X = sample_matrix(features)
+
+    np.testing.assert_allclose(compiled.score_samples(X), iso_forest.score_samples(X), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(compiled.decision_function(X), iso_forest.decision_function(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X), iso_forest.predict(X))
+
+def test_random_forest_parity():
+    _, rf_classifier, features = load_reference()
+    compiled = CompiledRandomForest.from_estimator(rf_classifier, features)
+    X = sample_matrix(features)
+
+    np.testing.assert_allclose(compiled.predict_proba(X), rf_classifier.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X), rf_classifier.predict(X))
+    np.testing.assert_array_equal(compiled.feature_importances_, rf_classifier.feature_importances_)
+
+def saabas_reference(rf_classifier, X):
+    """Path decomposition computed node by node from sklearn's decision_path"""
+    n_features = X.shape[1]
+    contributions = np.zeros((X.shape[0], n_features, len(rf_classifier.classes_)))
+    for estimator in rf_classifier.estimators_:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :] / tree.value[:, 0, :].sum(axis=1, keepdims=True)
+        paths = estimator.decision_path(X.astype(np.float32))
+        for i in range(X.shape[0]):
+            nodes = paths.indices[paths.indptr[i]:paths.indptr[i + 1]]
+            for parent, child in zip(nodes[:-1], nodes[1:]):
+                contributions[i, tree.feature[parent]] += value[child] - value[parent]
+    return contributions / len(rf_classifier.estimators_)
+
+def test_path_contributions():
+    _, rf_classifier, features = load_reference()
+    compiled = CompiledRandomForest.from_estimator(rf_classifier, features)
+    X = sample_matrix(features, n=200)
+
+    proba, bias, contributions = compiled.predict_proba_with_contributions(X)
+    np.testing.assert_allclose(proba, rf_classifier.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), proba, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(contributions, saabas_reference(rf_classifier, X), rtol=0, atol=1e-12)
+
+def test_walked_contributions_match_table():
+    _, rf_classifier, features = load_reference()
+    X = sample_matrix(features, n=200)
+    table = CompiledRandomForest.from_estimator(rf_classifier, features)
+    walked = CompiledRandomForest.from_estimator(rf_classifier, features)
+
+    saved = treeEnsemble.PATH_TABLE_MAX_BYTES
+    treeEnsemble.PATH_TABLE_MAX_BYTES = 0
+    try:
+        result = walked.predict_proba_with_contributions(X)
+    finally:
+        treeEnsemble.PATH_TABLE_MAX_BYTES = saved
+    assert 'path_contributions' not in walked.__dict__   # never built
+    for a, b in zip(result, table.predict_proba_with_contributions(X)):
+        np.testing.assert_allclose(a, b, rtol=0, atol=1e-12)
+
+def test_npz_round_trip():
+    iso_forest, rf_classifier, features = load_reference()
+    X = sample_matrix(features, n=500)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        iso_path = os.path.join(tmp, 'isolation_forest.npz')
+        rf_path = os.path.join(tmp, 'random_forest.npz')
+        CompiledIsolationForest.from_estimator(iso_forest, features).save(iso_path)
+        CompiledRandomForest.from_estimator(rf_classifier, features).save(rf_path)
+
+        np.testing.assert_allclose(load_compiled(iso_path).decision_function(X),
+                                   iso_forest.decision_function(X), rtol=0, atol=1e-12)
+        np.testing.assert_allclose(load_compiled(rf_path).predict_proba(X),
+                                   rf_classifier.predict_proba(X), rtol=0, atol=1e-12)
+
+def test_shipped_artifacts_match_joblib():
+    iso_forest, rf_classifier, features = load_reference()
+    X = sample_matrix(features, n=500)
+
+    np.testing.assert_allclose(load_compiled(os.path.join(MODEL_DIR, 'isolation_forest.npz')).decision_function(X),
+                               iso_forest.decision_function(X), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(load_compiled(os.path.join(MODEL_DIR, 'random_forest.npz')).predict_proba(X),
+                               rf_classifier.predict_proba(X), rtol=0, atol=1e-12)
+
+def test_serving_does_not_import_sklearn():
+    code = (
+        f"import sys; sys.path.insert(0, {ML_DIR!r}); import mlService; "
+        "r = mlService.predict({'mass_balance': 95, 'degradation': 5, 'recovery': 98, 'purity': 97}); "
+        "assert 'error' not in r, r; "
+        "print('sklearn' in sys.modules)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    assert out.strip() == "False"
@@ -0,0 +1,334 @@
+"""
+Compiled Tree Ensembles
+Flattens fitted IsolationForest / RandomForestClassifier models into packed
+NumPy arrays and evaluates every tree for a whole batch at once.
+
+Serving only needs NumPy: scikit-learn is used at export time (by duck
+typing on the fitted estimators), never imported here.
+"""
+
+from functools import cached_property
+
+import numpy as np
+
+# Largest per-node path contribution table CompiledRandomForest keeps in memory
+PATH_TABLE_MAX_BYTES = 64 * 2 ** 20
+
+def average_path_length(n_samples):
+    """
+    Average path length of an unsuccessful BST search in an isolation
+    tree built on n_samples points (same formula as scikit-learn)
+    """
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros(n_samples.shape)
+
+    mask_2 = n_samples == 2
+    not_mask = n_samples > 2
+    result[mask_2] = 1.0
+    result[not_mask] = (
+        2.0 * (np.log(n_samples[not_mask] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples[not_mask] - 1.0) / n_samples[not_mask]
+    )
+    return result
+
+def node_depths(children_left, children_right):
+    """Depth of every node in one tree, counting the root as depth 1"""
+    depths = np.zeros(len(children_left), dtype=np.float64)
+    depths[0] = 1.0
+    # sklearn stores parents before their children
+    for node in range(len(children_left)):
+        if children_left[node] != -1:
+            depths[children_left[node]] = depths[node] + 1.0
+            depths[children_right[node]] = depths[node] + 1.0
+    return depths
+
+def pack_trees(estimators, estimators_features=None, n_features=None):
+    """
+    Concatenate the nodes of all trees into flat arrays with global node ids.
+
+    Leaves point to themselves on both sides, so a batch can be walked for
+    a fixed number of steps (the deepest tree) without leaf checks.
+    """
+    feature, threshold, left, right, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for t, estimator in enumerate(estimators):
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        idx = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+
+        tree_feature = np.where(is_leaf, 0, tree.feature)
+        # Trees fitted on a feature subset index into that subset
+        if estimators_features is not None and len(estimators_features[t]) != n_features:
+            tree_feature = np.asarray(estimators_features[t])[tree_feature]
+
+        feature.append(tree_feature)
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+        left.append(np.where(is_leaf, idx, tree.children_left) + offset)
+        right.append(np.where(is_leaf, idx, tree.children_right) + offset)
+        roots.append(offset)
+
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.int32(max_depth)
+    }
+
+class FlatTreeEnsemble:
+    """Shared batch tree walker over packed node arrays"""
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        # Interleaved [left, right] pairs: child of node n is children[2n + go_right]
+        self.children = np.stack([self.left, self.right], axis=1).ravel().astype(np.intp)
+        self.feature_names_in_ = np.asarray(arrays['feature_names'])
+        self.n_features_in_ = len(self.feature_names_in_)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _descend(self, X):
+        """
+        Walk every sample down every tree. Yields (nodes, next_nodes), each
+        [n_samples, n_trees], once per level; samples at a leaf stay there.
+        """
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+        row_offset = (np.arange(n_samples, dtype=np.intp) * n_features)[:, None]
+
+        nodes = np.repeat(self.roots[None, :].astype(np.intp), n_samples, axis=0)
+        for _ in range(self.max_depth):
+            # NaN fails "<=" and goes right, as in sklearn
+            go_right = ~(X_flat[row_offset + self.feature[nodes]] <= self.threshold[nodes])
+            next_nodes = self.children[2 * nodes + go_right]
+            yield nodes, next_nodes
+            nodes = next_nodes
+
+    def apply(self, X):
+        """Leaf node id reached by every sample in every tree: [n_samples, n_trees]"""
+        nodes = np.repeat(self.roots[None, :].astype(np.intp), len(X), axis=0)
+        for _, nodes in self._descend(X):
+            pass
+        return nodes
+
+    def arrays(self):
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'roots': self.roots,
+            'max_depth': np.int32(self.max_depth),
+            'feature_names': self.feature_names_in_
+        }
+
+    def save(self, path):
+        np.savez(path, kind=np.array(self.kind), **self.arrays())
+
+class CompiledIsolationForest(FlatTreeEnsemble):
+    """Drop-in for IsolationForest.score_samples / decision_function / predict"""
+
+    kind = 'isolation_forest'
+
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        # Per-node path length: depth plus the expected depth below a leaf
+        self.path_length = arrays['path_length']
+        self.offset_ = float(arrays['offset'])
+        self.average_path_length_max_samples = float(arrays['average_path_length_max_samples'])
+
+    @classmethod
+    def from_estimator(cls, iso_forest, feature_names):
+        arrays = pack_trees(iso_forest.estimators_, iso_forest.estimators_features_,
+                            iso_forest.n_features_in_)
+        path_length = []
+        for estimator in iso_forest.estimators_:
+            tree = estimator.tree_
+            path_length.append(
+                node_depths(tree.children_left, tree.children_right)
+                + average_path_length(tree.n_node_samples)
+                - 1.0
+            )
+        arrays['path_length'] = np.concatenate(path_length)
+        arrays['offset'] = np.float64(iso_forest.offset_)
+        arrays['average_path_length_max_samples'] = average_path_length([iso_forest.max_samples_])[0]
+        arrays['feature_names'] = np.asarray(feature_names)
+        return cls(arrays)
+
+    def score_samples(self, X):
+        leaves = self.apply(X)
+        depths = np.zeros(leaves.shape[0])
+        # Accumulate tree by tree, in the same order as sklearn
+        for t in range(self.n_estimators):
+            depths += self.path_length[leaves[:, t]]
+
+        denominator = self.n_estimators * self.average_path_length_max_samples
+        # For a single training sample depth and denominator are both 0
+        ratio = depths / denominator if denominator != 0 else np.ones_like(depths)
+        return -(2 ** (-ratio))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def arrays(self):
+        arrays = super().arrays()
+        arrays['path_length'] = self.path_length
+        arrays['offset'] = np.float64(self.offset_)
+        arrays['average_path_length_max_samples'] = np.float64(self.average_path_length_max_samples)
+        return arrays
+
+class CompiledRandomForest(FlatTreeEnsemble):
+    """Drop-in for RandomForestClassifier.predict_proba / predict"""
+
+    kind = 'random_forest'
+
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        # Per-node class probabilities, already normalized per leaf
+        self.value = arrays['value']
+        self.classes_ = arrays['classes']
+        self.feature_importances_ = arrays['feature_importances']
+
+    @classmethod
+    def from_estimator(cls, rf_classifier, feature_names):
+        arrays = pack_trees(rf_classifier.estimators_)
+        values = []
+        for estimator in rf_classifier.estimators_:
+            value = estimator.tree_.value[:, 0, :]
+            normalizer = value.sum(axis=1)[:, None]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+        arrays['value'] = np.concatenate(values).astype(np.float64)
+        arrays['classes'] = np.asarray(rf_classifier.classes_)
+        arrays['feature_importances'] = np.asarray(rf_classifier.feature_importances_, dtype=np.float64)
+        arrays['feature_names'] = np.asarray(feature_names)
+        return cls(arrays)
+
+    def _proba_from_leaves(self, leaves):
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]))
+        # Accumulate tree by tree, in the same order as sklearn
+        for t in range(self.n_estimators):
+            proba += self.value[leaves[:, t]]
+        proba /= self.n_estimators
+        return proba
+
+    def predict_proba(self, X):
+        return self._proba_from_leaves(self.apply(X))
+
+    @property
+    def path_table_bytes(self):
+        """Size of path_contributions: float64 [n_nodes, n_features, n_classes]"""
+        return self.value.shape[0] * self.n_features_in_ * self.value.shape[1] * 8
+
+    @cached_property
+    def path_contributions(self):
+        """
+        For every node, the value changes along its root-to-node path summed
+        per split feature: [n_nodes, n_features, n_classes]. Read at a leaf
+        it is that tree's contribution vector. Built once per loaded model,
+        and only when it fits in PATH_TABLE_MAX_BYTES.
+        """
+        n_nodes, n_classes = self.value.shape
+        contributions = np.zeros((n_nodes, self.n_features_in_, n_classes))
+        is_internal = self.left != np.arange(n_nodes)
+
+        # Breadth-first, one tree level at a time across all trees
+        frontier = self.roots.astype(np.intp)
+        while len(frontier):
+            parents = frontier[is_internal[frontier]]
+            children = []
+            for child in (self.left[parents], self.right[parents]):
+                contributions[child] = contributions[parents]
+                contributions[child, self.feature[parents]] += self.value[child] - self.value[parents]
+                children.append(child)
+            frontier = np.concatenate(children)
+        return contributions
+
+    @cached_property
+    def bias(self):
+        """Mean root value over the trees: the prediction before any split"""
+        return self.value[self.roots].mean(axis=0)
+
+    def _walked_contributions(self, X):
+        """
+        Path contributions without the per-node table: every step from a
+        node to its child adds value[child] - value[node] to the node's
+        split feature while the batch walks the trees. Returns (leaves,
+        contribution sums [n, n_features, n_classes]).
+        """
+        n_samples, n_classes = len(X), self.value.shape[1]
+        contributions = np.zeros((n_samples * self.n_features_in_, n_classes))
+        row_offset = (np.arange(n_samples, dtype=np.intp) * self.n_features_in_)[:, None]
+
+        leaves = np.repeat(self.roots[None, :].astype(np.intp), n_samples, axis=0)
+        for nodes, leaves in self._descend(X):
+            # Samples already at a leaf add a zero delta
+            target = (row_offset + self.feature[nodes]).ravel()
+            delta = self.value[leaves] - self.value[nodes]
+            for c in range(n_classes):
+                contributions[:, c] += np.bincount(target, weights=delta[:, :, c].ravel(),
+                                                   minlength=len(contributions))
+        return leaves, contributions.reshape(n_samples, self.n_features_in_, n_classes)
+
+    def predict_proba_with_contributions(self, X):
+        """
+        predict_proba plus its exact per-sample decomposition by decision
+        path: proba == bias + contributions.sum(axis=1)
+
+        Small forests read the cached path_contributions table at each leaf.
+        When the table would exceed PATH_TABLE_MAX_BYTES (deep, unbounded
+        trees) the deltas are accumulated during the walk instead, in
+        O(n_samples * n_features * n_classes) memory.
+
+        Returns (proba [n, n_classes], bias [n_classes],
+        contributions [n, n_features, n_classes]).
+        """
+        if self.path_table_bytes <= PATH_TABLE_MAX_BYTES:
+            leaves = self.apply(X)
+            contributions = np.zeros((leaves.shape[0],) + self.path_contributions.shape[1:])
+            for t in range(self.n_estimators):
+                contributions += self.path_contributions[leaves[:, t]]
+        else:
+            leaves, contributions = self._walked_contributions(X)
+        contributions /= self.n_estimators
+        return self._proba_from_leaves(leaves), self.bias, contributions
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def arrays(self):
+        arrays = super().arrays()
+        arrays['value'] = self.value
+        arrays['classes'] = self.classes_
+        arrays['feature_importances'] = self.feature_importances_
+        return arrays
+
+COMPILED_KINDS = {
+    CompiledIsolationForest.kind: CompiledIsolationForest,
+    CompiledRandomForest.kind: CompiledRandomForest
+}
+
+def load_compiled(path):
+    """Load a model written by FlatTreeEnsemble.save()"""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    return COMPILED_KINDS[str(arrays.pop('kind'))](arrays)
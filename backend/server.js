@@ -52,10 +52,128 @@ const {
 } = require('./hybridDetection');
 const limsManager = require('./lims/limsManager');
 
+// Persistent Python workers: `<script> --serve` loads its models once and
+// answers newline-delimited JSON requests, tagged with an id.
+// A request that gets no answer within the worker's timeout resolves with
+// null (callers fall back to the single-shot path) and the worker, presumed
+// hung, is killed. Workers that exit are respawned on the next request, after
+// a backoff that doubles with each exit before the worker reported ready.
+const WORKER_RESTART_BASE_MS = 1000;
+const WORKER_RESTART_MAX_MS = 60000;
+
+function startWorker(script, label, timeoutMs, onExit) {
+    const proc = spawn('python', [path.join(__dirname, script), '--serve']);
+    const worker = { proc, label, timeoutMs, pending: new Map(), nextId: 1, buffer: '', ready: false };
+
+    proc.stdout.on('data', (chunk) => {
+        worker.buffer += chunk.toString();
+        let newline;
+        while ((newline = worker.buffer.indexOf('\n')) >= 0) {
+            const line = worker.buffer.slice(0, newline).trim();
+            worker.buffer = worker.buffer.slice(newline + 1);
+            if (!line) continue;
+            let message;
+            try {
+                message = JSON.parse(line);
+            } catch (e) {
+                console.error(`Failed to parse ${label} output:`, line);
+                continue;
+            }
+            // Readiness and startup messages carry no id
+            if (message.ready) worker.ready = true;
+            const callback = worker.pending.get(message.id);
+            if (!callback) continue;
+            worker.pending.delete(message.id);
+            delete message.id;
+            callback(message);
+        }
+    });
+
+    proc.stderr.on('data', (chunk) => {
+        console.warn(`${label}: ${chunk.toString().trim()}`);
+    });
+
+    let exited = false;
+    const shutdown = () => {
+        if (exited) return;
+        exited = true;
+        onExit(worker);
+        // Hand in-flight requests back to the single-shot path
+        for (const callback of worker.pending.values()) callback(null);
+        worker.pending.clear();
+    };
+    proc.on('close', shutdown);
+    proc.on('error', shutdown);
+    proc.stdin.on('error', shutdown);
+
+    return worker;
+}
+
+// Lazily started worker for one script, respawned with exponential backoff
+function workerSlot(script, label, timeoutMs) {
+    const slot = { worker: null, failures: 0, retryAt: 0 };
+    return () => {
+        if (!slot.worker && Date.now() >= slot.retryAt) {
+            slot.worker = startWorker(script, label, timeoutMs, (worker) => {
+                if (slot.worker !== worker) return;
+                slot.worker = null;
+                slot.failures = worker.ready ? 0 : slot.failures + 1;
+                const delay = Math.min(WORKER_RESTART_BASE_MS * 2 ** slot.failures, WORKER_RESTART_MAX_MS);
+                slot.retryAt = Date.now() + delay;
+                console.warn(`${label} exited; restarting on demand in ${delay} ms`);
+            });
+        }
+        return slot.worker;
+    };
+}
+
+// Send one request to a worker; resolves with null if the worker is
+// unavailable, goes away or does not answer in time
+function requestWorker(worker, payload) {
+    return new Promise((resolve) => {
+        if (!worker) return resolve(null);
+        const id = worker.nextId++;
+        const timer = setTimeout(() => {
+            if (!worker.pending.has(id)) return;
+            worker.pending.delete(id);
+            console.warn(`${worker.label} timed out after ${worker.timeoutMs} ms; restarting it`);
+            resolve(null);
+            worker.proc.kill();
+        }, worker.timeoutMs);
+        worker.pending.set(id, (message) => {
+            clearTimeout(timer);
+            resolve(message);
+        });
+        worker.proc.stdin.write(JSON.stringify({ ...payload, id }) + '\n');
+    });
+}
+
+const getMLWorker = workerSlot('ml/mlService.py', 'ML Worker', 10000);
+
+// gnnPredictor.py --serve keeps the TorchScript-compiled GNN and the graph cache warm
+const getGNNWorker = workerSlot('ml/gnnPredictor.py', 'GNN Worker', 60000);
+
 // ML Anomaly Detection Helper
 function detectAnomaly(data) {
-    return new Promise((resolve, reject) => {
+    return new Promise((resolve) => {
         console.log('🔮 Running ML Anomaly Detection...');
+        requestWorker(getMLWorker(), data).then((result) => {
+            if (!result) {
+                // Worker unavailable - fall back to one process per request
+                detectAnomalyOnce(data).then(resolve);
+            } else if (result.error) {
+                console.error("ML Error from worker:", result.error);
+                resolve(null);
+            } else {
+                resolve(result);
+            }
+        });
+    });
+}
+
+// Single-shot ML Anomaly Detection (fallback when the worker is down)
+function detectAnomalyOnce(data) {
+    return new Promise((resolve, reject) => {
         const pythonProcess = spawn('python', [path.join(__dirname, 'ml/mlService.py')]);
 
         let output = '';
@@ -102,9 +220,16 @@ function detectAnomaly(data) {
 }
 
 // GNN-based Molecular Analysis Helper
-function predictGNN(smiles) {
+async function predictGNN(smiles) {
+    console.log('⬡ Running GNN Molecular Analysis...');
+    const result = await requestWorker(getGNNWorker(), { smiles });
+    // Worker unavailable - fall back to one process per request
+    return result || predictGNNOnce(smiles);
+}
+
+// Single-shot GNN analysis (fallback when the worker is down)
+function predictGNNOnce(smiles) {
     return new Promise((resolve, reject) => {
-        console.log('⬡ Running GNN Molecular Analysis...');
         const pythonProcess = spawn('python', [path.join(__dirname, 'ml/gnnPredictor.py'), smiles]);
 
         let output = '';
@@ -129,8 +254,46 @@ function predictGNN(smiles) {
     });
 }
 
+// Batched GNN analysis: one forward pass for a list of SMILES
+async function predictGNNBatch(smilesList) {
+    console.log(`⬡ Running batched GNN analysis on ${smilesList.length} molecule(s)...`);
+    const response = await requestWorker(getGNNWorker(), { smiles_list: smilesList });
+    if (response) return response.results || null;
+    return predictGNNBatchOnce(smilesList);
+}
+
+// Single-shot batched GNN analysis (fallback when the worker is down)
+function predictGNNBatchOnce(smilesList) {
+    return new Promise((resolve) => {
+        const pythonProcess = spawn('python', [path.join(__dirname, 'ml/gnnPredictor.py'), '--batch']);
+
+        let output = '';
+        let error = '';
+
+        pythonProcess.stdin.write(JSON.stringify(smilesList));
+        pythonProcess.stdin.end();
+
+        pythonProcess.stdout.on('data', (chunk) => { output += chunk.toString(); });
+        pythonProcess.stderr.on('data', (chunk) => { error += chunk.toString(); });
+
+        pythonProcess.on('close', (code) => {
+            if (code !== 0) {
+                console.warn(`GNN Service Warning (code ${code}): ${error}`);
+                resolve(null);
+            } else {
+                try {
+                    resolve(JSON.parse(output));
+                } catch (e) {
+                    console.error('Failed to parse GNN output:', e);
+                    resolve(null);
+                }
+            }
+        });
+    });
+}
+
 // Bayesian Analysis Helpers
-function getPriors(method) {
+function getMethodPriors(method) {
     return new Promise((resolve, reject) => {
         db.get('SELECT prior_mean, prior_std, n_samples FROM method_priors WHERE method_name = ?', [method], (err, row) => {
             if (err) reject(err);
@@ -139,22 +302,51 @@ function getPriors(method) {
     });
 }
 
-function runBayesianAnalysis(prior, data) {
+// Most specific prior available: product/stress group, then stress-type population, then method default
+function getPriors(method, product, stressType) {
+    if (!product || !stressType) return getMethodPriors(method);
+
+    return new Promise((resolve) => {
+        db.get(`SELECT prior_mean, prior_std, n_samples FROM group_priors
+                WHERE product = ? AND stress_type = ? AND method_name = ?`, [product, stressType, method], (err, row) => {
+            if (!err && row) return resolve(row);
+            db.get(`SELECT population_mean AS prior_mean, between_std AS prior_std, 0 AS n_samples FROM group_hyperpriors
+                    WHERE stress_type = ? AND method_name = ?`, [stressType, method], (err, row) => {
+                // Hierarchical tables are created by the first refit
+                if (!err && row) return resolve(row);
+                resolve(getMethodPriors(method));
+            });
+        });
+    });
+}
+
+// Fold newly saved calculations into the hierarchical group priors
+function refreshGroupPriors() {
+    return new Promise((resolve) => {
+        const pythonProcess = spawn('python', [
+            path.join(__dirname, 'bayesian/hierarchicalPriors.py'), '--db', path.resolve('./mass_balance.db')
+        ]);
+        let error = '';
+        pythonProcess.stderr.on('data', (chunk) => { error += chunk.toString(); });
+        pythonProcess.on('close', (code) => {
+            if (code !== 0) console.warn(`Group prior refit warning: ${error}`);
+            resolve(code === 0);
+        });
+    });
+}
+
+// One Python process updates every prior/data pair in the list
+// (with '--online' the posteriors are also written back to method_priors)
+function runBayesianBatch(payloads, extraArgs = []) {
     return new Promise((resolve, reject) => {
-        const pythonProcess = spawn('python', [path.join(__dirname, 'bayesian/bayesianUpdater.py')]);
+        if (payloads.length === 0) return resolve([]);
+
+        const pythonProcess = spawn('python', [path.join(__dirname, 'bayesian/bayesianUpdater.py'), ...extraArgs]);
 
         let output = '';
         let error = '';
 
-        const payload = {
-            prior_mean: prior.prior_mean,
-            prior_std: prior.prior_std,
-            data_mean: data.mean,
-            data_std: data.std,
-            n: data.n || 3
-        };
-
-        pythonProcess.stdin.write(JSON.stringify(payload));
+        pythonProcess.stdin.write(JSON.stringify(payloads));
         pythonProcess.stdin.end();
 
         pythonProcess.stdout.on('data', (chunk) => { output += chunk.toString(); });
@@ -163,19 +355,29 @@ function runBayesianAnalysis(prior, data) {
         pythonProcess.on('close', (code) => {
             if (code !== 0) {
                 console.warn(`Bayesian Service Warning: ${error}`);
-                resolve(null);
+                resolve(payloads.map(() => null));
             } else {
                 try {
-                    resolve(JSON.parse(output));
+                    resolve(JSON.parse(output).map(r => (r && !r.error ? r : null)));
                 } catch (e) {
                     console.error('Failed to parse Bayesian output:', e);
-                    resolve(null);
+                    resolve(payloads.map(() => null));
                 }
             }
         });
     });
 }
 
+// Fold a saved calculation into the stored priors so the next one starts from its posterior
+function updatePriorsFromCalculation(results) {
+    const payloads = [
+        { method_name: 'LK-IMB', data_mean: results.lk_imb, data_std: results.lk_combined_std || 2.5, n: 3 },
+        { method_name: 'CIMB', data_mean: results.cimb, data_std: results.cimb_combined_std || 2.5, n: 3 }
+    ].filter(p => p.data_mean !== null && p.data_mean !== undefined);
+
+    return runBayesianBatch(payloads, ['--online', '--db', path.resolve('./mass_balance.db')]);
+}
+
 // Database setup
 const db = new sqlite3.Database('./mass_balance.db', (err) => {
     if (err) {
@@ -775,28 +977,41 @@ app.post('/api/calculate', async (req, res) => {
         const calculation = await calculateMassBalance(req.body, hybrid_results);
 
         // Run Bayesian Analysis for supported methods
+        // Optional raw replicate values per method, e.g. { "CIMB": [97.1, 98.4, 96.9] },
+        // switch that method to the unknown-variance (Normal-Inverse-Gamma) update
+        const replicates = req.body.replicates || {};
         const methodsToCheck = [
-            { name: 'LK-IMB', value: calculation.results.lk_imb, std: calculation.results.lk_combined_std },
-            { name: 'CIMB', value: calculation.results.cimb, std: calculation.results.cimb_combined_std }
+            { name: 'LK-IMB', value: calculation.results.lk_imb, std: calculation.results.lk_combined_std, replicates: replicates['LK-IMB'] },
+            { name: 'CIMB', value: calculation.results.cimb, std: calculation.results.cimb_combined_std, replicates: replicates['CIMB'] }
         ];
 
-        for (const m of methodsToCheck) {
-            try {
-                const prior = await getPriors(m.name);
-                if (prior && m.value !== null) {
-                    const bayesianResult = await runBayesianAnalysis(prior, {
-                        mean: m.value,
-                        std: m.std || 2.5, // Default to 2.5% if std not available
-                        n: 3
-                    });
-
-                    if (bayesianResult) {
-                        calculation.results[`${m.name.toLowerCase().replace('-', '_')}_bayesian`] = bayesianResult;
-                    }
+        try {
+            const ready = [];
+            for (const m of methodsToCheck) {
+                try {
+                    const prior = await getPriors(m.name, req.body.sample_id, req.body.stress_type);
+                    if (prior && m.value !== null) ready.push({ m, prior });
+                } catch (e) {
+                    console.error(`Failed to load priors for ${m.name}:`, e);
                 }
-            } catch (e) {
-                console.error(`Failed to run Bayesian analysis for ${m.name}:`, e);
             }
+
+            const bayesianResults = await runBayesianBatch(ready.map(({ m, prior }) => ({
+                prior_mean: prior.prior_mean,
+                prior_std: prior.prior_std,
+                data_mean: m.value,
+                data_std: m.std || 2.5, // Default to 2.5% if std not available
+                n: 3,
+                ...(Array.isArray(m.replicates) && m.replicates.length > 0 ? { replicates: m.replicates } : {})
+            })));
+
+            ready.forEach(({ m }, i) => {
+                if (bayesianResults[i]) {
+                    calculation.results[`${m.name.toLowerCase().replace('-', '_')}_bayesian`] = bayesianResults[i];
+                }
+            });
+        } catch (e) {
+            console.error('Failed to run Bayesian analysis:', e);
         }
 
         console.log('✓ Calculation complete:', calculation.recommended_method, calculation.recommended_value + '%');
@@ -861,6 +1076,12 @@ app.post('/api/save', (req, res) => {
             } else {
                 console.log('✓ Calculation saved:', results.calculation_id);
                 res.json({ success: true, calculation_id: results.calculation_id });
+
+                updatePriorsFromCalculation(results.results)
+                    .then(() => refreshGroupPriors())
+                    .catch((e) => {
+                        console.error('Failed to update Bayesian priors:', e);
+                    });
             }
         }
     );
@@ -969,6 +1190,9 @@ app.delete('/api/calculation/:id', (req, res) => {
         } else {
             console.log('✓ Calculation deleted:', req.params.id);
             res.json({ success: true, deleted: this.changes });
+
+            // The delete flags the group statistics as stale, so this refit rebuilds them
+            if (this.changes > 0) refreshGroupPriors();
         }
     });
 });
@@ -1639,6 +1863,26 @@ app.post('/api/ml/gnn-predict', async (req, res) => {
     }
 });
 
+// POST /api/ml/gnn-predict-batch - GNN analysis for a list of SMILES (library screening)
+app.post('/api/ml/gnn-predict-batch', async (req, res) => {
+    const { smiles_list } = req.body;
+    if (!Array.isArray(smiles_list) || smiles_list.length === 0) {
+        return res.status(400).json({ success: false, error: 'smiles_list must be a non-empty array' });
+    }
+
+    try {
+        const results = await predictGNNBatch(smiles_list);
+        if (results) {
+            res.json({ success: true, count: results.length, results });
+        } else {
+            res.status(500).json({ success: false, error: 'GNN Analysis failed' });
+        }
+    } catch (error) {
+        console.error('❌ GNN API Error:', error);
+        res.status(500).json({ success: false, error: error.message });
+    }
+});
+
 // GET /api/predict/example-molecules - Get example SMILES
 app.get('/api/predict/example-molecules', (req, res) => {
     const examples = [